@@ -0,0 +1,338 @@
+# Reproducible benchmarks for the install / backup / restore paths.
+#
+# Generates a synthetic fused-zip Balatro.exe (stub + zip of resources/textures/2x/...) and mod zips of
+# varying breadth, then times each operation end to end and per phase, recording throughput and peak
+# RSS. Results are written as JSON so two runs (e.g. two commits) can be compared:
+#
+#   python benchmarks/bench_mod_ops.py --out before.json
+#   python benchmarks/bench_mod_ops.py --out after.json
+#   python benchmarks/bench_mod_ops.py --compare before.json after.json
+#
+# Runs headless on Linux; the 7z engine is benchmarked against benchmarks/fake_7z.py unless a real 7z
+# is found on PATH.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import platform
+import tempfile
+import threading
+import functools
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import copy_engine  # noqa: E402
+import exe_archive  # noqa: E402
+import hash_cache  # noqa: E402
+import mod_core as core  # noqa: E402
+import mod_preflight  # noqa: E402
+
+TEXTURE_PREFIX = exe_archive.TEXTURE_PREFIX
+MB = 1024 * 1024
+
+
+# Fixtures ==========================================
+def _texture_bytes(rng: random.Random, size: int) -> bytes:
+    ''' PNG-ish payload: half noise, half runs, so deflate has something (but not everything) to do. '''
+    noise = rng.randbytes(size // 2)
+    runs = bytes(rng.choice(b"\x00\x10\x80\xff") for _ in range(64)) * (size // 128 + 1)
+    return (b"\x89PNG\r\n\x1a\n" + noise + runs)[:size]
+
+def make_fused_exe(path: str, stub_mb: float, entries: int, entry_kb: int, compression: str, seed: int) -> list[str]:
+    ''' Write a stub + zip "Balatro.exe"; returns the texture entry names. '''
+    rng = random.Random(seed)
+    method = zipfile.ZIP_DEFLATED if compression == "deflated" else zipfile.ZIP_STORED
+    names = [f"{TEXTURE_PREFIX}atlas_{i:05d}.png" for i in range(entries)]
+    with open(path, "wb") as f:
+        f.write(b"MZ" + rng.randbytes(int(stub_mb * MB) - 2))
+    with zipfile.ZipFile(path, "a", method) as z: # appending to a non-zip file = a fused archive
+        z.writestr("main.lua", b"-- synthetic\n" * 100)
+        for n in names:
+            z.writestr(n, _texture_bytes(rng, entry_kb * 1024))
+    return names
+
+def make_mod_zip(path: str, exe_names: list[str], breadth: int, new_entries: int, entry_kb: int, seed: int) -> None:
+    ''' A mod replacing `breadth` existing textures and adding `new_entries` new ones. '''
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for n in rng.sample(exe_names, min(breadth, len(exe_names))):
+            z.writestr(n, _texture_bytes(rng, entry_kb * 1024))
+        for i in range(new_entries):
+            z.writestr(f"{TEXTURE_PREFIX}mod_{seed}_{i:04d}.png", _texture_bytes(rng, entry_kb * 1024))
+
+def make_streaming_assets(folder: str, files: int, file_kb: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(files):
+        p = os.path.join(folder, f"dir{i % 16:02d}", f"asset_{i:05d}.bin")
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p, "wb") as f:
+            f.write(rng.randbytes(file_kb * 1024))
+
+def fake_7z_launcher(workdir: str) -> str:
+    ''' A 7z "binary" on PATH-less Linux: a shell launcher for fake_7z.py. '''
+    real = shutil.which("7z") or shutil.which("7za")
+    if real:
+        return real
+    launcher = os.path.join(workdir, "7z")
+    with open(launcher, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(HERE, "fake_7z.py")}" "$@"\n')
+    os.chmod(launcher, 0o755)
+    return launcher
+
+
+# Measurement =======================================
+class RssSampler:
+    ''' Samples this process's RSS in a background thread; peak is reported relative to the start. '''
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        try:
+            import psutil
+            self._proc = psutil.Process()
+        except ImportError:
+            self._proc = None
+
+    def _rss(self) -> int:
+        if self._proc is not None:
+            return self._proc.memory_info().rss
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            return 0
+
+    def __enter__(self):
+        self.base = self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+class PhaseTimer:
+    '''
+    Wraps module functions so the outermost call of each is timed as a phase.
+    Calls made from worker threads are summed, so a parallel phase can exceed wall time.
+    '''
+
+    def __init__(self, targets: list[tuple[object, str, str]]):
+        self.targets = targets # (module, attribute, phase name)
+        self.phases = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._saved = []
+
+    def _wrap(self, fn, phase):
+        @functools.wraps(fn)
+        def inner(*a, **k):
+            depth = getattr(self._local, "depth", 0)
+            self._local.depth = depth + 1
+            t = time.perf_counter()
+            try:
+                return fn(*a, **k)
+            finally:
+                self._local.depth = depth
+                if depth == 0:
+                    with self._lock:
+                        self.phases[phase] = self.phases.get(phase, 0.0) + time.perf_counter() - t
+        return inner
+
+    def __enter__(self):
+        for mod, attr, phase in self.targets:
+            fn = getattr(mod, attr)
+            self._saved.append((mod, attr, fn))
+            setattr(mod, attr, self._wrap(fn, phase))
+        return self
+
+    def __exit__(self, *exc):
+        for mod, attr, fn in reversed(self._saved):
+            setattr(mod, attr, fn)
+
+INSTALL_PHASES = [
+    (mod_preflight, "preflight_mod_zip", "preflight"),
+    (core.exe_archive, "overlay_sources", "read_mods"),
+    (core.exe_archive, "read_layout", "read_exe"),
+    (core, "backup_file", "backup_exe"),
+    (core, "snapshot_game", "snapshot"),
+    (core.exe_archive, "patch_archive", "patch"),
+    (core, "install_with_7z", "7z_update"),
+]
+RESTORE_PHASES = [
+    (core.exe_archive, "sync_archive_to", "delta_sync"),
+    (core.shutil, "copy2", "full_copy"),
+]
+COPY_PHASES = [
+    (copy_engine, "is_unchanged", "compare"),
+    (copy_engine, "fast_copy", "copy"),
+]
+
+
+# Cases =============================================
+def run_case(name: str, setup, op, phases, bytes_of, repeat: int) -> dict:
+    runs, rss, phase_runs = [], [], []
+    for _ in range(repeat):
+        ctx = setup()
+        with PhaseTimer(phases) as timer, RssSampler() as sampler:
+            t = time.perf_counter()
+            op(ctx)
+            runs.append(time.perf_counter() - t)
+        rss.append(sampler.peak - sampler.base)
+        phase_runs.append(timer.phases)
+    seconds = statistics.median(runs)
+    size = bytes_of()
+    phase_names = sorted({p for r in phase_runs for p in r})
+    return {
+        "case": name,
+        "seconds": seconds,
+        "runs": runs,
+        "bytes": size,
+        "throughput_mb_s": (size / MB) / seconds if seconds else None,
+        "peak_rss_delta_mb": max(rss) / MB,
+        "phases": {p: statistics.median(r.get(p, 0.0) for r in phase_runs) for p in phase_names},
+    }
+
+def run_suite(args) -> dict:
+    work = tempfile.mkdtemp(prefix="balatro_bench_")
+    os.environ.setdefault("BALATRO_MM_CACHE_DIR", os.path.join(work, "cache"))
+    try:
+        fixture = os.path.join(work, "fixture")
+        os.makedirs(os.path.join(fixture, "Balatro_Data", "StreamingAssets"))
+        exe_src = os.path.join(fixture, core.EXE_NAME)
+        names = make_fused_exe(exe_src, args.stub_mb, args.entries, args.entry_kb, args.compression, args.seed)
+        make_streaming_assets(os.path.join(fixture, "Balatro_Data", "StreamingAssets"),
+                              args.asset_files, args.asset_kb, args.seed)
+        mods = {}
+        for breadth in args.mod_breadth:
+            mods[breadth] = os.path.join(work, f"mod_{breadth}.zip")
+            make_mod_zip(mods[breadth], names, breadth, max(1, breadth // 10), args.entry_kb, args.seed + breadth)
+        core.SEVEN_ZIP_CANDIDATES = [fake_7z_launcher(work)]
+
+        game = os.path.join(work, "game")
+        def fresh_game(with_backup_of: str | None = None):
+            shutil.rmtree(game, ignore_errors=True)
+            shutil.copytree(fixture, game)
+            hash_cache.forget([os.path.join(game, core.EXE_NAME)])
+            if with_backup_of:
+                core.backup_file(os.path.join(game, core.EXE_NAME))
+                core.install_into_exe_archive(game, with_backup_of)
+            return game
+
+        exe_size = lambda: os.path.getsize(exe_src)
+        results = []
+        for breadth, mod in mods.items():
+            mod_size = lambda mod=mod: os.path.getsize(mod)
+            results.append(run_case(f"install_native[breadth={breadth}]", fresh_game,
+                                    lambda g, mod=mod: core.install_into_exe_archive(g, mod),
+                                    INSTALL_PHASES, mod_size, args.repeat))
+            if not args.skip_7z:
+                results.append(run_case(f"install_7z[breadth={breadth}]", fresh_game,
+                                        lambda g, mod=mod: core.install_into_exe_archive(g, mod, engine="7z"),
+                                        INSTALL_PHASES, exe_size, args.repeat))
+            results.append(run_case(f"restore_exe_delta[breadth={breadth}]",
+                                    lambda mod=mod: fresh_game(with_backup_of=mod),
+                                    lambda g: core.restore_exe_backup(g), RESTORE_PHASES, mod_size, args.repeat))
+            results.append(run_case(f"restore_exe_full[breadth={breadth}]",
+                                    lambda mod=mod: fresh_game(with_backup_of=mod),
+                                    lambda g: core.restore_exe_backup(g, delta=False), RESTORE_PHASES,
+                                    exe_size, args.repeat))
+
+        assets = os.path.join(fixture, "Balatro_Data", "StreamingAssets")
+        assets_size = lambda: sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(assets) for f in fs)
+        results.append(run_case("ensure_assets_backup", fresh_game, core.ensure_assets_backup,
+                                COPY_PHASES, assets_size, args.repeat))
+        dst = os.path.join(work, "copy_dst")
+        def cold():
+            shutil.rmtree(dst, ignore_errors=True)
+            return dst
+        def warm():
+            core.copytree_merge(assets, dst)
+            return dst
+        results.append(run_case("copytree_merge_cold", cold, lambda d: core.copytree_merge(assets, d),
+                                COPY_PHASES, assets_size, args.repeat))
+        results.append(run_case("copytree_merge_warm", warm, lambda d: core.copytree_merge(assets, d),
+                                COPY_PHASES, assets_size, args.repeat))
+        return {"meta": _meta(args), "results": results}
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "keep")}}
+
+
+# Reporting =========================================
+def print_results(data: dict) -> None:
+    print(f"commit {data['meta'].get('commit')}  params {data['meta']['params']}")
+    for r in data["results"]:
+        phases = "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in r["phases"].items() if v)
+        tput = f"{r['throughput_mb_s']:.1f} MB/s" if r["throughput_mb_s"] else "-"
+        print(f"{r['case']:<34} {r['seconds'] * 1000:9.1f} ms  {tput:>12}  rss+{r['peak_rss_delta_mb']:.1f}MB  {phases}")
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path) as f:
+        old = {r["case"]: r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    print(f"{'case':<34} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for r in new:
+        o = old.get(r["case"])
+        if o is None:
+            print(f"{r['case']:<34} {'-':>10} {r['seconds'] * 1000:10.1f} {'new':>8}")
+            continue
+        change = (r["seconds"] / o["seconds"] - 1) * 100 if o["seconds"] else 0.0
+        print(f"{r['case']:<34} {o['seconds'] * 1000:10.1f} {r['seconds'] * 1000:10.1f} {change:+7.1f}%")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark Balatro mod install/backup/restore paths.")
+    ap.add_argument("--stub-mb", type=float, default=8.0, help="size of the fake EXE stub in front of the zip")
+    ap.add_argument("--entries", type=int, default=400, help="texture entries in the fake EXE")
+    ap.add_argument("--entry-kb", type=int, default=96, help="size of each texture entry")
+    ap.add_argument("--compression", choices=["deflated", "stored"], default="deflated")
+    ap.add_argument("--mod-breadth", type=lambda s: [int(x) for x in s.split(",")], default=[2, 50],
+                    help="comma separated: how many EXE textures each generated mod replaces")
+    ap.add_argument("--asset-files", type=int, default=200, help="files in the fake StreamingAssets folder")
+    ap.add_argument("--asset-kb", type=int, default=64)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--skip-7z", action="store_true", help="don't benchmark the 7z engine")
+    ap.add_argument("--keep", action="store_true", help="keep the temp working folder")
+    ap.add_argument("--out", help="write JSON results here")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    data = run_suite(args)
+    print_results(data)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(data, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
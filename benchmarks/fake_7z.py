@@ -0,0 +1,55 @@
+# Local stand-in for the 7-Zip binary, used by the benchmarks on machines without 7z.
+#
+# Supports just what install_with_7z needs:  fake_7z.py u -y [-mx=0] <archive> <pattern>
+# Like the real `7z u`, it rewrites the whole archive: the EXE stub and untouched entries are copied,
+# files matching <pattern> (relative to the cwd) are deflated and replace/extend the old entries.
+import os
+import sys
+import glob
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import exe_archive  # noqa: E402
+
+
+def update(archive: str, pattern: str, store: bool = False) -> int:
+    pattern = pattern.replace("\\", "/")
+    base = pattern.rstrip("*").rstrip("/")
+    files = [p for p in glob.glob(os.path.join(base, "**", "*"), recursive=True) if os.path.isfile(p)]
+    layout = exe_archive.read_layout(archive)
+
+    fd, staged = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    fd, stub = tempfile.mkstemp(suffix=".stub")
+    out = archive + ".7ztmp"
+    try:
+        with zipfile.ZipFile(staged, "w", zipfile.ZIP_STORED if store else zipfile.ZIP_DEFLATED) as z:
+            for i, p in enumerate(sorted(files), 1):
+                name = os.path.relpath(p).replace(os.sep, "/")
+                z.write(p, name)
+                print(f"{i * 100 // max(len(files), 1):3d}% {i} U {name}", flush=True)
+        new = {s.name: s for s in exe_archive.mod_texture_sources(staged, prefix="")}
+        with os.fdopen(fd, "wb") as f, open(archive, "rb") as src:
+            f.write(src.read(layout.concat))
+        sources = [new.pop(e.name, None) or exe_archive.EntrySource(e.name, archive, e) for e in layout.entries]
+        exe_archive.build_archive(out, stub, sources + list(new.values()), layout.comment)
+        os.replace(out, archive)
+    finally:
+        for p in (staged, stub, out):
+            if os.path.exists(p):
+                os.remove(p)
+    print("Everything is Ok", flush=True)
+    return 0
+
+
+def main(argv: list[str]) -> int:
+    args = [a for a in argv if not a.startswith("-")]
+    if len(args) != 3 or args[0] != "u":
+        print(f"fake_7z: unsupported command line {argv}", file=sys.stderr)
+        return 2
+    return update(args[1], args[2], store="-mx=0" in argv or "-mx0" in argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
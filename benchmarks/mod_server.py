@@ -0,0 +1,119 @@
+# Local stand-in for a mod download host, used to exercise src/download_cache.py without the internet.
+#
+#   python benchmarks/mod_server.py <folder> [--port 8765] [--cut-after BYTES]
+#
+# Serves the files in <folder> over http.server with what the download cache relies on: ETag and
+# Last-Modified headers, conditional GETs (If-None-Match / If-Modified-Since -> 304), single byte ranges
+# (Range -> 206, If-Range) and 416 for ranges past the end. --cut-after drops every response after that
+# many body bytes, to test resuming. Import it to run one in-process: serve(folder) -> (server, base URL).
+import os
+import sys
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ModHandler(SimpleHTTPRequestHandler):
+    cut_after = None # set per server
+    requests_seen = None # list shared with the test: (method, path, status)
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _record(self, status: int) -> None:
+        if self.requests_seen is not None:
+            self.requests_seen.append((self.command, self.path, status))
+
+    def do_GET(self) -> None:
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self._record(404)
+            self.send_error(404)
+            return
+        st_ = os.stat(path)
+        etag = f'"{st_.st_size:x}-{st_.st_mtime_ns:x}"'
+        last_modified = formatdate(st_.st_mtime, usegmt=True)
+
+        if self.headers.get("If-None-Match") == etag or self._not_modified_since(st_.st_mtime):
+            self._record(304)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start, end, status = 0, st_.st_size - 1, 200
+        rng = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if rng and rng.startswith("bytes=") and (if_range is None or if_range in (etag, last_modified)):
+            first, _, last = rng[6:].partition("-")
+            start = int(first)
+            end = min(int(last), st_.st_size - 1) if last else st_.st_size - 1
+            if start >= st_.st_size:
+                self._record(416)
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{st_.st_size}")
+                self.end_headers()
+                return
+            status = 206
+
+        self._record(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{st_.st_size}")
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            left = end - start + 1
+            if self.cut_after is not None:
+                left = min(left, self.cut_after)
+            while left > 0:
+                chunk = f.read(min(64 * 1024, left))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                left -= len(chunk)
+        if self.cut_after is not None:
+            self.close_connection = True
+
+    def _not_modified_since(self, mtime: float) -> bool:
+        since = self.headers.get("If-Modified-Since")
+        if not since or self.headers.get("If-None-Match"):
+            return False
+        try:
+            return int(mtime) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+def serve(folder: str, port: int = 0, cut_after: int | None = None) -> tuple[ThreadingHTTPServer, str]:
+    ''' Start a server for folder in a daemon thread; returns (server, base URL). server.requests lists every request. '''
+    requests = []
+    handler = type("Handler", (ModHandler,), {"cut_after": cut_after, "requests_seen": requests})
+    server = ThreadingHTTPServer(("127.0.0.1", port), lambda *a: handler(*a, directory=folder))
+    server.requests = requests
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve mod zips with ETag / Range support for download tests.")
+    parser.add_argument("folder")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cut-after", type=int, help="drop each response after this many body bytes")
+    args = parser.parse_args(argv)
+    server, url = serve(args.folder, args.port, args.cut_after)
+    print(f"Serving {os.path.abspath(args.folder)} at {url}/ (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,7 @@ msf.local_css("assets/styles.css") # load in the styles
 
 # ---- GLOBAL MOTION TOGGLE ----
 disable_motion = st.sidebar.toggle("DISABLE MOTION", value=False, key="disable_motion", width="stretch")
+show_diagnostics = st.sidebar.toggle("SHOW DIAGNOSTICS", value=False, key="show_diagnostics", width="stretch")
 
 if disable_motion:
     st.markdown(
@@ -54,9 +55,10 @@ st.markdown(
 
 
 # Sidebar =================
-suits = ["HOME", "♥ Hearts", "♦ Diamonds", "♣ Clubs", "♠ Spades", "Upload Your Own Art" ,"Restore Original"]
+suits = ["HOME", "♥ Hearts", "♦ Diamonds", "♣ Clubs", "♠ Spades", "Browse Mods", "Upload Your Own Art", "Batch Install", "Restore Original"]
 st.sidebar.title("Manage Artwork")
 selected_category = st.sidebar.radio("-------", suits) # create a category selector as a sidebar
+msf.render_install_picker() # which installs to patch when several are found
 msf.apply_page_background(selected_category) # apply background based on selected category
 # PAGE ROUTING ===
 if selected_category.startswith("HOME"):
@@ -71,6 +73,14 @@ elif selected_category == "Upload Your Own Art":
     # upload your own art through zip file
     msf.render_upload_page()
 
+elif selected_category == "Browse Mods":
+    # every mod in the mods folder, from the catalog index
+    msf.render_browse_page()
+
+elif selected_category == "Batch Install":
+    # apply several mods in one EXE update
+    msf.render_batch_page()
+
 else:
     # Suit pages
     selected_suit_key = msf.label_to_suit_key(selected_category)
@@ -78,6 +88,10 @@ else:
 
 st.divider()
 
+if show_diagnostics:
+    # per-step timings of recent installs / backups / restores
+    msf.render_diagnostics_panel()
+
 
 if getattr(msf.sys, "frozen", False):
     pass
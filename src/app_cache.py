@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+
+# Persistent cache location shared by every Streamlit session (and the helpers that need one)
+CACHE_ENV_VAR = "BALATRO_MM_CACHE_DIR" # override the cache folder, handy for portable installs
+CACHE_DIRNAME = "BalatroArtModManager"
+
+
+def cache_root() -> str:
+    ''' Return (and create) the per-user cache folder for the mod manager. '''
+    base = os.environ.get(CACHE_ENV_VAR)
+    if not base:
+        home = os.path.expanduser("~")
+        if sys.platform == "win32":
+            local = os.environ.get("LOCALAPPDATA") or os.path.join(home, "AppData", "Local")
+            base = os.path.join(local, CACHE_DIRNAME)
+        elif sys.platform == "darwin":
+            base = os.path.join(home, "Library", "Caches", CACHE_DIRNAME)
+        else:
+            xdg = os.environ.get("XDG_CACHE_HOME") or os.path.join(home, ".cache")
+            base = os.path.join(xdg, CACHE_DIRNAME)
+    os.makedirs(base, exist_ok=True)
+    return base
+
+def cache_path(*parts: str) -> str:
+    ''' Join parts onto the cache folder, creating the parent directory. '''
+    path = os.path.join(cache_root(), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def load_json(path: str, default=None):
+    ''' Read a JSON file, returning default if it is missing or unreadable. '''
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def save_json_atomic(path: str, data) -> None:
+    ''' Write JSON via a temp file + rename so readers never see a half-written file. '''
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    import tempfile # only writers need it; keeps start-up of read-only commands short
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
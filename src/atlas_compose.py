@@ -0,0 +1,172 @@
+import io
+import os
+import json
+import hashlib
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+import app_cache
+import exe_archive
+
+# Sprite-cell compositing of card atlases ====================
+# Balatro's face cards live in atlases (collabs/collab_XX_1.png = normal, _2 = high contrast), one row of
+# three cells: Jack, Queen, King (142x190 each at 2x). A mod zip always ships whole atlases, so installing
+# one mod after another used to throw away every card the first mod changed. Instead, each atlas is cut
+# into cells and, per cell, the last mod that actually changed it (compared with the original art from
+# Balatro.exe.bak) wins; cells no mod touched keep what is in the EXE now. All layers are compared and
+# blitted in one NumPy pass, and results are cached on disk keyed by the CRC32/size of every input.
+# The cell size comes from each atlas's own dimensions, so every collab atlas (any suit, 1x or 2x) is
+# split correctly; one whose width doesn't divide into three cells is replaced whole.
+ATLAS_PREFIX = exe_archive.TEXTURE_PREFIX + "collabs/"
+CARD_ORDER = ("Jack", "Queen", "King") # left to right, matching assets/cards/<suit>/<hc|normal>/
+# Suit -> the collab atlas the bundled mods repaint. Compositing works on every collab atlas; this map
+# only drives per-suit previews and catalog search, and hearts/spades have no bundled art to map yet.
+SUIT_ATLASES = {"clubs": "collab_WF", "diamonds": "collab_XR"}
+VARIANT_SUFFIX = {"normal": "_1", "hc": "_2"}
+CACHE_SUBDIR = "composites"
+MAX_CACHED = 256 # composited atlases kept on disk, oldest dropped first
+
+
+def atlas_entry(suit: str, variant: str = "normal") -> str:
+    ''' EXE entry name of the atlas holding a suit's face cards; ValueError for suits without one mapped. '''
+    if suit not in SUIT_ATLASES:
+        raise ValueError(f"No face-card atlas is mapped for {suit!r}; supported suits: {', '.join(SUIT_ATLASES)}.")
+    return f"{ATLAS_PREFIX}{SUIT_ATLASES[suit]}{VARIANT_SUFFIX[variant]}.png"
+
+def cell_size(width: int, height: int) -> tuple[int, int] | None:
+    ''' (width, height) of one card in an atlas of the given size, or None if it isn't a row of CARD_ORDER cells. '''
+    if width <= 0 or height <= 0 or width % len(CARD_ORDER):
+        return None
+    return width // len(CARD_ORDER), height
+
+def card_cell(suit: str, card: str, variant: str, atlas_size: tuple[int, int]) -> tuple[str, tuple[int, int, int, int]]:
+    ''' (atlas entry, PIL crop box) of one card in an atlas of atlas_size, e.g. card_cell("clubs", "Queen", "hc", im.size). '''
+    cell = cell_size(*atlas_size)
+    if cell is None:
+        raise ValueError(f"A {atlas_size[0]}x{atlas_size[1]} atlas doesn't split into {len(CARD_ORDER)} card cells.")
+    col = CARD_ORDER.index(card)
+    w, h = cell
+    return atlas_entry(suit, variant), (col * w, 0, (col + 1) * w, h)
+
+def is_atlas(name: str) -> bool:
+    return name.startswith(ATLAS_PREFIX) and name.lower().endswith(".png")
+
+def decode_rgba(data: bytes) -> np.ndarray:
+    ''' PNG bytes -> HxWx4 uint8 array; fully transparent pixels are zeroed so hidden RGB never counts as a change. '''
+    with Image.open(io.BytesIO(data)) as im:
+        arr = np.array(im.convert("RGBA"))
+    arr[arr[..., 3] == 0] = 0
+    return arr
+
+def encode_png(arr: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(arr, "RGBA").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def composite_cells(canvas: np.ndarray, reference: np.ndarray, layers: list[np.ndarray],
+                    cell: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Per cell, copy the last layer that differs from reference onto canvas.
+    Returns (result, owner) where owner[row, col] is the winning layer index or -1 (kept from canvas).
+    All arrays must share one HxWx4 shape that divides evenly into cells.
+    '''
+    cw, ch = cell
+    h, w = canvas.shape[:2]
+    rows, cols = h // ch, w // cw
+    stack = np.stack(layers).reshape(len(layers), rows, ch, cols, cw, 4)
+    ref = reference.reshape(rows, ch, cols, cw, 4)
+    changed = (stack != ref).any(axis=(2, 4, 5)) # layers x rows x cols
+    touched = changed.any(axis=0)
+    owner = np.where(touched, len(layers) - 1 - changed[::-1].argmax(axis=0), -1)
+    out = canvas.reshape(rows, ch, cols, cw, 4).copy()
+    r, c = np.nonzero(touched)
+    out[r, :, c] = stack[owner[r, c], r, :, c]
+    return out.reshape(h, w, 4), owner
+
+def _grid_of(arrays: list[np.ndarray]) -> tuple[int, int] | None:
+    ''' The cell size shared by every array (taken from the first), or None if shapes differ or don't split. '''
+    shape = arrays[0].shape
+    if any(a.shape != shape for a in arrays):
+        return None
+    return cell_size(shape[1], shape[0])
+
+
+# Install integration ==========
+def _cache_key(canvas: exe_archive.ArchiveEntry, reference: exe_archive.ArchiveEntry, layers: list[exe_archive.EntrySource]) -> str:
+    ident = [canvas.crc, canvas.file_size, reference.crc, reference.file_size,
+             [(s.entry.crc, s.entry.file_size) for s in layers], len(CARD_ORDER)]
+    return hashlib.sha256(json.dumps(ident).encode()).hexdigest()[:32]
+
+def _prune(folder: str) -> None:
+    files = sorted((e.stat().st_mtime, e.path) for e in os.scandir(folder) if e.is_file())
+    for _, path in files[:max(0, len(files) - MAX_CACHED)]:
+        try: os.remove(path)
+        except OSError: pass
+
+def _composite_one(name: str, exe_path: str, canvas: exe_archive.ArchiveEntry, reference_path: str,
+                   reference: exe_archive.ArchiveEntry, layers: list[exe_archive.EntrySource]) -> str:
+    '''
+    Composite one atlas; returns "last" (the last layer already is the answer), "keep" (no cell changes)
+    or the path of a zip holding the composited entry. The decision is cached by input CRCs.
+    '''
+    folder = os.path.dirname(app_cache.cache_path(CACHE_SUBDIR, "x"))
+    key = _cache_key(canvas, reference, layers)
+    for verdict in ("last", "keep"):
+        if os.path.isfile(os.path.join(folder, f"{key}.{verdict}")):
+            return verdict
+    out_zip = os.path.join(folder, f"{key}.zip")
+    if os.path.isfile(out_zip):
+        os.utime(out_zip)
+        return out_zip
+
+    arrays = [decode_rgba(exe_archive.read_entry_data(exe_path, canvas)),
+              decode_rgba(exe_archive.read_entry_data(reference_path, reference))]
+    arrays += [decode_rgba(exe_archive.read_entry_data(s.path, s.entry)) for s in layers]
+    cell = _grid_of(arrays)
+    if cell is None: # sizes differ or don't split into cards: fall back to whole-file replacement
+        verdict = "last"
+    else:
+        result, owner = composite_cells(arrays[0], arrays[1], arrays[2:], cell)
+        if np.array_equal(result, arrays[-1]): # keeps the mod's own PNG bytes (and CRC) when nothing merges
+            verdict = "last"
+        elif (owner == -1).all():
+            verdict = "keep"
+        else:
+            tmp = out_zip + f".{os.getpid()}.tmp"
+            with zipfile.ZipFile(tmp, "w") as z:
+                z.writestr(name, encode_png(result), compress_type=exe_archive.compress_type_for(name))
+            os.replace(tmp, out_zip)
+            _prune(folder)
+            return out_zip
+    open(os.path.join(folder, f"{key}.{verdict}"), "wb").close()
+    return verdict
+
+def composite_sources(exe_path: str, reference_path: str, mod_zips: list[str],
+                      sources: list[exe_archive.EntrySource],
+                      layout: exe_archive.ArchiveLayout | None = None) -> list[exe_archive.EntrySource]:
+    '''
+    Replace the atlas entries in sources (the overlay of mod_zips) with sprite-level composites of
+    every mod's copy over what Balatro.exe holds now. reference_path is the untouched game
+    (Balatro.exe.bak, or the EXE itself before the first install). Non-atlas entries pass through.
+    '''
+    layout = layout or exe_archive.read_layout(exe_path)
+    current = layout.by_name()
+    original = current if reference_path == exe_path else exe_archive.read_layout(reference_path).by_name()
+    per_mod = [{s.name: s for s in exe_archive.mod_texture_sources(z)} for z in mod_zips]
+
+    out = []
+    for src in sources:
+        canvas, reference = current.get(src.name), original.get(src.name)
+        if not is_atlas(src.name) or canvas is None or reference is None:
+            out.append(src)
+            continue
+        layers = [m[src.name] for m in per_mod if src.name in m]
+        verdict = _composite_one(src.name, exe_path, canvas, reference_path, reference, layers)
+        if verdict == "last":
+            out.append(src)
+        elif verdict != "keep":
+            out += exe_archive.mod_texture_sources(verdict)
+    return out
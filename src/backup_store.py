@@ -0,0 +1,361 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import app_cache
+import exe_archive
+
+# Content-addressed backup store ====================
+# Every file (or Balatro.exe archive entry) is stored once under objects/<sha[:2]>/<sha>; a snapshot
+# is just a small JSON manifest pointing at objects. Archive entries are stored still compressed, and
+# an entry index maps (name, crc, sizes, method) -> sha so unchanged entries are never re-read (files go
+# through the shared hash_cache for the same reason): a new snapshot after an install only writes the
+# entries the mod changed. A snapshot can also be taken against a base archive (Balatro.exe.bak): the
+# stub and every entry identical to the base's are recorded by reference, not copied, so only entries
+# that differ from the original game are ever read or stored. Restoring such a snapshot needs the same
+# base back, which is checked by the base's central-directory fingerprint; before the base is replaced
+# (a game update retakes Balatro.exe.bak), detach_base copies what it lends into the store.
+OBJECTS_DIRNAME = "objects"
+SNAPSHOTS_DIRNAME = "snapshots"
+INDEX_FILENAME = "index.json"
+MANIFEST_VERSION = 2 # 2: entries may come from a base archive (no "sha")
+READ_CHUNK = 1024 * 1024
+
+_locks = {} # store root -> lock, so two sessions never write the same store at once
+_locks_guard = threading.Lock()
+
+
+def _store_lock(root: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(root), threading.Lock())
+
+def _entry_key(e: exe_archive.ArchiveEntry) -> str:
+    return f"{e.name}|{e.crc}|{e.compress_size}|{e.file_size}|{e.compress_type}"
+
+def _entry_record(e: exe_archive.ArchiveEntry, sha: str) -> dict:
+    return {"name": e.name, "sha": sha, "method": e.compress_type, "crc": e.crc, "csize": e.compress_size,
+            "size": e.file_size, "flags": e.flag_bits, "time": e.dos_time, "date": e.dos_date}
+
+def _hash_range(f, start: int, length: int) -> str:
+    f.seek(start)
+    h = hashlib.sha256()
+    while length > 0:
+        chunk = f.read(min(READ_CHUNK, length))
+        if not chunk:
+            break
+        h.update(chunk)
+        length -= len(chunk)
+    return h.hexdigest()
+
+
+class BackupStore:
+    ''' Deduplicated snapshot store rooted at a folder (normally <game>/_backup_BalatroArt/store). '''
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects = os.path.join(root, OBJECTS_DIRNAME)
+        self.snapshots = os.path.join(root, SNAPSHOTS_DIRNAME)
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+
+    # objects ------------------------------------------------
+    def object_path(self, sha: str) -> str:
+        return os.path.join(self.objects, sha[:2], sha)
+
+    def has_object(self, sha: str) -> bool:
+        return os.path.isfile(self.object_path(sha))
+
+    def _put_stream(self, src, length: int | None = None) -> tuple[str, int, bool]:
+        ''' Hash + store bytes read from src; returns (sha, size, newly_written). '''
+        os.makedirs(self.objects, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".obj_", dir=self.objects)
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                left = length
+                while left is None or left > 0:
+                    chunk = src.read(READ_CHUNK if left is None else min(READ_CHUNK, left))
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                    if left is not None:
+                        left -= len(chunk)
+            sha = h.hexdigest()
+            dest = self.object_path(sha)
+            if os.path.isfile(dest):
+                os.remove(tmp)
+                return sha, size, False
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(tmp, dest)
+            return sha, size, True
+        except BaseException:
+            try: os.remove(tmp)
+            except OSError: pass
+            raise
+
+    # snapshots ----------------------------------------------
+    def list_snapshots(self) -> list[dict]:
+        ''' Snapshot summaries (id, label, created), newest first. '''
+        out = []
+        if os.path.isdir(self.snapshots):
+            for name in os.listdir(self.snapshots):
+                if name.endswith(".json"):
+                    m = app_cache.load_json(os.path.join(self.snapshots, name))
+                    if m:
+                        out.append({"id": m["id"], "label": m.get("label", ""), "created": m.get("created", 0),
+                                    "new_bytes": m.get("stats", {}).get("new_bytes", 0)})
+        out.sort(key=lambda m: m["id"], reverse=True)
+        return out
+
+    def load_snapshot(self, snapshot_id: str) -> dict:
+        m = app_cache.load_json(os.path.join(self.snapshots, f"{snapshot_id}.json"))
+        if not m:
+            raise FileNotFoundError(f"No snapshot named {snapshot_id}.")
+        return m
+
+    def snapshot(self, label: str, exe_path: str | None = None, assets_dir: str | None = None,
+                 base_path: str | None = None) -> dict:
+        '''
+        Record the current EXE archive entries and/or asset files; only unseen content is written.
+        With base_path, whatever the EXE shares with that archive is referenced instead of stored.
+        '''
+        with _store_lock(self.root):
+            index = app_cache.load_json(self.index_path, {"entries": {}})
+            stats = {"objects_written": 0, "new_bytes": 0, "reused": 0, "from_base": 0}
+            manifest = {"version": MANIFEST_VERSION, "label": label, "created": time.time()}
+            if exe_path and os.path.isfile(exe_path):
+                base = base_path if base_path and os.path.isfile(base_path) else None
+                manifest["exe"] = self._snapshot_exe(exe_path, index["entries"], stats, base)
+            if assets_dir and os.path.isdir(assets_dir):
+                manifest["assets"] = self._snapshot_dir(assets_dir, stats)
+            manifest["stats"] = stats
+
+            os.makedirs(self.snapshots, exist_ok=True)
+            base = time.strftime("%Y%m%d-%H%M%S")
+            n = 0
+            while os.path.exists(os.path.join(self.snapshots, f"{base}-{n:02d}.json")):
+                n += 1
+            manifest["id"] = f"{base}-{n:02d}"
+            app_cache.save_json_atomic(os.path.join(self.snapshots, f"{manifest['id']}.json"), manifest)
+            app_cache.save_json_atomic(self.index_path, index)
+            return manifest
+
+    def _count(self, stats: dict, size: int, new: bool) -> None:
+        if new:
+            stats["objects_written"] += 1
+            stats["new_bytes"] += size
+        else:
+            stats["reused"] += 1
+
+    def _snapshot_exe(self, exe_path: str, entry_index: dict, stats: dict, base_path: str | None = None) -> dict:
+        layout = exe_archive.read_layout(exe_path)
+        base_layout = exe_archive.read_layout(base_path) if base_path else None
+        base = base_layout.by_name() if base_layout else {}
+        entries = []
+        with open(exe_path, "rb") as f:
+            if base_layout and exe_archive.stubs_equal(exe_path, layout.concat, base_path, base_layout.concat):
+                stub_sha = None # same stub as the base
+                stats["from_base"] += 1
+            else:
+                stub_sha = _hash_range(f, 0, layout.concat) # the PE stub rarely changes: hash it, copy only if new
+                if self.has_object(stub_sha):
+                    self._count(stats, 0, False)
+                else:
+                    f.seek(0)
+                    stub_sha, size, new = self._put_stream(f, layout.concat)
+                    self._count(stats, size, new)
+            for e in layout.entries:
+                key = _entry_key(e)
+                if e.name in base and _entry_key(base[e.name]) == key:
+                    entries.append({"name": e.name, "base": True})
+                    stats["from_base"] += 1
+                    continue
+                sha = entry_index.get(key)
+                if sha and self.has_object(sha):
+                    self._count(stats, 0, False)
+                else:
+                    f.seek(exe_archive.entry_data_offset(f, e))
+                    sha, size, new = self._put_stream(f, e.compress_size)
+                    entry_index[key] = sha
+                    self._count(stats, size, new)
+                entries.append(_entry_record(e, sha))
+        out = {"stub": stub_sha, "stub_size": layout.concat, "comment": layout.comment.hex(), "entries": entries}
+        if base_layout:
+            out["base"] = {"name": os.path.basename(base_path), "stub_size": base_layout.concat,
+                           "fingerprint": exe_archive.read_table(base_path).fingerprint()}
+        return out
+
+    def _snapshot_dir(self, folder: str, stats: dict) -> dict:
+        import hash_cache # SQLite: not needed to list or restore snapshots
+        paths = {}
+        for root, _, names in os.walk(folder):
+            for fname in names:
+                full = os.path.join(root, fname)
+                paths[full] = os.path.relpath(full, folder).replace(os.sep, "/")
+        digests = hash_cache.hash_files(list(paths)) # warm cache: unchanged files cost a stat
+        files = {}
+        for full, rel in paths.items():
+            sha = digests[full]
+            st_ = os.stat(full)
+            if self.has_object(sha):
+                self._count(stats, 0, False)
+            else:
+                with open(full, "rb") as f:
+                    sha, size, new = self._put_stream(f)
+                self._count(stats, size, new)
+            files[rel] = {"sha": sha, "size": st_.st_size, "mtime": st_.st_mtime}
+        return {"files": files}
+
+    def detach_base(self, base_path: str) -> int:
+        '''
+        Copy everything snapshots take from base_path (entries, stub) into the store and rewrite them to
+        point at those objects, so they stay restorable once base_path is replaced. Returns how many changed.
+        '''
+        if not os.path.isfile(base_path):
+            return 0
+        fingerprint = exe_archive.read_table(base_path).fingerprint()
+        layout = exe_archive.read_layout(base_path)
+        base = layout.by_name()
+        with _store_lock(self.root):
+            index = app_cache.load_json(self.index_path, {"entries": {}})
+            stub_sha = None
+            changed = 0
+            with open(base_path, "rb") as f:
+                for s in self.list_snapshots():
+                    manifest = self.load_snapshot(s["id"])
+                    exe_m = manifest.get("exe")
+                    if not exe_m or exe_m.get("base", {}).get("fingerprint") != fingerprint:
+                        continue
+                    if exe_m["stub"] is None:
+                        if stub_sha is None:
+                            f.seek(0)
+                            stub_sha = self._put_stream(f, layout.concat)[0]
+                        exe_m["stub"] = stub_sha
+                    for i, m in enumerate(exe_m["entries"]):
+                        if not m.get("base"):
+                            continue
+                        e = base[m["name"]]
+                        key = _entry_key(e)
+                        sha = index["entries"].get(key)
+                        if not (sha and self.has_object(sha)):
+                            f.seek(exe_archive.entry_data_offset(f, e))
+                            sha = index["entries"][key] = self._put_stream(f, e.compress_size)[0]
+                        exe_m["entries"][i] = _entry_record(e, sha)
+                    del exe_m["base"]
+                    app_cache.save_json_atomic(os.path.join(self.snapshots, f"{manifest['id']}.json"), manifest)
+                    changed += 1
+            app_cache.save_json_atomic(self.index_path, index)
+            return changed
+
+    # restore ------------------------------------------------
+    def _base_entries(self, exe_manifest: dict, base_path: str | None) -> dict[str, exe_archive.ArchiveEntry]:
+        ''' The base archive's entries by name, after checking it is the one the snapshot was taken against. '''
+        base = exe_manifest.get("base")
+        if not base:
+            return {}
+        try:
+            same = base_path is not None and exe_archive.read_table(base_path).fingerprint() == base["fingerprint"]
+        except (OSError, exe_archive.ArchiveError):
+            same = False
+        if not same:
+            raise FileNotFoundError(f"This snapshot shares its unmodified entries with {base['name']}, which has "
+                                    "changed since (the game was updated), so it can't be restored.")
+        return exe_archive.read_layout(base_path).by_name()
+
+    def exe_sources(self, exe_manifest: dict, base_path: str | None = None) -> list[exe_archive.EntrySource]:
+        ''' EntrySources that rebuild the snapshot's archive entries from stored objects (and base_path). '''
+        base = self._base_entries(exe_manifest, base_path)
+        out = []
+        for m in exe_manifest["entries"]:
+            if m.get("base"):
+                out.append(exe_archive.EntrySource(m["name"], base_path, base[m["name"]]))
+                continue
+            e = exe_archive.ArchiveEntry(m["name"], 0, m["method"], m["csize"], m["size"], m["crc"],
+                                         m["flags"], m["time"], m["date"])
+            out.append(exe_archive.EntrySource(m["name"], self.object_path(m["sha"]), e, data_offset=0))
+        return out
+
+    def _same_stub(self, exe_path: str, exe_manifest: dict, base_path: str | None) -> bool:
+        try:
+            layout = exe_archive.read_layout(exe_path)
+        except (OSError, exe_archive.ArchiveError):
+            return False
+        if layout.concat != exe_manifest["stub_size"]:
+            return False
+        if exe_manifest["stub"] is None:
+            return exe_archive.stubs_equal(exe_path, layout.concat, base_path, exe_manifest["base"]["stub_size"])
+        with open(exe_path, "rb") as f:
+            return _hash_range(f, 0, layout.concat) == exe_manifest["stub"]
+
+    def restore(self, snapshot_id: str, exe_path: str | None = None, assets_dir: str | None = None,
+                progress=None, base_path: str | None = None) -> dict:
+        '''
+        Put the EXE and/or asset files back to how they were in a snapshot (progress(done, total) bytes).
+        base_path is the archive the snapshot was taken against, if any (see snapshot).
+        '''
+        manifest = self.load_snapshot(snapshot_id)
+        result = {"exe": False, "files": 0}
+        with _store_lock(self.root):
+            exe_m = manifest.get("exe", {})
+            wanted = [m["sha"] for m in exe_m.get("entries", []) if not m.get("base")]
+            wanted += [exe_m["stub"]] if exe_m and exe_m["stub"] else []
+            missing = [sha for sha in wanted if not self.has_object(sha)]
+            if missing:
+                raise FileNotFoundError(f"Backup store is missing {len(missing)} object(s) for {snapshot_id}.")
+            if exe_path and exe_m:
+                sources = self.exe_sources(exe_m, base_path)
+                if self._same_stub(exe_path, exe_m, base_path):
+                    result["exe_report"] = exe_archive.sync_archive(exe_path, sources, progress)
+                else: # game updated (or EXE unreadable): rebuild the whole file from objects
+                    stub_path = base_path if exe_m["stub"] is None else self.object_path(exe_m["stub"])
+                    exe_archive.replace_atomically(exe_path, lambda tmp: exe_archive.build_archive(
+                        tmp, stub_path, sources, bytes.fromhex(exe_m.get("comment", "")), progress,
+                        stub_size=exe_m["stub_size"]))
+                result["exe"] = True
+            if assets_dir and "assets" in manifest:
+                for rel, m in manifest["assets"]["files"].items():
+                    dest = os.path.join(assets_dir, *rel.split("/"))
+                    if os.path.isfile(dest) and os.path.getsize(dest) == m["size"] \
+                            and abs(os.path.getmtime(dest) - m["mtime"]) < 1e-3:
+                        continue # untouched since the snapshot
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    shutil.copyfile(self.object_path(m["sha"]), dest)
+                    os.utime(dest, (m["mtime"], m["mtime"]))
+                    result["files"] += 1
+        return result
+
+    # housekeeping -------------------------------------------
+    def delete_snapshot(self, snapshot_id: str) -> None:
+        try: os.remove(os.path.join(self.snapshots, f"{snapshot_id}.json"))
+        except FileNotFoundError: pass
+
+    def collect_garbage(self) -> int:
+        ''' Delete objects no snapshot references any more; returns bytes freed. '''
+        with _store_lock(self.root):
+            live = set()
+            for s in self.list_snapshots():
+                m = self.load_snapshot(s["id"])
+                if "exe" in m:
+                    live.add(m["exe"]["stub"])
+                    live.update(e["sha"] for e in m["exe"]["entries"] if not e.get("base"))
+                if "assets" in m:
+                    live.update(f["sha"] for f in m["assets"]["files"].values())
+            freed = 0
+            if os.path.isdir(self.objects):
+                for root, _, names in os.walk(self.objects):
+                    for name in names:
+                        if name not in live and not name.startswith("."):
+                            path = os.path.join(root, name)
+                            freed += os.path.getsize(path)
+                            os.remove(path)
+            index = app_cache.load_json(self.index_path, {"entries": {}})
+            for table in index.values():
+                for k in [k for k, v in table.items() if v not in live]:
+                    del table[k]
+            app_cache.save_json_atomic(self.index_path, index)
+            return freed
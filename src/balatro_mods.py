@@ -0,0 +1,303 @@
+# Command line for the mod manager, no browser needed:
+#
+#   python balatro_mods.py install mods/hearts_art.zip
+#   python balatro_mods.py batch-install a.zip b.zip --game "D:\SteamLibrary\steamapps\common\Balatro"
+#   python balatro_mods.py install mods/clubs_art.zip --all-installs   (every detected install, in parallel)
+#   python balatro_mods.py restore [--snapshot ID]
+#   python balatro_mods.py verify [--crc] [--fix]   (--fix re-applies textures a Steam update reverted)
+#   python balatro_mods.py make-delta mods/card_art.zip   (only the changed sprites, rebuilt at install)
+#   python balatro_mods.py list
+#   python balatro_mods.py ui          (starts the Streamlit app)
+#
+# Everything is imported lazily inside the commands, so `--help` and argument errors return at once and
+# Streamlit is only imported by `ui`.
+import os
+import sys
+import argparse
+
+
+class ConsoleProgress:
+    ''' progress(fraction, message) callback that draws a one-line bar on a terminal, or plain lines otherwise. '''
+
+    def __init__(self, stream=sys.stderr, quiet: bool = False):
+        self.stream = stream
+        self.quiet = quiet
+        self.tty = stream.isatty()
+        self.fraction = 0.0
+        self.message = ""
+
+    def __call__(self, fraction: float | None = None, message: str | None = None) -> None:
+        if self.quiet:
+            return
+        if fraction is not None:
+            self.fraction = fraction
+        if self.tty:
+            if message:
+                self.message = message
+            filled = int(self.fraction * 30)
+            self.stream.write(f"\r[{'#' * filled}{'.' * (30 - filled)}] {self.fraction * 100:3.0f}% {self.message[:60]:<60}")
+            self.stream.flush()
+        elif message and message != self.message:
+            self.message = message
+            print(message, file=self.stream)
+
+    def done(self) -> None:
+        if self.tty and not self.quiet and self.message:
+            self.stream.write("\n")
+
+
+def _game_root(args) -> str:
+    import mod_core
+    root = args.game[0] if args.game else mod_core.primary_game_root()
+    if not root:
+        raise SystemExit("No Balatro install found in your Steam libraries; pass --game <folder>.")
+    return root
+
+def _game_roots(args) -> list[str]:
+    ''' Every install a command should touch: the --game folders, all detected ones, or the first detected. '''
+    import mod_core
+    roots = list(args.game or [])
+    if getattr(args, "all_installs", False):
+        roots += mod_core.detect_balatro_dirs()
+    return roots or [_game_root(args)]
+
+def _run_across(args, progress, op: str, *op_args, **op_kwargs) -> int:
+    ''' Run a mod_core operation on several installs at once (one worker process per install). '''
+    import job_runner
+    import multi_install
+    roots = multi_install.unique_roots(_game_roots(args))
+    with job_runner.hold_roots(roots, file_locks=False): # each worker takes its install's OS lock
+        report = _run(progress, multi_install.run_across_roots, op, roots, *op_args, workers=args.jobs, **op_kwargs)
+    for r in report.results:
+        print(f"{'ok  ' if r.ok else 'FAIL'}  {r.seconds:6.1f}s  {r.game_root}: {r.message}")
+    print(report.summary())
+    return 1 if report.failed else 0
+
+def _mod_sources(args, sources: list[str], progress) -> list[str]:
+    ''' Local paths for zip paths and/or URLs (URLs come from the download cache, several at a time). '''
+    import mod_core
+    if getattr(args, "sha256", None):
+        sources = [mod_core.download(s, args.sha256, args.refresh) if s.lower().startswith(("http://", "https://")) else s
+                   for s in sources]
+    sources = mod_core.resolve_mod_sources(sources, refresh=args.refresh, progress=progress)
+    return [os.path.abspath(s) for s in sources]
+
+def _multi(args) -> bool:
+    return bool(args.all_installs) or len(args.game or []) > 1
+
+def _print_timings() -> None:
+    import tracing
+    for root in reversed(tracing.recent_traces()):
+        for s in root.walk():
+            size = f"  {s.bytes / 2**20:8.2f} MB" if s.bytes else ""
+            print(f"{'  ' * s.depth}{s.name:<{28 - 2 * s.depth}} {s.seconds * 1000:9.1f} ms{size}", file=sys.stderr)
+
+def _run(progress: ConsoleProgress, fn, *args, **kwargs):
+    try:
+        return fn(*args, progress=progress, **kwargs)
+    finally:
+        progress.done()
+
+def _run_locked(progress: ConsoleProgress, fn, game_root: str, *args, **kwargs):
+    ''' _run fn(game_root, ...) holding the root's lock, so no app window or other command writes it meanwhile. '''
+    import job_runner
+    with job_runner.hold_roots([game_root]):
+        return _run(progress, fn, game_root, *args, **kwargs)
+
+
+# Commands ==========
+def cmd_install(args, progress) -> int:
+    import mod_core
+    source = _mod_sources(args, [args.zip], progress)[0]
+    if _multi(args):
+        return _run_across(args, progress, "install_into_exe_archive", source, engine=args.engine,
+                           optimize_pngs=args.optimize_png)
+    print(_run_locked(progress, mod_core.install_into_exe_archive, _game_root(args), source, engine=args.engine,
+                      optimize_pngs=args.optimize_png))
+    return 0
+
+def cmd_batch_install(args, progress) -> int:
+    import mod_core
+    import download_cache
+    names = [download_cache.display_name(z) for z in args.zips]
+    sources = _mod_sources(args, args.zips, progress)
+    if _multi(args):
+        return _run_across(args, progress, "install_mods_into_exe_archive", sources, names,
+                           optimize_pngs=args.optimize_png)
+    print(_run_locked(progress, mod_core.install_mods_into_exe_archive, _game_root(args), sources, names,
+                      optimize_pngs=args.optimize_png))
+    return 0
+
+def cmd_restore(args, progress) -> int:
+    import mod_core
+    if _multi(args):
+        if args.snapshot or args.full:
+            raise SystemExit("--snapshot and --full work on one install at a time; pick it with --game.")
+        return _run_across(args, progress, "restore_game")
+    root = _game_root(args)
+    if args.snapshot:
+        res = _run_locked(progress, mod_core.restore_snapshot, root, args.snapshot)
+        print(f"Restored snapshot {args.snapshot} ({'Balatro.exe + ' if res['exe'] else ''}{res['files']} asset file(s)).")
+        return 0
+    report, assets = _run_locked(progress, mod_core.restore_game, root, delta=not args.full)
+    if not report and not assets:
+        print("No backups found to restore.")
+        return 1
+    if report and not report.full_copy:
+        touched = len(report.replaced) + len(report.added) + len(report.removed)
+        print(f"Restored original game assets (rewrote {touched} entries, {report.unchanged} already original).")
+    else:
+        print("Restored original game assets.")
+    return 0
+
+def cmd_verify(args, progress) -> int:
+    import mod_core
+    res = _run(progress, mod_core.verify_install, _game_root(args), check_crc=args.crc)
+    print(f"{mod_core.EXE_NAME}: {res['entries']} entries, {len(res['modded'])} modded, {len(res['added'])} added"
+          + ("" if res["backup"] else " (no .bak to compare against)"))
+    if args.verbose:
+        for name in res["modded"]:
+            print(f"  modded  {name}")
+        for name in res["added"]:
+            print(f"  added   {name}")
+    drift = res.get("drift")
+    if drift is not None:
+        _print_drift(drift, args.verbose)
+        if drift.drifted and not args.fix:
+            print("Run `verify --fix` to re-apply just those textures.")
+        elif drift.drifted:
+            patch = _run_locked(progress, mod_core.reapply_drift, _game_root(args))
+            print(f"Re-applied {len(drift.drifted)} texture(s) ({patch.bytes_written / 2**20:.1f} MB written).")
+            drift = mod_core.check_install_drift(_game_root(args))
+    for problem in res["problems"] + (drift.problems if drift is not None else []):
+        print(f"PROBLEM: {problem}")
+    return 1 if res["problems"] or (drift is not None and not drift.ok) else 0
+
+def _print_drift(drift, verbose: bool) -> None:
+    ''' Summary of what changed since the last recorded install. '''
+    if not drift.manifest:
+        print(f"No install recorded yet; checked in {drift.seconds * 1000:.0f} ms.")
+    elif drift.ok:
+        print(f"Matches the last install ({drift.label or 'unnamed'}); checked in {drift.seconds * 1000:.0f} ms.")
+    else:
+        print(f"Drift since the last install ({drift.label or 'unnamed'}), checked in {drift.seconds * 1000:.0f} ms:")
+    for kind, names in (("reverted", drift.reverted), ("changed", drift.changed), ("missing", drift.missing),
+                        ("not ours", drift.unexpected), ("asset gone", drift.assets_missing),
+                        ("asset changed", drift.assets_changed)):
+        if names:
+            print(f"  {len(names)} {kind}" + ("" if verbose else f" (e.g. {names[0]})"))
+            if verbose:
+                for name in names:
+                    print(f"    {name}")
+
+def cmd_make_delta(args, progress) -> int:
+    import mod_core
+    import mod_preflight
+    report = mod_preflight.preflight_mod_zip(args.zip)
+    if not report.ok:
+        raise SystemExit(f"{os.path.basename(args.zip)}: " + " ".join(report.errors))
+    if report.delta:
+        raise SystemExit(f"{os.path.basename(args.zip)} is already a delta pack.")
+    stats = _run(progress, mod_core.make_delta_pack, _game_root(args), args.zip, args.output)
+    saved = 1 - stats["bytes_out"] / max(stats["bytes_in"], 1)
+    print(f"Wrote {stats['path']}: {stats['bytes_out'] / 2**20:.2f} MB instead of {stats['bytes_in'] / 2**20:.2f} MB "
+          f"({saved:.0%} smaller). {stats['regions']} changed region(s), {stats['whole']} whole texture(s), "
+          f"{stats['unchanged']} texture(s) identical to the game's dropped.")
+    return 0
+
+def cmd_list(args, progress) -> int:
+    import mod_core
+    roots = args.game or mod_core.detect_balatro_dirs()
+    print("Balatro installs:")
+    for root in roots or ["  (none found)"]:
+        print(f"  {root}")
+    print("Bundled mods:")
+    for name in mod_core.list_bundled_mods() or ["(none)"]:
+        print(f"  {name}")
+    for root in roots:
+        snapshots = mod_core.game_backup_store(root).list_snapshots()
+        if snapshots:
+            print(f"Snapshots for {root}:")
+            for s in snapshots:
+                print(f"  {s['id']}  {s['label']}")
+    return 0
+
+def cmd_ui(args, progress) -> int:
+    from streamlit.web import cli as stcli
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(here) # Streamlit reads .streamlit/config.toml (static serving, theme) from the working directory
+    extra = args.streamlit_args[1:] if args.streamlit_args[:1] == ["--"] else args.streamlit_args # ui -- --server.port 8502
+    sys.argv = ["streamlit", "run", os.path.join(here, "app.py")] + extra
+    return stcli.main()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="balatro-mods", description="Install, restore and check Balatro card art mods.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--game", action="append",
+                        help="Balatro install folder (default: first one found in your Steam libraries); repeat for several")
+    common.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    common.add_argument("--timings", action="store_true", help="print how long each step took")
+    several = argparse.ArgumentParser(add_help=False)
+    several.add_argument("--all-installs", action="store_true", help="apply to every Balatro install found (plus any --game)")
+    several.add_argument("-j", "--jobs", type=int, help="installs updated at the same time (default: up to 4)")
+    installing = argparse.ArgumentParser(add_help=False)
+    installing.add_argument("--optimize-png", action="store_true",
+                            help="losslessly shrink the mod's PNGs and store them uncompressed (native engine)")
+    installing.add_argument("--refresh", action="store_true",
+                            help="ask the server whether mods given as URLs changed (cached downloads are reused otherwise)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("install", parents=[common, several, installing], help="install one mod zip into Balatro.exe")
+    p.add_argument("zip", help="mod zip path or http(s) URL")
+    p.add_argument("--sha256", help="expected SHA-256 of a downloaded mod")
+    p.add_argument("--engine", choices=["native", "7z"], default="native")
+    p.set_defaults(func=cmd_install)
+
+    p = sub.add_parser("batch-install", parents=[common, several, installing], help="apply several mod zips in one update (later zips win)")
+    p.add_argument("zips", nargs="+", help="mod zip paths and/or http(s) URLs")
+    p.set_defaults(func=cmd_batch_install)
+
+    p = sub.add_parser("restore", parents=[common, several], help="put the original art back (or an earlier snapshot)")
+    p.add_argument("--snapshot", help="snapshot id from `list`")
+    p.add_argument("--full", action="store_true", help="copy the whole Balatro.exe.bak instead of only the modded entries")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("verify", parents=[common], help="check Balatro.exe and show which textures are modded")
+    p.add_argument("--crc", action="store_true", help="also inflate every entry and check its CRC32")
+    p.add_argument("-v", "--verbose", action="store_true", help="list modded and drifted entries")
+    p.add_argument("--fix", action="store_true", help="re-apply textures that changed since the last install")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("make-delta", parents=[common],
+                       help="pack a mod zip as only its changes against the game's original textures")
+    p.add_argument("zip", help="mod zip to pack")
+    p.add_argument("-o", "--output", help="where to write the pack (default: <zip>.delta.zip next to it)")
+    p.set_defaults(func=cmd_make_delta)
+
+    p = sub.add_parser("list", parents=[common], help="show detected installs, bundled mods and snapshots")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("ui", help="start the web app (arguments after -- go to `streamlit run`)")
+    p.add_argument("streamlit_args", nargs=argparse.REMAINDER)
+    p.set_defaults(func=cmd_ui)
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    progress = ConsoleProgress(quiet=getattr(args, "quiet", False))
+    try:
+        return args.func(args, progress)
+    except PermissionError:
+        print("Permission denied. Run as Administrator if Balatro is installed under Program Files.", file=sys.stderr)
+        return 1
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if getattr(args, "timings", False):
+            _print_timings()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import os
+import json
+import hashlib
+import zipfile
+
+import numpy as np
+
+import app_cache
+import atlas_compose
+import exe_archive
+import hash_cache
+import mod_preflight
+import png_optimize
+
+# Delta mod packs ====================
+# Most art mods repaint a few sprites inside atlases that are otherwise the game's own, yet ship every
+# atlas whole. A delta pack keeps only what differs from the original textures in Balatro.exe.bak:
+# each changed texture is diffed on a TILE grid, changed tiles are merged into rectangles and only
+# those rectangles are stored (as PNG crops). Textures that changed almost everywhere, aren't PNGs or
+# changed size are stored whole, and textures identical to the game's are dropped. Every patched
+# texture records the CRC32 + size of the base it was made against (the guard) and a SHA-256 of the
+# expected pixels. Installing a pack rebuilds a normal mod zip from the user's .bak once, caches it by
+# the pack's hash, and hands that to the regular install path.
+MANIFEST_NAME = mod_preflight.DELTA_MANIFEST
+FORMAT = "balatro-art-delta"
+FORMAT_VERSION = 1
+REGIONS_DIR = mod_preflight.DELTA_REGIONS_DIR
+TILE = 32 # pixels; smaller finds tighter regions, larger keeps the rectangle count down
+CACHE_SUBDIR = "deltas"
+
+
+class DeltaError(RuntimeError):
+    ''' A delta pack is damaged or was made against different original textures. '''
+
+
+def _pixels_digest(arr: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(arr).tobytes()).hexdigest()
+
+def changed_regions(base: np.ndarray, mod: np.ndarray, tile: int = TILE) -> list[tuple[int, int, int, int]]:
+    '''
+    Rectangles (x, y, w, h) covering every pixel where mod differs from base (same-shape RGBA arrays).
+    Changed tiles are joined into runs along each tile row, and runs spanning the same columns in
+    consecutive rows are stacked, so a repainted sprite usually comes out as one rectangle.
+    '''
+    h, w = base.shape[:2]
+    rows, cols = -(-h // tile), -(-w // tile)
+    diff = (base != mod).any(axis=2)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:h, :w] = diff
+    changed = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+    open_runs = {} # (c0, c1) -> [r0, r1] of the rectangle still growing downwards
+    done = []
+    for r in range(rows):
+        runs = []
+        c = 0
+        while c < cols:
+            if changed[r, c]:
+                start = c
+                while c < cols and changed[r, c]:
+                    c += 1
+                runs.append((start, c))
+            else:
+                c += 1
+        grown = {}
+        for run in runs:
+            rect = open_runs.pop(run, None)
+            grown[run] = [rect[0], r + 1] if rect and rect[1] == r else [r, r + 1]
+        done += [(c0, c1, r0, r1) for (c0, c1), (r0, r1) in open_runs.items()]
+        open_runs = grown
+    done += [(c0, c1, r0, r1) for (c0, c1), (r0, r1) in open_runs.items()]
+    return [(c0 * tile, r0 * tile, min(c1 * tile, w) - c0 * tile, min(r1 * tile, h) - r0 * tile)
+            for c0, c1, r0, r1 in sorted(done, key=lambda t: (t[2], t[0]))]
+
+
+# Packing ==========
+def make_pack(mod_zip: str, base_path: str, out_path: str, tile: int = TILE, progress=None) -> dict:
+    '''
+    Write a delta pack of mod_zip against the original textures in base_path (Balatro.exe.bak).
+    Returns {"textures", "regions", "whole", "unchanged", "bytes_in", "bytes_out"}.
+    progress(fraction, message) per texture.
+    '''
+    base = exe_archive.read_layout(base_path).by_name()
+    sources = exe_archive.mod_texture_sources(mod_zip)
+    manifest = {"format": FORMAT, "version": FORMAT_VERSION, "source": os.path.basename(mod_zip),
+                "source_sha256": hash_cache.file_sha256(mod_zip), "tile": tile, "entries": {}}
+    stats = {"textures": len(sources), "regions": 0, "whole": 0, "unchanged": 0,
+             "bytes_in": os.path.getsize(mod_zip), "bytes_out": 0}
+    tmp = out_path + f".{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(tmp, "w") as z:
+            for i, src in enumerate(sources, 1):
+                if progress:
+                    progress(i / len(sources), f"Diffing {src.name}")
+                original = base.get(src.name)
+                if original is not None and exe_archive.same_entry(original, src.entry):
+                    stats["unchanged"] += 1 # the mod ships the game's own texture
+                    continue
+                data = exe_archive.read_entry_data(src.path, src.entry)
+                record = _diff_entry(src.name, data, base_path, original, tile, z, len(manifest["entries"]))
+                if record is None:
+                    z.writestr(src.name, data, compress_type=exe_archive.compress_type_for(src.name))
+                    record = {"mode": "whole"}
+                    stats["whole"] += 1
+                else:
+                    stats["regions"] += len(record["regions"])
+                manifest["entries"][src.name] = record
+            z.writestr(MANIFEST_NAME, json.dumps(manifest, indent=1), compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    stats["bytes_out"] = os.path.getsize(out_path)
+    return stats
+
+def _diff_entry(name: str, data: bytes, base_path: str, original: exe_archive.ArchiveEntry | None, tile: int,
+                z: zipfile.ZipFile, serial: int) -> dict | None:
+    ''' Store the changed rectangles of one texture in z and return its manifest record, or None to ship it whole. '''
+    if original is None or not name.lower().endswith(".png"):
+        return None
+    try:
+        base = atlas_compose.decode_rgba(exe_archive.read_entry_data(base_path, original))
+        mod = atlas_compose.decode_rgba(data)
+    except (OSError, ValueError, SyntaxError):
+        return None
+    if base.shape != mod.shape:
+        return None
+    crops = []
+    for n, (x, y, w, h) in enumerate(changed_regions(base, mod, tile)):
+        png = png_optimize.optimize_png(atlas_compose.encode_png(np.ascontiguousarray(mod[y:y + h, x:x + w])))
+        crops.append(([x, y, w, h, f"{REGIONS_DIR}{serial:05d}_{n:03d}.png"], png))
+    if sum(len(png) for _, png in crops) >= len(data): # repainted nearly everywhere: the full PNG is smaller
+        return None
+    for region, png in crops:
+        z.writestr(region[4], png, compress_type=zipfile.ZIP_STORED)
+    return {"mode": "regions", "base_crc": original.crc, "base_size": original.file_size,
+            "width": int(mod.shape[1]), "height": int(mod.shape[0]), "pixels_sha256": _pixels_digest(mod),
+            "regions": [region for region, _ in crops]}
+
+
+# Applying ==========
+def read_manifest(pack_path: str) -> dict:
+    try:
+        with zipfile.ZipFile(pack_path) as z:
+            manifest = json.loads(z.read(MANIFEST_NAME))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        raise DeltaError(f"{os.path.basename(pack_path)} is not a readable delta pack: {e}") from e
+    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+        raise DeltaError(f"{os.path.basename(pack_path)} uses an unsupported delta format.")
+    return manifest
+
+def check_base(manifest: dict, base_path: str) -> list[str]:
+    ''' Textures whose original in base_path isn't the one the pack was made against (CRC32 + size). '''
+    base = exe_archive.read_table(base_path)
+    bad = []
+    for name, rec in manifest["entries"].items():
+        if rec["mode"] != "regions":
+            continue
+        if name not in base:
+            bad.append(name)
+            continue
+        i = base.index(name)
+        if (base.crc[i], base.size[i]) != (rec["base_crc"], rec["base_size"]):
+            bad.append(name)
+    return bad
+
+def expand_pack(pack_path: str, base_path: str, progress=None) -> str:
+    '''
+    Path of an ordinary mod zip with the full textures of a delta pack, rebuilt from base_path
+    (Balatro.exe.bak) on first use and cached by the pack's SHA-256 after that.
+    '''
+    manifest = read_manifest(pack_path)
+    bad = check_base(manifest, base_path)
+    if bad:
+        raise DeltaError(f"{os.path.basename(pack_path)} was made for different original textures than this "
+                         f"Balatro install has ({len(bad)} mismatch, e.g. {bad[0]}); ask for a full mod zip.")
+    out = app_cache.cache_path(CACHE_SUBDIR, hash_cache.file_sha256(pack_path)[:32] + ".zip")
+    if os.path.isfile(out):
+        os.utime(out)
+        return out
+    base = exe_archive.read_layout(base_path).by_name()
+    entries = manifest["entries"]
+    tmp = out + f".{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(pack_path) as pack, zipfile.ZipFile(tmp, "w") as z:
+            for i, (name, rec) in enumerate(entries.items(), 1):
+                if progress:
+                    progress(i / len(entries), f"Rebuilding {name}")
+                if rec["mode"] == "whole":
+                    data = pack.read(name)
+                else:
+                    data = atlas_compose.encode_png(_rebuild(name, rec, pack, exe_archive.read_entry_data(base_path, base[name])))
+                z.writestr(name, data, compress_type=exe_archive.compress_type_for(name))
+        os.replace(tmp, out)
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise DeltaError(f"{os.path.basename(pack_path)} is damaged: {e}") from e
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+def _rebuild(name: str, rec: dict, pack: zipfile.ZipFile, base_png: bytes) -> np.ndarray:
+    ''' Paste a texture's stored rectangles over its original pixels and check the result. '''
+    arr = atlas_compose.decode_rgba(base_png)
+    if arr.shape[:2] != (rec["height"], rec["width"]):
+        raise DeltaError(f"{name}: original is {arr.shape[1]}x{arr.shape[0]}, pack expects {rec['width']}x{rec['height']}.")
+    for x, y, w, h, member in rec["regions"]:
+        crop = atlas_compose.decode_rgba(pack.read(member))
+        if crop.shape[:2] != (h, w):
+            raise DeltaError(f"{name}: region {member} has the wrong size.")
+        arr[y:y + h, x:x + w] = crop
+    if _pixels_digest(arr) != rec["pixels_sha256"]:
+        raise DeltaError(f"{name}: rebuilt pixels don't match the pack's checksum.")
+    return arr
@@ -0,0 +1,271 @@
+import os
+import time
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import app_cache
+import hash_cache
+import tracing
+
+# Download cache for URL mod sources ====================
+# Downloads land in a content-addressed store (downloads/objects/<sha256>.zip) next to an index of
+# url -> {sha256, etag, last_modified}. Once a URL is cached, installing it again is a dictionary lookup:
+# the network is only used when refresh=True, and then as a conditional GET (If-None-Match /
+# If-Modified-Since) that usually ends in a 304. Interrupted downloads keep their .part file and resume
+# with a Range request guarded by If-Range, so a changed file on the server restarts from zero instead of
+# being spliced. Files are hashed as they arrive (a resumed .part is read once for its prefix) and checked
+# against the expected digest when the caller has one. Recency for pruning is kept in the index (used_at)
+# rather than in file mtimes, which would invalidate hash_cache's rows for the cached zips on every hit.
+CACHE_SUBDIR = "downloads"
+INDEX_FILENAME = "index.json"
+CHUNK = 256 * 1024
+TIMEOUT = 30 # seconds per connect / read
+MAX_CONCURRENT = 4 # parallel fetches for batch installs
+DISK_BUDGET_BYTES = 2 * 1024 * 1024 * 1024 # cached downloads are pruned oldest-first past this
+USER_AGENT = "BalatroArtModManager"
+
+_index_lock = threading.Lock()
+_url_locks = {}
+_url_locks_guard = threading.Lock()
+
+
+class DownloadError(RuntimeError):
+    ''' A mod download failed or didn't match its expected SHA-256. '''
+
+
+def is_url(source: str) -> bool:
+    return source.lower().startswith(("http://", "https://"))
+
+def display_name(source: str) -> str:
+    ''' File name to show for a mod source: the last URL path segment, or the file's base name. '''
+    if is_url(source):
+        return os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(source).path)) or source
+    return os.path.basename(source)
+
+def _folder(*parts: str) -> str:
+    return app_cache.cache_path(CACHE_SUBDIR, *parts)
+
+def _object_path(digest: str) -> str:
+    return _folder("objects", digest[:2], digest + ".zip")
+
+def _partial_path(url: str) -> str:
+    return _folder("partial", hashlib.sha256(url.encode()).hexdigest()[:32] + ".part")
+
+def _load_index() -> dict:
+    return app_cache.load_json(_folder(INDEX_FILENAME), {}) or {}
+
+def _update_index(url: str, record: dict | None) -> None:
+    with _index_lock:
+        index = _load_index()
+        if record is None:
+            index.pop(url, None)
+        else:
+            index[url] = record
+        try:
+            app_cache.save_json_atomic(_folder(INDEX_FILENAME), index)
+        except OSError:
+            pass # the object is still cached by hash; only the URL shortcut is lost
+
+def _url_lock(url: str) -> threading.Lock:
+    with _url_locks_guard:
+        return _url_locks.setdefault(url, threading.Lock())
+
+def _mark_used(url: str, path: str) -> None:
+    ''' Note that url's cached copy was just used (pruning drops the least recently used first). '''
+    with _index_lock:
+        index = _load_index()
+        record = index.get(url)
+        if record is None or _object_path(record["sha256"]) != path:
+            return # found by digest under another URL; that URL's record stays as it is
+        record["used_at"] = time.time()
+        try:
+            app_cache.save_json_atomic(_folder(INDEX_FILENAME), index)
+        except OSError:
+            pass
+
+def cached_path(url: str, sha256: str | None = None) -> str | None:
+    ''' Path of the cached copy of url (or of any cached file with digest sha256), without touching the network. '''
+    if sha256:
+        path = _object_path(sha256.lower())
+        if os.path.isfile(path):
+            return path
+    record = _load_index().get(url)
+    if record and (not sha256 or record["sha256"] == sha256.lower()):
+        path = _object_path(record["sha256"])
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+# Fetching ==========
+def _open(url: str, headers: dict):
+    ''' urlopen returning (status, response); 304 and 416 come back as statuses instead of exceptions. '''
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **headers})
+    try:
+        r = urllib.request.urlopen(req, timeout=TIMEOUT)
+        return r.status, r
+    except urllib.error.HTTPError as e:
+        if e.code in (304, 416):
+            e.close()
+            return e.code, None
+        raise DownloadError(f"{display_name(url)}: HTTP {e.code} {e.reason}") from e
+    except (urllib.error.URLError, TimeoutError, OSError) as e:
+        raise DownloadError(f"Couldn't download {display_name(url)}: {getattr(e, 'reason', e)}") from e
+
+def _validators(r) -> dict:
+    return {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+
+def _hash_prefix(path: str, length: int):
+    ''' sha256 object fed with the first length bytes of path (what a resumed download already has). '''
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0 and (chunk := f.read(min(CHUNK, length))):
+            h.update(chunk)
+            length -= len(chunk)
+    return h
+
+def _download(url: str, record: dict | None, progress=None) -> tuple[str | None, dict, str | None]:
+    '''
+    GET url into its .part file, resuming a previous attempt and revalidating record if given.
+    Returns (part path, validators, SHA-256), or (None, validators, None) when the server says record
+    is still current.
+    '''
+    part = _partial_path(url)
+    meta_path = part + ".json"
+    have = os.path.getsize(part) if os.path.isfile(part) else 0
+    meta = app_cache.load_json(meta_path, {}) if have else {}
+    headers = {}
+    if record:
+        if record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+    if have and (meta.get("etag") or meta.get("last_modified")):
+        headers["Range"] = f"bytes={have}-"
+        headers["If-Range"] = meta.get("etag") or meta["last_modified"] # server sends it all if the file changed
+
+    status, r = _open(url, headers)
+    if status == 304:
+        return None, {k: record.get(k) for k in ("etag", "last_modified")}, None
+    if status == 416:
+        if not have:
+            raise DownloadError(f"{display_name(url)}: HTTP 416 Range Not Satisfiable")
+        os.remove(part) # our partial file is no longer a prefix of anything: start over
+        return _download(url, record, progress)
+    with r:
+        validators = _validators(r)
+        resumed = status == 206
+        if not resumed:
+            have = 0
+        length = r.headers.get("Content-Length")
+        total = have + int(length) if length and length.isdigit() else None
+        app_cache.save_json_atomic(meta_path, validators)
+        h = _hash_prefix(part, have) if resumed else hashlib.sha256()
+        done = have
+        with open(part, "ab" if resumed else "wb") as f, tracing.span("download.fetch", nested_only=True,
+                                                                       resumed_from=have) as s:
+            try:
+                while chunk := r.read(CHUNK):
+                    f.write(chunk)
+                    h.update(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total or done)
+            except (OSError, http.client.HTTPException) as e: # what arrived stays in the .part file
+                raise DownloadError(f"{display_name(url)}: download interrupted after {done} bytes ({e}); "
+                                    "try again to resume.") from e
+            finally:
+                s.add(bytes=done - have, files=1)
+    if total is not None and done != total:
+        raise DownloadError(f"{display_name(url)}: connection closed after {done} of {total} bytes; try again to resume.")
+    return part, validators, h.hexdigest()
+
+def fetch(url: str, sha256: str | None = None, refresh: bool = False, progress=None) -> str:
+    '''
+    Local path of the mod at url, downloading it only if it isn't cached yet (or, with refresh=True,
+    if the server has a newer copy). sha256, when known, is checked and also lets any cached file
+    with that digest be reused. progress(done_bytes, total_bytes) while downloading.
+    '''
+    expected = sha256.lower() if sha256 else None
+    with _url_lock(url):
+        hit = cached_path(url, expected)
+        if hit and not refresh:
+            _mark_used(url, hit)
+            return hit
+        record = _load_index().get(url) if hit else None
+        with tracing.span("download", url=display_name(url), refresh=refresh) as s:
+            part, validators, digest = _download(url, record, progress)
+            if part is None: # 304: what we have is current
+                _update_index(url, {**record, **{k: v for k, v in validators.items() if v},
+                                    "checked_at": time.time(), "used_at": time.time()})
+                return hit
+            if expected and digest != expected:
+                for leftover in (part, part + ".json"):
+                    try: os.remove(leftover)
+                    except OSError: pass
+                raise DownloadError(f"{display_name(url)} failed verification: expected SHA-256 {expected}, got {digest}.")
+            path = _object_path(digest)
+            os.replace(part, path)
+            try: os.remove(part + ".json")
+            except OSError: pass
+            hash_cache.remember(path, digest)
+            _update_index(url, {"sha256": digest, "size": os.path.getsize(path), **validators,
+                                "fetched_at": time.time(), "checked_at": time.time(), "used_at": time.time()})
+            s.add(bytes=os.path.getsize(path), files=1)
+        prune()
+        return path
+
+def fetch_many(urls: list[str], refresh: bool = False, workers: int | None = None, progress=None) -> list[str]:
+    '''
+    fetch() several URLs, at most MAX_CONCURRENT at a time; returns local paths in the same order.
+    progress(fraction, message) as each one finishes. The first failure is raised after the others end.
+    '''
+    unique = list(dict.fromkeys(urls))
+    paths = {}
+    errors = []
+    finished = []
+
+    def one(url: str) -> None:
+        try:
+            paths[url] = fetch(url, refresh=refresh)
+        except DownloadError as e:
+            errors.append(e)
+        finished.append(url)
+        if progress:
+            progress(len(finished) / len(unique), f"Downloaded {display_name(url)}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or MAX_CONCURRENT, len(unique)))) as pool:
+        list(pool.map(one, unique))
+    if errors:
+        raise errors[0]
+    return [paths[u] for u in urls]
+
+def prune(budget: int = DISK_BUDGET_BYTES) -> None:
+    ''' Delete the least recently used cached downloads until the store fits in budget bytes. '''
+    used = {}
+    for record in _load_index().values():
+        stamp = record.get("used_at") or record.get("fetched_at") or 0
+        used[record["sha256"]] = max(used.get(record["sha256"], 0), stamp)
+    files = []
+    for folder, _, names in os.walk(os.path.dirname(_folder("objects", "x"))):
+        for name in names:
+            p = os.path.join(folder, name)
+            try:
+                st_ = os.stat(p)
+            except OSError:
+                continue
+            files.append((used.get(os.path.splitext(name)[0], st_.st_mtime), st_.st_size, p))
+    total = sum(size for _, size, _ in files)
+    for _, size, p in sorted(files):
+        if total <= budget:
+            break
+        try:
+            os.remove(p)
+            total -= size
+        except OSError:
+            pass
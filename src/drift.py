@@ -0,0 +1,137 @@
+import os
+import time
+from dataclasses import dataclass, field
+
+import exe_archive
+
+# Drift detection for modded installs ====================
+# A Steam update or "verify integrity of game files" can put original art back into Balatro.exe, or
+# replace only some of it, without telling anyone. Every install, restore and snapshot restore leaves
+# an install manifest behind (the name, CRC32 and size of each entry that differs from Balatro.exe.bak),
+# and checking for drift compares that manifest with the EXE's and the .bak's central directories: no
+# entry is inflated or hashed, so a check costs two directory reads plus a stat of the StreamingAssets
+# backup, and nothing but a stat when Balatro.exe still has the size and mtime the manifest recorded.
+# StreamingAssets are compared with their backup by size and mtime only.
+MANIFEST_VERSION = 1
+MTIME_SLACK = 2.0 # seconds; FAT/exFAT libraries store mtimes at 2 s resolution
+
+
+@dataclass
+class DriftReport:
+    ''' What no longer matches the last recorded install. Entry lists hold archive entry names. '''
+    manifest: bool = False # False: nothing recorded yet, only the .bak comparison ran
+    label: str = ""
+    reverted: list = field(default_factory=list) # back to the original art (matches the .bak)
+    changed: list = field(default_factory=list) # neither what we installed nor the original
+    missing: list = field(default_factory=list) # no longer in the EXE at all
+    unexpected: list = field(default_factory=list) # modded, but not by us
+    assets_missing: list = field(default_factory=list) # StreamingAssets files gone since the backup
+    assets_changed: list = field(default_factory=list)
+    assets_extra: list = field(default_factory=list)
+    problems: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def drifted(self) -> list[str]:
+        ''' Entries a re-apply would write back. '''
+        return self.reverted + self.changed + self.missing
+
+    @property
+    def ok(self) -> bool:
+        return not (self.drifted or self.unexpected or self.assets_missing or self.assets_changed or self.problems)
+
+
+def build_manifest(exe_path: str, label: str, snapshot_id: str | None = None) -> dict:
+    ''' Install manifest for the EXE as it is now: every entry that differs from (or is missing in) the .bak. '''
+    table = exe_archive.read_table(exe_path)
+    bak = exe_path + ".bak"
+    if os.path.isfile(bak):
+        original = exe_archive.read_table(bak)
+        changed, added, _ = table.diff(original)
+        names = changed + added
+    else:
+        names = [] # no backup yet: nothing has been modded
+    st_ = os.stat(exe_path)
+    return {"version": MANIFEST_VERSION, "label": label, "snapshot": snapshot_id, "recorded": time.time(),
+            "exe_size": st_.st_size, "exe_mtime_ns": st_.st_mtime_ns,
+            "entries": {n: [table.crc[table.index(n)], table.size[table.index(n)]] for n in names}}
+
+def compare_dirs(folder: str, backup: str) -> tuple[list[str], list[str], list[str]]:
+    ''' (missing, changed, extra) relative paths of folder against its backup copy, by size and mtime. '''
+    def listing(root: str) -> dict[str, os.stat_result]:
+        out = {}
+        for base, _, names in os.walk(root):
+            for name in names:
+                full = os.path.join(base, name)
+                try:
+                    out[os.path.relpath(full, root).replace(os.sep, "/")] = os.stat(full)
+                except OSError:
+                    pass
+        return out
+
+    now, saved = listing(folder), listing(backup)
+    missing = sorted(rel for rel in saved if rel not in now)
+    extra = sorted(rel for rel in now if rel not in saved)
+    changed = sorted(rel for rel, s in saved.items() if rel in now and
+                     (now[rel].st_size != s.st_size or abs(now[rel].st_mtime - s.st_mtime) > MTIME_SLACK))
+    return missing, changed, extra
+
+def check_drift(exe_path: str, manifest: dict | None, assets_dir: str | None = None,
+                assets_backup: str | None = None) -> DriftReport:
+    '''
+    Compare Balatro.exe with the recorded install manifest and Balatro.exe.bak (central directories only),
+    and StreamingAssets with its backup when both exist.
+    '''
+    started = time.perf_counter()
+    report = DriftReport(manifest=manifest is not None, label=(manifest or {}).get("label", ""))
+    if not (manifest and _untouched(exe_path, manifest)): # else: nothing wrote the EXE since it was recorded
+        _check_entries(report, exe_path, manifest)
+    if assets_dir and assets_backup and os.path.isdir(assets_backup):
+        if os.path.isdir(assets_dir):
+            report.assets_missing, report.assets_changed, report.assets_extra = compare_dirs(assets_dir, assets_backup)
+        else:
+            report.problems.append(f"StreamingAssets folder is missing ({assets_dir}).")
+    report.seconds = time.perf_counter() - started
+    return report
+
+def _untouched(exe_path: str, manifest: dict) -> bool:
+    try:
+        st_ = os.stat(exe_path)
+    except OSError:
+        return False
+    return (st_.st_size, st_.st_mtime_ns) == (manifest.get("exe_size"), manifest.get("exe_mtime_ns")) \
+        and (not manifest.get("entries") or os.path.isfile(exe_path + ".bak"))
+
+def _check_entries(report: DriftReport, exe_path: str, manifest: dict | None) -> None:
+    ''' Fill report's entry lists from the EXE's and the .bak's central directories. '''
+    try:
+        table = exe_archive.read_table(exe_path)
+    except (OSError, exe_archive.ArchiveError) as e:
+        report.problems.append(f"{os.path.basename(exe_path)} is not a readable archive: {e}")
+        return
+    original = None
+    bak = exe_path + ".bak"
+    if os.path.isfile(bak):
+        try:
+            original = exe_archive.read_table(bak)
+        except (OSError, exe_archive.ArchiveError) as e:
+            report.problems.append(f"{os.path.basename(bak)} is not a readable archive: {e}")
+    elif manifest and manifest.get("entries"):
+        report.problems.append(f"{os.path.basename(bak)} is missing, so the original art can't be restored.")
+
+    expected = (manifest or {}).get("entries", {})
+    for name, (crc, size) in expected.items():
+        if name not in table:
+            report.missing.append(name)
+            continue
+        i = table.index(name)
+        if (table.crc[i], table.size[i]) == (crc, size):
+            continue
+        j = original.index(name) if original is not None and name in original else None
+        if j is not None and (table.crc[i], table.size[i]) == (original.crc[j], original.size[j]):
+            report.reverted.append(name)
+        else:
+            report.changed.append(name)
+    if original is not None:
+        changed, added, _ = table.diff(original)
+        report.unexpected = [n for n in changed + added if n not in expected] if manifest is not None else []
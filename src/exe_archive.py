@@ -0,0 +1,874 @@
+import os
+import hashlib
+import mmap
+import zlib
+import struct
+from array import array
+from dataclasses import dataclass, field
+
+# Native patching of the zip payload fused onto Balatro.exe ====================
+# Balatro.exe is the LOVE runtime with the game zip appended ("fused"), so the zip's end-of-central-
+# directory (EOCD) record sits at the very end of the file and its offsets are relative to where the
+# zip starts (after the PE stub). Instead of staging an extraction and letting 7z rewrite the whole
+# EXE, new entries are copied raw (still compressed) out of the mod zip, written after the last live
+# entry, and a fresh central directory + EOCD is written behind them. Unchanged entries never move.
+# Every in-place write is journaled so a crash can be rolled back, the archive is rebuilt once patches
+# have left too much unused space behind, and restoring from Balatro.exe.bak gives back its exact bytes.
+TEXTURE_PREFIX = "resources/textures/2x/" # only this part of a mod zip is ever applied
+COPY_CHUNK = 1024 * 1024
+COMPACT_MIN_BYTES = 8 * 1024 * 1024 # patch_archive rebuilds once earlier patches left this much unused space
+COMPACT_RATIO = 0.25 # ... and it is more than this share of the zip
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAGIC = b"BAMMJRN1"
+REBUILD_SUFFIX = ".rebuilding"
+
+EOCD_SIG = b"PK\x05\x06"
+ZIP64_EOCD_SIG = b"PK\x06\x06"
+ZIP64_LOCATOR_SIG = b"PK\x06\x07"
+CENTRAL_SIG = b"PK\x01\x02"
+LOCAL_SIG = b"PK\x03\x04"
+DESCRIPTOR_SIG = b"PK\x07\x08"
+
+EOCD_STRUCT = struct.Struct("<4s4H2LH")
+ZIP64_LOCATOR_STRUCT = struct.Struct("<4sLQL")
+ZIP64_EOCD_STRUCT = struct.Struct("<4sQ2H2L4Q")
+CENTRAL_STRUCT = struct.Struct("<4s4B4HL2L5H2L")
+LOCAL_STRUCT = struct.Struct("<4s2B4HL2L2H")
+
+FLAG_ENCRYPTED = 0x1
+FLAG_DATA_DESCRIPTOR = 0x8
+FLAG_UTF8 = 0x800
+SUPPORTED_METHODS = (0, 8) # stored / deflate: all LOVE (PhysFS) can read
+STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".ogg") # already compressed: deflating again only costs time
+MAX_32 = 0xFFFFFFFF
+MAX_16 = 0xFFFF
+
+
+class ArchiveError(RuntimeError):
+    ''' Raised when an archive cannot be read or patched safely. '''
+
+
+@dataclass
+class ArchiveEntry:
+    ''' One central-directory record. Offsets are absolute positions in the file. '''
+    name: str
+    header_offset: int
+    compress_type: int
+    compress_size: int
+    file_size: int
+    crc: int
+    flag_bits: int = 0
+    dos_time: int = 0
+    dos_date: int = 0
+    cd_pos: int = -1 # where the raw record sits inside the central directory (-1 = not from disk)
+    cd_len: int = 0
+
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+
+@dataclass
+class ArchiveLayout:
+    ''' Where the pieces of a (possibly fused) zip live inside a file. '''
+    path: str
+    file_size: int
+    concat: int # bytes in front of the zip (the PE stub for Balatro.exe)
+    cd_offset: int # absolute
+    cd_size: int
+    comment: bytes
+    zip64: bool
+    entries: list[ArchiveEntry] = field(default_factory=list)
+
+    def by_name(self) -> dict[str, ArchiveEntry]:
+        return {e.name: e for e in self.entries}
+
+
+@dataclass
+class EntrySource:
+    ''' An entry to write: raw compressed bytes copied out of another zip (or a bare blob file). '''
+    name: str
+    path: str
+    entry: ArchiveEntry
+    data_offset: int | None = None # set for blob files; None = find the data via the zip's local header
+
+
+@dataclass
+class PatchReport:
+    ''' What patch_archive changed. '''
+    replaced: list[str] = field(default_factory=list)
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0 # entries left alone by sync_archive
+    bytes_written: int = 0
+    size_before: int = 0
+    size_after: int = 0
+    full_copy: bool = False # the whole file was copied (a caller's fallback, or sync_archive_to with most of it changed)
+    compacted: bool = False # patch_archive rebuilt the archive to drop the space earlier patches left unused
+
+
+# Reading ==========================================
+def _find_eocd(f, file_size: int) -> tuple[int, tuple]:
+    ''' Locate and unpack the end-of-central-directory record (searching past any comment). '''
+    tail_len = min(file_size, EOCD_STRUCT.size + MAX_16)
+    f.seek(file_size - tail_len)
+    tail = f.read(tail_len)
+    pos = tail.rfind(EOCD_SIG)
+    while pos >= 0:
+        if pos + EOCD_STRUCT.size <= len(tail):
+            rec = EOCD_STRUCT.unpack_from(tail, pos)
+            if pos + EOCD_STRUCT.size + rec[7] == len(tail): # comment must run to end of file
+                return file_size - tail_len + pos, rec
+        pos = tail.rfind(EOCD_SIG, 0, pos)
+    raise ArchiveError("No zip end-of-central-directory record found (not a zip / fused EXE?).")
+
+def _parse_zip64_extra(extra: bytes, file_size: int, compress_size: int, header_offset: int) -> tuple[int, int, int]:
+    ''' Pull 64-bit sizes/offset out of a ZIP64 extra field for the values that overflowed. '''
+    i = 0
+    while i + 4 <= len(extra):
+        tag, size = struct.unpack_from("<2H", extra, i)
+        if tag == 0x0001:
+            data = extra[i + 4:i + 4 + size]
+            vals = list(struct.unpack_from(f"<{len(data) // 8}Q", data))
+            if file_size == MAX_32 and vals:
+                file_size = vals.pop(0)
+            if compress_size == MAX_32 and vals:
+                compress_size = vals.pop(0)
+            if header_offset == MAX_32 and vals:
+                header_offset = vals.pop(0)
+            break
+        i += 4 + size
+    return file_size, compress_size, header_offset
+
+def read_layout(path) -> ArchiveLayout:
+    ''' Read a zip's central directory (works for plain zips, zips fused onto an EXE, or open binary files). '''
+    if hasattr(path, "read"):
+        return _read_layout(path, getattr(path, "name", "<upload>"))
+    with open(path, "rb") as f:
+        return _read_layout(f, path)
+
+def _locate_directory(f) -> tuple[int, int, int, int, int, bytes, bool]:
+    ''' (file_size, concat, cd_offset, cd_size, entry count, comment, zip64) for a file or mmap. '''
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    eocd_pos, rec = _find_eocd(f, file_size)
+    count, cd_size, cd_rel = rec[4], rec[5], rec[6]
+    f.seek(eocd_pos + EOCD_STRUCT.size)
+    comment = f.read(rec[7])
+    zip64 = False
+    anchor = eocd_pos # position the central directory ends at
+    if eocd_pos >= ZIP64_LOCATOR_STRUCT.size:
+        f.seek(eocd_pos - ZIP64_LOCATOR_STRUCT.size)
+        loc = ZIP64_LOCATOR_STRUCT.unpack(f.read(ZIP64_LOCATOR_STRUCT.size))
+        if loc[0] == ZIP64_LOCATOR_SIG:
+            zip64 = True
+            anchor = eocd_pos - ZIP64_LOCATOR_STRUCT.size - ZIP64_EOCD_STRUCT.size
+            f.seek(anchor)
+            z64 = ZIP64_EOCD_STRUCT.unpack(f.read(ZIP64_EOCD_STRUCT.size))
+            if z64[0] != ZIP64_EOCD_SIG:
+                raise ArchiveError("Corrupt ZIP64 end-of-central-directory record.")
+            count, cd_size, cd_rel = z64[7], z64[8], z64[9]
+
+    concat = anchor - cd_size - cd_rel
+    if concat < 0:
+        raise ArchiveError("Central directory offsets point outside the file.")
+    return file_size, concat, cd_rel + concat, cd_size, count, comment, zip64
+
+def _read_layout(f, path: str) -> ArchiveLayout:
+    file_size, concat, cd_offset, cd_size, count, comment, zip64 = _locate_directory(f)
+    f.seek(cd_offset)
+    cd = f.read(cd_size)
+
+    entries = []
+    pos = 0
+    for _ in range(count):
+        if cd[pos:pos + 4] != CENTRAL_SIG:
+            raise ArchiveError("Corrupt central directory record.")
+        (_, _, _, _, _, flags, method, t, d, crc, csize, usize,
+         n, m, k, _, _, _, rel) = CENTRAL_STRUCT.unpack_from(cd, pos)
+        start = pos + CENTRAL_STRUCT.size
+        raw_name = cd[start:start + n]
+        name = raw_name.decode("utf-8" if flags & FLAG_UTF8 else "cp437")
+        if MAX_32 in (csize, usize, rel):
+            usize, csize, rel = _parse_zip64_extra(cd[start + n:start + n + m], usize, csize, rel)
+        rec_len = CENTRAL_STRUCT.size + n + m + k
+        entries.append(ArchiveEntry(name, rel + concat, method, csize, usize, crc,
+                                    flags, t, d, pos, rec_len))
+        pos += rec_len
+    return ArchiveLayout(path, file_size, concat, cd_offset, cd_size, comment, zip64, entries)
+
+def entry_data_offset(f, entry: ArchiveEntry) -> int:
+    ''' Absolute offset of an entry's (compressed) data, read from its local header. '''
+    f.seek(entry.header_offset)
+    hdr = f.read(LOCAL_STRUCT.size)
+    if len(hdr) != LOCAL_STRUCT.size or hdr[:4] != LOCAL_SIG:
+        raise ArchiveError(f"Bad local header for {entry.name}.")
+    n, m = struct.unpack_from("<2H", hdr, 26)
+    return entry.header_offset + LOCAL_STRUCT.size + n + m
+
+def source_data_offset(f, src: EntrySource) -> int:
+    ''' Offset of a source's raw data inside its file. '''
+    return src.data_offset if src.data_offset is not None else entry_data_offset(f, src.entry)
+
+def entry_record_end(f, entry: ArchiveEntry) -> int:
+    ''' Absolute offset just past an entry's local record (header, data and any data descriptor). '''
+    end = entry_data_offset(f, entry) + entry.compress_size
+    if entry.flag_bits & FLAG_DATA_DESCRIPTOR:
+        f.seek(end)
+        sig = f.read(4)
+        end += 4 if sig == DESCRIPTOR_SIG else 0
+        wide = entry.compress_size >= MAX_32 or entry.file_size >= MAX_32
+        end += 20 if wide else 12
+    return end
+
+def compress_type_for(name: str) -> int:
+    ''' Compression policy for entries we write ourselves: store media, deflate everything else. '''
+    return 0 if name.lower().endswith(STORED_EXTENSIONS) else 8
+
+def read_entry_data(path: str, entry: ArchiveEntry) -> bytes:
+    ''' An entry's uncompressed bytes (for small entries such as single textures). '''
+    with open(path, "rb") as f:
+        f.seek(entry_data_offset(f, entry))
+        raw = f.read(entry.compress_size)
+    if len(raw) != entry.compress_size:
+        raise ArchiveError(f"{entry.name} is truncated.")
+    if entry.compress_type == 8:
+        return zlib.decompress(raw, -15)
+    if entry.compress_type == 0:
+        return raw
+    raise ArchiveError(f"{entry.name} uses compression method {entry.compress_type}; only stored/deflate are supported.")
+
+def is_safe_member_name(name: str) -> bool:
+    ''' Same rule safe_join enforces: relative, no drive, no ".." components. '''
+    if not name or name.startswith(("/", "\\")) or ":" in name:
+        return False
+    return ".." not in name.replace("\\", "/").split("/")
+
+def mod_texture_sources(zip_path: str, prefix: str = TEXTURE_PREFIX) -> list[EntrySource]:
+    ''' Entries of a mod zip that would be written into the EXE (files under prefix). '''
+    out = []
+    for e in read_layout(zip_path).entries:
+        name = e.name.replace("\\", "/")
+        if e.is_dir() or not name.startswith(prefix):
+            continue
+        if not is_safe_member_name(name):
+            raise ArchiveError(f"Unsafe path in archive: {e.name}")
+        out.append(EntrySource(name, zip_path, e))
+    return out
+
+def overlay_sources(zip_paths: list[str], prefix: str = TEXTURE_PREFIX) -> list[EntrySource]:
+    ''' Merge several mod zips into one virtual overlay; when paths collide the later zip wins. '''
+    merged = {}
+    for z in zip_paths:
+        for s in mod_texture_sources(z, prefix):
+            merged[s.name] = s
+    return list(merged.values())
+
+
+# Memory-mapped reading ==========================================
+# read_layout builds one ArchiveEntry object per file, which is what the patcher wants. To just ask what
+# is inside a several-hundred-MB Balatro.exe (listing, verifying, comparing with the .bak) the file is
+# memory-mapped instead: the central directory is parsed in place into parallel arrays, and entry data
+# can be streamed as memoryview slices of the mapping without copying it.
+class EntryTable:
+    ''' Central directory as parallel arrays, one slot per entry (built by read_table / MappedArchive). '''
+
+    def __init__(self, path: str, file_size: int, concat: int, cd_offset: int, cd_size: int,
+                 comment: bytes, zip64: bool):
+        self.path = path
+        self.file_size = file_size
+        self.concat = concat
+        self.cd_offset = cd_offset # absolute
+        self.cd_size = cd_size
+        self.comment = comment
+        self.zip64 = zip64
+        self.names = []
+        self.header_offset = array("Q") # absolute
+        self.compress_size = array("Q")
+        self.size = array("Q")
+        self.crc = array("I")
+        self.method = array("H")
+        self.flags = array("H")
+        self.dos_time = array("H")
+        self.dos_date = array("H")
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names_index()
+
+    def _names_index(self) -> dict[str, int]:
+        if self._index is None:
+            self._index = {n: i for i, n in enumerate(self.names)}
+        return self._index
+
+    def index(self, name: str) -> int:
+        ''' Slot of an entry by name (the last one wins for duplicated names); KeyError if missing. '''
+        return self._names_index()[name]
+
+    def entry(self, key) -> ArchiveEntry:
+        ''' ArchiveEntry for a slot or name, for code that works on read_layout results. '''
+        i = key if isinstance(key, int) else self.index(key)
+        return ArchiveEntry(self.names[i], self.header_offset[i], self.method[i], self.compress_size[i],
+                            self.size[i], self.crc[i], self.flags[i], self.dos_time[i], self.dos_date[i])
+
+    def diff(self, other: "EntryTable") -> tuple[list[str], list[str], list[str]]:
+        ''' (changed, added, removed) entry names of self relative to other, by CRC32 and size. '''
+        theirs = other._names_index()
+        changed, added = [], []
+        for i, name in enumerate(self.names):
+            j = theirs.get(name)
+            if j is None:
+                added.append(name)
+            elif self.crc[i] != other.crc[j] or self.size[i] != other.size[j]:
+                changed.append(name)
+        mine = self._names_index()
+        return changed, added, [n for n in other.names if n not in mine]
+
+    def fingerprint(self) -> str:
+        ''' SHA-256 of the stub length and every entry's name, CRC32 and size: equal for archives with the same content. '''
+        h = hashlib.sha256(str(self.concat).encode())
+        h.update("\0".join(self.names).encode("utf-8", "surrogateescape"))
+        h.update(self.crc.tobytes())
+        h.update(self.size.tobytes())
+        return h.hexdigest()
+
+
+def _parse_table(buf, path: str) -> EntryTable:
+    ''' Build an EntryTable straight out of a mapped (or in-memory) archive without copying the directory. '''
+    file_size, concat, cd_offset, cd_size, count, comment, zip64 = _locate_directory(buf)
+    if cd_offset + cd_size > file_size:
+        raise ArchiveError("Central directory runs past the end of the file.")
+    t = EntryTable(path, file_size, concat, cd_offset, cd_size, comment, zip64)
+    mv = memoryview(buf)
+    unpack = CENTRAL_STRUCT.unpack_from
+    fixed = CENTRAL_STRUCT.size
+    names, offs, csizes, sizes, crcs = t.names.append, t.header_offset.append, t.compress_size.append, t.size.append, t.crc.append
+    methods, flags_, times, dates = t.method.append, t.flags.append, t.dos_time.append, t.dos_date.append
+    pos = cd_offset
+    end = cd_offset + cd_size
+    try:
+        for _ in range(count):
+            if pos + fixed > end:
+                raise ArchiveError("Corrupt central directory record.")
+            (sig, _, _, _, _, flags, method, tm, dt, crc, csize, usize,
+             n, m, k, _, _, _, rel) = unpack(mv, pos)
+            if sig != CENTRAL_SIG:
+                raise ArchiveError("Corrupt central directory record.")
+            start = pos + fixed
+            names(str(mv[start:start + n], "utf-8" if flags & FLAG_UTF8 else "cp437"))
+            if MAX_32 in (csize, usize, rel):
+                usize, csize, rel = _parse_zip64_extra(bytes(mv[start + n:start + n + m]), usize, csize, rel)
+            offs(rel + concat)
+            csizes(csize)
+            sizes(usize)
+            crcs(crc)
+            methods(method)
+            flags_(flags)
+            times(tm)
+            dates(dt)
+            pos = start + n + m + k
+    finally:
+        mv.release()
+    return t
+
+
+class MappedArchive:
+    '''
+    A memory-mapped zip or fused EXE:  with MappedArchive(path) as a:  a.table, a.raw(name), a.stream(name).
+    raw() and stored stream() chunks are views into the mapping; release them before the archive closes.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            if os.fstat(self._f.fileno()).st_size == 0:
+                raise ArchiveError(f"{os.path.basename(path)} is empty.")
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._f.close()
+            raise
+        self._mv = memoryview(self._mm)
+        try:
+            self.table = _parse_table(self._mm, path)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> "MappedArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mv.release()
+        try:
+            self._mm.close()
+        except BufferError: # a caller still holds a view; the mapping goes away with it
+            pass
+        self._f.close()
+
+    def _slot(self, key) -> int:
+        return key if isinstance(key, int) else self.table.index(key)
+
+    def data_offset(self, key) -> int:
+        ''' Absolute offset of an entry's compressed data (read from its local header). '''
+        i = self._slot(key)
+        off = self.table.header_offset[i]
+        if self._mv[off:off + 4] != LOCAL_SIG:
+            raise ArchiveError(f"Bad local header for {self.table.names[i]}.")
+        n, m = struct.unpack_from("<2H", self._mv, off + 26)
+        return off + LOCAL_STRUCT.size + n + m
+
+    def raw(self, key) -> memoryview:
+        ''' An entry's compressed bytes as a zero-copy view of the mapping. '''
+        i = self._slot(key)
+        start = self.data_offset(i)
+        end = start + self.table.compress_size[i]
+        if end > self.table.cd_offset:
+            raise ArchiveError(f"{self.table.names[i]} runs into the central directory.")
+        return self._mv[start:end]
+
+    def stream(self, key, chunk: int = COPY_CHUNK):
+        ''' Yield an entry's uncompressed bytes: views of the mapping when stored, inflated chunks when deflated. '''
+        i = self._slot(key)
+        method = self.table.method[i]
+        if method not in SUPPORTED_METHODS:
+            raise ArchiveError(f"{self.table.names[i]} uses compression method {method}; only stored/deflate are supported.")
+        data = self.raw(i)
+        try:
+            inflater = zlib.decompressobj(-15) if method == 8 else None
+            for pos in range(0, len(data), chunk):
+                piece = data[pos:pos + chunk]
+                if inflater is None:
+                    yield piece
+                else:
+                    out = inflater.decompress(piece)
+                    piece.release()
+                    if out:
+                        yield out
+            if inflater is not None:
+                tail = inflater.flush()
+                if tail:
+                    yield tail
+        finally:
+            data.release()
+
+    def read(self, key) -> bytes:
+        ''' An entry's uncompressed bytes. '''
+        return b"".join(bytes(p) for p in self.stream(key))
+
+def read_table(path: str) -> EntryTable:
+    ''' List an archive through a memory map: names, offsets, sizes and CRCs as arrays, nothing inflated. '''
+    with MappedArchive(path) as a:
+        return a.table
+
+# Writing ==========================================
+def _local_header(name_bytes: bytes, e: ArchiveEntry, flags: int) -> bytes:
+    return LOCAL_STRUCT.pack(LOCAL_SIG, 20, 0, flags, e.compress_type, e.dos_time, e.dos_date,
+                             e.crc, e.compress_size, e.file_size, len(name_bytes), 0) + name_bytes
+
+def _central_record(name_bytes: bytes, e: ArchiveEntry, flags: int, rel_offset: int) -> bytes:
+    return CENTRAL_STRUCT.pack(CENTRAL_SIG, 20, 0, 20, 0, flags, e.compress_type, e.dos_time, e.dos_date,
+                               e.crc, e.compress_size, e.file_size, len(name_bytes), 0, 0,
+                               0, 0, 0, rel_offset) + name_bytes
+
+def _encode_name(name: str) -> tuple[bytes, int]:
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return name.encode("utf-8"), FLAG_UTF8
+
+def entry_problem(name: str, e: ArchiveEntry) -> str | None:
+    ''' Why an entry cannot be written into the EXE, or None if it can. '''
+    if e.flag_bits & FLAG_ENCRYPTED:
+        return f"{name} is encrypted; LOVE cannot read encrypted entries."
+    if e.compress_type not in SUPPORTED_METHODS:
+        return f"{name} uses compression method {e.compress_type}; only stored/deflate are supported."
+    if max(e.compress_size, e.file_size) >= MAX_32:
+        return f"{name} is too large for a non-ZIP64 archive."
+    return None
+
+def _check_source(src: EntrySource) -> None:
+    problem = entry_problem(src.name, src.entry)
+    if problem:
+        raise ArchiveError(problem)
+
+def _copy_range(src, dst, start: int, length: int, progress=None, done: int = 0, total: int = 0) -> int:
+    src.seek(start)
+    left = length
+    while left:
+        chunk = src.read(min(COPY_CHUNK, left))
+        if not chunk:
+            raise ArchiveError("Source zip ended early.")
+        dst.write(chunk)
+        left -= len(chunk)
+        done += len(chunk)
+        if progress:
+            progress(done, total)
+    return done
+
+def _write_local_records(f, sources: list[EntrySource], concat: int, progress=None) -> dict[str, bytes]:
+    ''' Write local header + raw data for each source at f's position; return their central records. '''
+    total = sum(s.entry.compress_size for s in sources)
+    done = 0
+    records = {}
+    src_files = {}
+    try:
+        for s in sources:
+            fh = src_files.get(s.path)
+            if fh is None:
+                fh = src_files[s.path] = open(s.path, "rb")
+            pos = f.tell()
+            name_bytes, flags = _encode_name(s.name)
+            flags |= s.entry.flag_bits & 0x6 # keep the deflate level bits, drop descriptor/encryption
+            f.write(_local_header(name_bytes, s.entry, flags))
+            done = _copy_range(fh, f, source_data_offset(fh, s), s.entry.compress_size, progress, done, total)
+            records[s.name] = _central_record(name_bytes, s.entry, flags, pos - concat)
+    finally:
+        for fh in src_files.values():
+            fh.close()
+    return records
+
+def _write_eocd(f, count: int, cd_start: int, cd_end: int, concat: int, comment: bytes) -> None:
+    if count > MAX_16 or cd_end - concat > MAX_32:
+        raise ArchiveError("Archive would need ZIP64, which is not supported for writing.")
+    f.write(EOCD_STRUCT.pack(EOCD_SIG, 0, 0, count, count, cd_end - cd_start, cd_start - concat, len(comment)))
+    f.write(comment)
+
+def build_archive(out_path: str, stub_path: str | None, sources: list[EntrySource], comment: bytes = b"", progress=None,
+                  stub_size: int | None = None) -> int:
+    '''
+    Write a brand new (optionally fused) archive: stub bytes (the first stub_size bytes of stub_path,
+    default all of it), then sources in order. Returns its size.
+    '''
+    for s in sources:
+        _check_source(s)
+    with open(out_path, "wb") as f:
+        if stub_path:
+            with open(stub_path, "rb") as stub:
+                _copy_range(stub, f, 0, os.fstat(stub.fileno()).st_size if stub_size is None else stub_size)
+        concat = f.tell()
+        records = _write_local_records(f, sources, concat, progress)
+        cd_start = f.tell()
+        for rec in records.values():
+            f.write(rec)
+        _write_eocd(f, len(records), cd_start, f.tell(), concat, comment)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+def _payload_start(layout: ArchiveLayout) -> int:
+    ''' Where the first entry record starts; the stub ends there even in zips written with absolute offsets. '''
+    return min([e.header_offset for e in layout.entries] + [layout.cd_offset])
+
+def _record_size(e: ArchiveEntry) -> int:
+    ''' An entry's local record size estimated from its central record (the two carry about the same name/extra). '''
+    return LOCAL_STRUCT.size + e.cd_len - CENTRAL_STRUCT.size + e.compress_size
+
+def patch_archive(archive_path: str, sources: list[EntrySource], removals=(), progress=None,
+                  layout: ArchiveLayout | None = None) -> PatchReport:
+    '''
+    Replace/add the given entries (and drop removals) in a zip or fused EXE, in place.
+    Only the new entries and the central directory are written, and the bytes they overwrite are
+    journaled first (see recover_archive), so a failure or crash leaves the archive as it was.
+    Once earlier patches have left more than COMPACT_MIN_BYTES (and COMPACT_RATIO of the zip) unused,
+    the archive is rebuilt into a temp file and swapped in instead (report.compacted).
+    progress(done_bytes, total_bytes) is called while entry data is copied.
+    '''
+    if recover_archive(archive_path) or layout is None:
+        layout = read_layout(archive_path)
+    if layout.zip64:
+        raise ArchiveError("ZIP64 archives are not supported for patching.")
+
+    incoming = {}
+    for s in sources: # last one wins when several sources carry the same name
+        _check_source(s)
+        incoming[s.name] = s
+    removals = set(removals) - set(incoming)
+    current = layout.by_name()
+
+    report = PatchReport(size_before=layout.file_size)
+    kept = [e for e in layout.entries if e.name not in incoming and e.name not in removals]
+    report.removed = [n for n in removals if n in current]
+    for name in incoming:
+        (report.replaced if name in current else report.added).append(name)
+
+    # new data goes right after the last entry we keep, reusing space left by earlier patches;
+    # replaced entries below that point stay behind as unused space
+    start = write_pos = _payload_start(layout)
+    if kept:
+        with open(archive_path, "rb") as f:
+            write_pos = entry_record_end(f, max(kept, key=lambda e: e.header_offset))
+    write_pos = min(write_pos, layout.cd_offset)
+    unused = write_pos - start - sum(_record_size(e) for e in kept)
+    if unused >= COMPACT_MIN_BYTES and unused > COMPACT_RATIO * (write_pos - start):
+        order = [incoming.get(e.name) or EntrySource(e.name, archive_path, e)
+                 for e in layout.entries if e.name not in removals]
+        order += [s for name, s in incoming.items() if name not in current]
+        report.size_after = report.bytes_written = replace_atomically(
+            archive_path, lambda tmp: build_archive(tmp, archive_path, order, layout.comment, progress, stub_size=start))
+        report.compacted = True
+        return report
+
+    with open(archive_path, "r+b") as f:
+        f.seek(layout.cd_offset)
+        old_cd = f.read(layout.cd_size)
+        journal = _write_journal(archive_path, f, [(write_pos, os.fstat(f.fileno()).st_size)])
+        try:
+            f.seek(write_pos)
+            new_records = _write_local_records(f, list(incoming.values()), layout.concat, progress)
+            cd_start = f.tell()
+            for e in layout.entries:
+                if e.name in new_records:
+                    f.write(new_records.pop(e.name))
+                elif e.name not in removals:
+                    f.write(old_cd[e.cd_pos:e.cd_pos + e.cd_len])
+            for rec in new_records.values(): # brand new names go at the end
+                f.write(rec)
+            cd_end = f.tell()
+            _write_eocd(f, len(kept) + len(incoming), cd_start, cd_end, layout.concat, layout.comment)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            report.size_after = f.tell()
+            report.bytes_written = report.size_after - write_pos
+        except BaseException:
+            _roll_back(f, journal)
+            os.remove(journal)
+            raise
+        os.remove(journal)
+    return report
+
+
+# Crash safety =====================================
+# Before an in-place update overwrites anything, the bytes it is about to overwrite (and the file's
+# size) go to <archive>.journal, fsynced; the journal is deleted once the archive is fsynced. If the
+# process dies in between, recover_archive() puts those bytes back before the archive is next written,
+# so it is always either the old or the new archive, never a torn mix. Whole-file rewrites (rebuilds,
+# full copies) go to <archive>.rebuilding and are swapped in with os.replace.
+def _write_journal(archive_path: str, f, ranges: list[tuple[int, int]]) -> str:
+    ''' Save what ranges [(start, end)] of the open archive f currently hold, plus its size; returns the journal path. '''
+    journal = archive_path + JOURNAL_SUFFIX
+    tmp = journal + ".tmp"
+    size = os.fstat(f.fileno()).st_size
+    try:
+        with open(tmp, "wb") as j:
+            j.write(JOURNAL_MAGIC + struct.pack("<Q", size))
+            for begin, end in ranges:
+                end = min(end, size)
+                if begin < end:
+                    j.write(struct.pack("<2Q", begin, end - begin))
+                    _copy_range(f, j, begin, end - begin)
+            j.flush()
+            os.fsync(j.fileno())
+        os.replace(tmp, journal) # only a complete journal ever has the real name
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return journal
+
+def _roll_back(f, journal: str) -> None:
+    ''' Write a journal's saved bytes back into the open archive f and cut it to its old size. '''
+    with open(journal, "rb") as j:
+        head = j.read(len(JOURNAL_MAGIC) + 8)
+        if head[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC or len(head) != len(JOURNAL_MAGIC) + 8:
+            raise ArchiveError(f"{os.path.basename(journal)} is not an archive journal.")
+        size, = struct.unpack_from("<Q", head, len(JOURNAL_MAGIC))
+        while rec := j.read(16):
+            begin, length = struct.unpack("<2Q", rec)
+            f.seek(begin)
+            _copy_range(j, f, j.tell(), length)
+    f.truncate(size)
+    f.flush()
+    os.fsync(f.fileno())
+
+def recover_archive(archive_path: str) -> bool:
+    '''
+    Undo an update of archive_path that was interrupted (crash, power cut, killed process) and drop
+    half-written temp files. Returns True if the archive was rolled back.
+    '''
+    for leftover in (archive_path + JOURNAL_SUFFIX + ".tmp", archive_path + REBUILD_SUFFIX):
+        if os.path.exists(leftover): # never got as far as touching the archive
+            os.remove(leftover)
+    journal = archive_path + JOURNAL_SUFFIX
+    if not os.path.exists(journal):
+        return False
+    with open(archive_path, "r+b") as f:
+        _roll_back(f, journal)
+    os.remove(journal)
+    return True
+
+def replace_atomically(archive_path: str, write) -> int:
+    '''
+    Have write(tmp_path) -> size produce the whole new archive, then swap it in with os.replace (keeping the
+    old file's mode). The temp file is one recover_archive cleans up if the process dies halfway.
+    '''
+    tmp = archive_path + REBUILD_SUFFIX
+    try:
+        size = write(tmp)
+        if os.path.exists(archive_path):
+            os.chmod(tmp, os.stat(archive_path).st_mode & 0o7777)
+        os.replace(tmp, archive_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return size
+
+def _copy_file(src_path: str, out_path: str, progress=None) -> int:
+    with open(src_path, "rb") as src, open(out_path, "wb") as out:
+        size = os.fstat(src.fileno()).st_size
+        _copy_range(src, out, 0, size, progress, 0, size)
+        out.flush()
+        os.fsync(out.fileno())
+    return size
+
+
+# Delta sync =======================================
+def same_entry(a: ArchiveEntry, b: ArchiveEntry) -> bool:
+    ''' Entries are considered identical when CRC32 and uncompressed size match. '''
+    return a.crc == b.crc and a.file_size == b.file_size
+
+def stubs_equal(path_a: str, len_a: int, path_b: str, len_b: int) -> bool:
+    ''' True if the bytes in front of both archives (the EXE stub) are identical. '''
+    if len_a != len_b:
+        return False
+    with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+        left = len_a
+        while left:
+            n = min(COPY_CHUNK, left)
+            if fa.read(n) != fb.read(n):
+                return False
+            left -= n
+    return True
+
+def changed_sources(layout: ArchiveLayout, sources: list[EntrySource]) -> list[EntrySource]:
+    ''' The sources whose entry is missing from layout or differs from it (by CRC32 and size). '''
+    current = layout.by_name()
+    return [s for s in sources if s.name not in current or not same_entry(current[s.name], s.entry)]
+
+def sync_archive(archive_path: str, target: list[EntrySource], progress=None) -> PatchReport:
+    '''
+    Make archive_path hold exactly the target entries, comparing central directories by
+    name, CRC32 and size and rewriting only the entries that differ (extras are dropped).
+    '''
+    layout = read_layout(archive_path)
+    current = layout.by_name()
+    wanted = {s.name: s for s in target}
+    changed = changed_sources(layout, list(wanted.values()))
+    extras = [n for n in current if n not in wanted]
+    if changed or extras:
+        report = patch_archive(archive_path, changed, extras, progress, layout=layout)
+    else:
+        report = PatchReport(size_before=layout.file_size, size_after=layout.file_size)
+    report.unchanged = len(wanted) - len(changed)
+    return report
+
+def _header_bytes(buf, e: ArchiveEntry) -> bytes:
+    ''' An entry's raw local header (name and extra field included), or b"" if there isn't a valid one. '''
+    off = e.header_offset
+    if buf[off:off + 4] != LOCAL_SIG:
+        return b""
+    n, m = struct.unpack_from("<2H", buf, off + 26)
+    return buf[off:off + LOCAL_STRUCT.size + n + m]
+
+def _same_bytes(a, b, begin: int, end: int) -> bool:
+    for pos in range(begin, end, COPY_CHUNK):
+        if a[pos:min(pos + COPY_CHUNK, end)] != b[pos:min(pos + COPY_CHUNK, end)]:
+            return False
+    return True
+
+def sync_archive_to(archive_path: str, reference_path: str, progress=None) -> PatchReport | None:
+    '''
+    Delta-restore archive_path to a byte-identical copy of reference_path; None if the EXE stubs differ
+    (full copy needed). Entry records still where the reference has them are left alone and everything
+    else that differs (modded entries, unused space, the central directory) is copied back in place,
+    journaled like patch_archive. If that is most of the file anyway (e.g. a rebuild moved the entries),
+    the reference is copied whole into a temp file and swapped in instead.
+    '''
+    recover_archive(archive_path)
+    layout = read_layout(archive_path)
+    ref = read_layout(reference_path)
+    if not stubs_equal(archive_path, layout.concat, reference_path, ref.concat):
+        return None
+    current, wanted = layout.by_name(), ref.by_name()
+    report = PatchReport(size_before=layout.file_size, size_after=ref.file_size)
+    report.removed = [n for n in current if n not in wanted]
+    kept = []
+    with open(archive_path, "rb") as fa, open(reference_path, "rb") as fr, \
+            mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ) as ma, mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mr:
+        for e in ref.entries:
+            c = current.get(e.name)
+            if c is None:
+                report.added.append(e.name)
+                continue
+            head = _header_bytes(mr, e)
+            if c.header_offset == e.header_offset and same_entry(c, e) and head and _header_bytes(ma, c) == head:
+                end = entry_record_end(mr, e) if e.flag_bits & FLAG_DATA_DESCRIPTOR else \
+                    e.header_offset + len(head) + e.compress_size
+                kept.append((e.header_offset, end))
+            else:
+                report.replaced.append(e.name)
+        ranges, pos = [], ref.concat
+        for begin, end in sorted(kept) + [(ref.file_size, ref.file_size)]:
+            if pos < begin and not _same_bytes(ma, mr, pos, begin):
+                ranges.append((pos, begin))
+            pos = max(pos, end)
+    report.unchanged = len(kept)
+    report.bytes_written = sum(end - begin for begin, end in ranges)
+
+    if report.bytes_written > ref.file_size // 2:
+        report.bytes_written = replace_atomically(archive_path, lambda tmp: _copy_file(reference_path, tmp, progress))
+        report.full_copy = True
+    elif ranges or layout.file_size != ref.file_size:
+        with open(archive_path, "r+b") as f, open(reference_path, "rb") as src:
+            journal = _write_journal(archive_path, f, ranges + [(ref.file_size, layout.file_size)])
+            try:
+                done = 0
+                for begin, end in ranges:
+                    f.seek(begin)
+                    done = _copy_range(src, f, begin, end - begin, progress, done, report.bytes_written)
+                f.truncate(ref.file_size)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                _roll_back(f, journal)
+                os.remove(journal)
+                raise
+            os.remove(journal)
+    return report
+
+# Verifying ========================================
+def check_archive(path: str, check_crc: bool = False, progress=None) -> list[str]:
+    '''
+    Problems with an archive's entries: bad local headers, data running into the central directory
+    and, with check_crc, contents that don't match their CRC32 (this inflates every entry).
+    '''
+    problems = []
+    with MappedArchive(path) as a:
+        t = a.table
+        total = sum(t.compress_size)
+        done = 0
+        for i, name in enumerate(t.names):
+            try:
+                if check_crc and t.method[i] in SUPPORTED_METHODS:
+                    crc = 0
+                    for piece in a.stream(i):
+                        crc = zlib.crc32(piece, crc)
+                        if isinstance(piece, memoryview):
+                            piece.release()
+                    if crc != t.crc[i]:
+                        raise ArchiveError(f"{name} fails its CRC32 check.")
+                else:
+                    a.raw(i).release() # validates the local header and the data's extent
+            except ArchiveError as err:
+                problems.append(str(err))
+            except zlib.error as err:
+                problems.append(f"{name} does not inflate: {err}")
+            done += t.compress_size[i]
+            if progress:
+                progress(done, total)
+    return problems
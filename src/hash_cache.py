@@ -0,0 +1,115 @@
+import os
+import mmap
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import app_cache
+
+# Persistent SHA-256 cache ====================
+# Digests are stored in a small SQLite table keyed by path and validated against (inode, size, mtime),
+# so re-verifying a mod zip, a backup or a several-hundred-MB Balatro.exe that hasn't changed costs a
+# stat instead of a full read. Every caller (backups, verification, catalog indexing...) shares it.
+DB_FILENAME = "hashes.sqlite3"
+READ_CHUNK = 1024 * 1024
+MMAP_THRESHOLD = 8 * 1024 * 1024 # hash bigger files through mmap instead of a read loop
+MAX_WORKERS = 8
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(app_cache.cache_path(DB_FILENAME), check_same_thread=False, timeout=10)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                             path TEXT PRIMARY KEY, ino INTEGER, size INTEGER,
+                             mtime_ns INTEGER, sha256 TEXT, hashed_at REAL)""")
+        _conn.commit()
+    return _conn
+
+def _key(path: str):
+    st_ = os.stat(path)
+    return os.path.abspath(path), st_.st_ino, st_.st_size, st_.st_mtime_ns
+
+def _cached(key) -> str | None:
+    path, ino, size, mtime_ns = key
+    with _lock:
+        row = _db().execute("SELECT ino, size, mtime_ns, sha256 FROM hashes WHERE path = ?", (path,)).fetchone()
+    if row and tuple(row[:3]) == (ino, size, mtime_ns):
+        return row[3]
+    return None
+
+def _store(rows: list[tuple]) -> None:
+    if not rows:
+        return
+    with _lock:
+        conn = _db()
+        conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+
+def sha256_uncached(path: str) -> str:
+    ''' Hash a file from disk (mmap for big files, 1 MiB reads otherwise). '''
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m) # hashlib releases the GIL for large buffers, so workers really run in parallel
+        else:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+def _hash_fresh(key) -> tuple[str, tuple | None]:
+    ''' Hash the file behind key; also returns the row to cache (None if it changed while hashing). '''
+    digest = sha256_uncached(key[0])
+    try:
+        after = _key(key[0])
+    except OSError:
+        return digest, None
+    return digest, ((*key, digest, time.time()) if after == key else None)
+
+def file_sha256(path: str) -> str:
+    ''' SHA-256 of a file, served from the cache while its inode/size/mtime are unchanged. '''
+    key = _key(path)
+    digest = _cached(key)
+    if digest is None:
+        digest, row = _hash_fresh(key)
+        _store([row] if row else [])
+    return digest
+
+def hash_files(paths, workers: int | None = None) -> dict[str, str]:
+    ''' Batch version of file_sha256: cache hits are answered at once, misses hashed in a worker pool. '''
+    out = {}
+    misses = []
+    for p in paths:
+        key = _key(p)
+        digest = _cached(key)
+        if digest is None:
+            misses.append((p, key))
+        else:
+            out[p] = digest
+    if misses:
+        workers = workers or min(MAX_WORKERS, os.cpu_count() or 2)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(misses)))) as pool:
+            results = list(pool.map(lambda m: _hash_fresh(m[1]), misses))
+        for (p, _), (digest, _) in zip(misses, results):
+            out[p] = digest
+        _store([row for _, row in results if row])
+    return out
+
+def remember(path: str, digest: str) -> None:
+    ''' Record a digest computed elsewhere (e.g. while streaming the file to disk). '''
+    _store([(*_key(path), digest, time.time())])
+
+def forget(paths) -> None:
+    ''' Drop cached digests (e.g. after rewriting a file in place within the same mtime tick). '''
+    with _lock:
+        conn = _db()
+        conn.executemany("DELETE FROM hashes WHERE path = ?", [(os.path.abspath(p),) for p in paths])
+        conn.commit()
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+
+import app_cache
+
+# Persistent index of Steam libraries and Balatro installs ====================
+# Parsing every libraryfolders.vdf and walking every library on each Streamlit rerun is slow on
+# machines with many drives / network mounts, so the results are stored on disk together with the
+# mtimes of everything they were derived from. The index is only rebuilt when one of those changes.
+INDEX_FILENAME = "install_index.json"
+INDEX_VERSION = 1
+GAME_DIRNAME = "Balatro" # name of the game folder in a Steam library
+RECHECK_SECONDS = 2.0 # how long an in-memory index is trusted before its mtimes are re-checked
+
+_lock = threading.Lock()
+_memo = {"index": None, "checked_at": 0.0} # shared by every session in this process
+
+
+def _mtime(path: str) -> int | None:
+    ''' mtime in ns of path, or None if it does not exist. '''
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def parse_library_vdf(vdf_path: str) -> list[str]:
+    ''' Return the raw library paths listed in a Steam libraryfolders.vdf file. '''
+    out = []
+    try:
+        with open(vdf_path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    except OSError:
+        return out
+    for line in text.splitlines():
+        line = line.strip()
+        if line.lower().startswith('"path"'):
+            parts = line.split('"')
+            if len(parts) >= 4:
+                out.append(parts[3].replace("\\\\", "\\"))
+    return out
+
+def build_install_index(candidates: list[str]) -> dict:
+    ''' Scan the candidate Steam roots and return a fresh index (no caching). '''
+    stamps = {} # path -> mtime the index depends on
+    paths = []
+    vdf_libraries = {}
+    for root in candidates:
+        steamapps = os.path.join(root, "steamapps")
+        vdf = os.path.join(steamapps, "libraryfolders.vdf")
+        stamps[steamapps] = _mtime(steamapps)
+        stamps[vdf] = _mtime(vdf)
+        libs = parse_library_vdf(vdf) if stamps[vdf] is not None else []
+        vdf_libraries[vdf] = libs
+        for p in libs:
+            sa = os.path.join(p, "steamapps")
+            stamps[sa] = _mtime(sa)
+            if os.path.isdir(sa):
+                paths.append(sa)
+        if os.path.isdir(steamapps):
+            paths.append(steamapps)
+
+    libraries = []
+    for p in paths:
+        if p not in libraries and os.path.isdir(p):
+            libraries.append(p)
+
+    game_roots = []
+    for sa in libraries:
+        common = os.path.join(sa, "common")
+        stamps[common] = _mtime(common) # a game folder appearing/disappearing bumps this
+        p = os.path.join(common, GAME_DIRNAME)
+        if os.path.isdir(p) and p not in game_roots:
+            game_roots.append(p)
+
+    return {
+        "version": INDEX_VERSION,
+        "candidates": list(candidates),
+        "vdf_libraries": vdf_libraries,
+        "libraries": libraries,
+        "game_roots": game_roots,
+        "stamps": stamps,
+        "built_at": time.time(),
+    }
+
+def index_is_fresh(index: dict | None, candidates: list[str]) -> bool:
+    ''' True if index was built for these candidates and none of its source mtimes changed. '''
+    if not index or index.get("version") != INDEX_VERSION:
+        return False
+    if index.get("candidates") != list(candidates):
+        return False
+    for path, stamp in index.get("stamps", {}).items():
+        if _mtime(path) != stamp:
+            return False
+    return True
+
+def get_install_index(candidates: list[str], force: bool = False) -> dict:
+    ''' Return the install index, reusing the in-memory / on-disk copy while it is still valid. '''
+    with _lock:
+        now = time.monotonic()
+        index = _memo["index"]
+        if not force and index is not None and index.get("candidates") == list(candidates):
+            if now - _memo["checked_at"] < RECHECK_SECONDS:
+                return index
+            if index_is_fresh(index, candidates):
+                _memo["checked_at"] = now
+                return index
+
+        path = app_cache.cache_path(INDEX_FILENAME)
+        if not force:
+            on_disk = app_cache.load_json(path)
+            if index_is_fresh(on_disk, candidates):
+                _memo.update(index=on_disk, checked_at=now)
+                return on_disk
+
+        index = build_install_index(candidates)
+        try:
+            app_cache.save_json_atomic(path, index)
+        except OSError:
+            pass # a read-only cache folder just means we rescan next process
+        _memo.update(index=index, checked_at=now)
+        return index
+
+def invalidate_install_index() -> None:
+    ''' Drop the in-memory index so the next lookup re-checks the disk. '''
+    with _lock:
+        _memo.update(index=None, checked_at=0.0)
@@ -0,0 +1,108 @@
+import os
+import time
+
+import app_cache
+import exe_archive
+
+# Per-install ledger of what the manager did ====================
+# One JSON file per game root (inside BACKUP_DIRNAME) remembers the state Balatro.exe was left in after
+# the last operation (size, mtime and a fingerprint of its central directory), a capped history of
+# operations with the mods they applied (zip SHA-256 and entry CRC32s), before/after states and timings,
+# and what the .bak looked like when it was taken. Two questions become cheap:
+#   * "is this operation a no-op?" -> the last operation was the same one and Balatro.exe still has the
+#     size and mtime it was left with: one stat, no archive read.
+#   * "is the .bak from an older game version?" -> the EXE's stub or any non-texture entry differs from
+#     the .bak (mods only ever touch textures), which only a game update does.
+LEDGER_VERSION = 1
+HISTORY_LIMIT = 100 # operations kept per install
+
+
+def exe_stat(exe_path: str) -> dict | None:
+    ''' {"size", "mtime_ns"} of a file, or None if it doesn't exist. '''
+    try:
+        st_ = os.stat(exe_path)
+    except OSError:
+        return None
+    return {"size": st_.st_size, "mtime_ns": st_.st_mtime_ns}
+
+def exe_state(exe_path: str) -> dict | None:
+    ''' exe_stat plus the archive's fingerprint, entry count and stub size (reads the central directory only). '''
+    state = exe_stat(exe_path)
+    if state is None:
+        return None
+    try:
+        table = exe_archive.read_table(exe_path)
+    except (OSError, exe_archive.ArchiveError):
+        return {**state, "fingerprint": None}
+    return {**state, "fingerprint": table.fingerprint(), "entries": len(table), "stub_size": table.concat}
+
+def load_ledger(path: str) -> dict:
+    ledger = app_cache.load_json(path)
+    if not ledger or ledger.get("version") != LEDGER_VERSION:
+        return {"version": LEDGER_VERSION, "backup": None, "state": None, "history": []}
+    return ledger
+
+def mod_records(mod_paths: list[str], names: list[str] | None = None) -> list[dict]:
+    ''' What the ledger keeps per applied mod: its name, SHA-256 and the CRC32 of each texture it ships. '''
+    import hash_cache # SQLite: only loaded once an install records its mods
+    digests = hash_cache.hash_files(mod_paths)
+    out = []
+    for path, name in zip(mod_paths, names or mod_paths):
+        try:
+            entries = {s.name: s.entry.crc for s in exe_archive.mod_texture_sources(path)}
+        except (OSError, exe_archive.ArchiveError):
+            entries = {}
+        out.append({"name": os.path.basename(name), "sha256": digests[path], "entries": entries})
+    return out
+
+def operation_key(op: str, *parts) -> str:
+    ''' Identity of an operation for no-op checks, e.g. ("install", zip hashes..., options). '''
+    return "|".join([op, *(str(p) for p in parts)])
+
+def is_current(ledger: dict, exe_path: str, key: str) -> bool:
+    ''' True if the last recorded operation was key and nothing has touched Balatro.exe since (one stat). '''
+    history, state = ledger.get("history"), ledger.get("state")
+    if not history or not state or history[-1].get("key") != key:
+        return False
+    now = exe_stat(exe_path)
+    return now is not None and (now["size"], now["mtime_ns"]) == (state["size"], state["mtime_ns"])
+
+def record(path: str, exe_path: str, op: str, before: dict | None, started: float, key: str | None = None,
+           mods: list[dict] = (), **details) -> dict:
+    ''' Append one operation (before/after states, mods, seconds since started) and save the ledger. '''
+    ledger = load_ledger(path)
+    after = exe_state(exe_path)
+    ledger["state"] = after
+    ledger["history"] = (ledger["history"] + [{
+        "op": op, "key": key, "at": time.time(), "seconds": round(time.perf_counter() - started, 4),
+        "before": before, "after": after, "mods": list(mods), **details}])[-HISTORY_LIMIT:]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    app_cache.save_json_atomic(path, ledger)
+    return ledger
+
+def record_backup(path: str, bak_path: str, reason: str) -> None:
+    ''' Remember when and from what the .bak was (re)made. '''
+    ledger = load_ledger(path)
+    ledger["backup"] = {**(exe_state(bak_path) or {}), "taken_at": time.time(), "reason": reason}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    app_cache.save_json_atomic(path, ledger)
+
+def stale_backup(exe_path: str) -> str | None:
+    '''
+    Why Balatro.exe.bak no longer matches the installed game version, or None if it still does (or
+    either file can't be read). Compares the stub size and every non-texture entry by CRC32 and size.
+    '''
+    try:
+        table = exe_archive.read_table(exe_path)
+        original = exe_archive.read_table(exe_path + ".bak")
+    except (OSError, exe_archive.ArchiveError):
+        return None
+    if table.concat != original.concat:
+        return (f"the game executable is {table.concat:,} bytes but the backup's is {original.concat:,}, "
+                "so the game was updated after the backup was made")
+    changed, added, removed = table.diff(original)
+    game_files = [n for n in changed + added + removed if not n.startswith(exe_archive.TEXTURE_PREFIX)]
+    if game_files:
+        return (f"{len(game_files)} game file(s) such as {game_files[0]} differ from the backup, "
+                "so the game was updated after the backup was made")
+    return None
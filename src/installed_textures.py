@@ -0,0 +1,113 @@
+import io
+import os
+import zlib
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+import atlas_compose
+import exe_archive
+import tracing
+
+# Previews of the art installed in Balatro.exe ====================
+# The suit pages show the bundled mod previews; this shows what the game will actually draw. Only the
+# atlas for the suit/variant on screen is read out of the EXE (or its .bak) and cut into one PNG
+# thumbnail per card. Thumbnails live in a byte-bounded LRU keyed by the entry's CRC32/size, and the
+# central directory is cached by the archive's size/mtime, so flipping suits or High Contrast reads
+# nothing from disk again until an install changes the EXE.
+PREVIEW_BOX = (284, 380) # one 142x190 cell at 2x
+MEMORY_BYTES = 16 * 1024 * 1024 # encoded thumbnails kept in memory, least recently used dropped first
+MAX_TABLES = 8 # archives whose central directory stays cached
+
+_lock = threading.Lock()
+_thumbs = OrderedDict() # (crc, size, atlas entry, box) -> {card: png bytes}, most recently used last
+_thumb_bytes = 0
+_tables = OrderedDict() # abspath -> ((mtime_ns, size), EntryTable)
+
+
+def entry_table(path: str) -> exe_archive.EntryTable | None:
+    ''' Cached central directory of an archive, re-read only when its size or mtime changes. '''
+    try:
+        st_ = os.stat(path)
+    except OSError:
+        return None
+    key, stamp = os.path.abspath(path), (st_.st_mtime_ns, st_.st_size)
+    with _lock:
+        hit = _tables.get(key)
+        if hit is not None and hit[0] == stamp:
+            _tables.move_to_end(key)
+            return hit[1]
+    try:
+        table = exe_archive.read_table(path)
+    except (OSError, exe_archive.ArchiveError):
+        return None
+    with _lock:
+        _tables[key] = (stamp, table)
+        _tables.move_to_end(key)
+        while len(_tables) > MAX_TABLES:
+            _tables.popitem(last=False)
+    return table
+
+def _fit(im: Image.Image, box: tuple[int, int]) -> Image.Image:
+    ''' Scale into box: whole-number nearest-neighbour steps for small pixel art, Lanczos when shrinking. '''
+    if im.width <= box[0] and im.height <= box[1]:
+        factor = max(1, min(box[0] // im.width, box[1] // im.height))
+        return im.resize((im.width * factor, im.height * factor), Image.NEAREST)
+    im = im.copy()
+    im.thumbnail(box, Image.LANCZOS)
+    return im
+
+def _encode(im: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format="PNG")
+    return buf.getvalue()
+
+def _remember(key: tuple, cards: dict[str, bytes]) -> None:
+    global _thumb_bytes
+    with _lock:
+        if key in _thumbs:
+            return
+        _thumbs[key] = cards
+        _thumb_bytes += sum(len(b) for b in cards.values())
+        while _thumb_bytes > MEMORY_BYTES and len(_thumbs) > 1:
+            _, dropped = _thumbs.popitem(last=False)
+            _thumb_bytes -= sum(len(b) for b in dropped.values())
+
+def installed_cards(archive_path: str, suit: str, variant: str = "normal",
+                    box: tuple[int, int] = PREVIEW_BOX) -> dict[str, bytes]:
+    '''
+    Card name -> PNG thumbnail of that face card as stored in archive_path
+    (Balatro.exe, its .bak or a mod zip).
+    Empty if the archive or the suit's atlas can't be read.
+    '''
+    if suit not in atlas_compose.SUIT_ATLASES:
+        return {}
+    table = entry_table(archive_path)
+    name = atlas_compose.atlas_entry(suit, variant)
+    if table is None or name not in table:
+        return {}
+    i = table.index(name)
+    key = (table.crc[i], table.size[i], name, box)
+    with _lock:
+        cards = _thumbs.get(key)
+        if cards is not None:
+            _thumbs.move_to_end(key)
+            return cards
+
+    with tracing.span("preview.decode", nested_only=True, entry=name) as s:
+        try:
+            data = exe_archive.read_entry_data(archive_path, table.entry(i))
+            with Image.open(io.BytesIO(data)) as im:
+                atlas = im.convert("RGBA")
+        except (OSError, ValueError, exe_archive.ArchiveError, zlib.error):
+            return {}
+        cards = {}
+        if atlas_compose.cell_size(*atlas.size) is None:
+            return {}
+        for card in atlas_compose.CARD_ORDER:
+            _, crop = atlas_compose.card_cell(suit, card, variant, atlas.size)
+            cards[card] = _encode(_fit(atlas.crop(crop), box))
+        s.add(bytes=len(data), files=len(cards))
+    _remember(key, cards)
+    return cards
@@ -0,0 +1,236 @@
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+import mod_core
+
+# Background jobs for EXE writes ====================
+# Installs and restores run in a worker thread so the Streamlit script (and every rerun) stays responsive.
+# Each game root has one lock: while a job holds it, another click on any page or session gets the
+# running job back instead of starting a second, overlapping write to the same Balatro.exe.
+# Jobs live in this module (shared by all sessions); pages keep only the job id in st.session_state.
+# A job may hold several roots at once (multi-install runs); it then blocks every one of them.
+# The in-process lock is only the fast path: every writer also takes an OS lock (fcntl.flock /
+# msvcrt.locking) on mod_core.LOCK_FILENAME in the root's backup folder, so a second app window, a CLI command
+# or a multi-install worker process gets JobBusy instead of writing the same Balatro.exe. OS locks die
+# with their process, so a crash never leaves a root locked. A multi-root job holds only the in-process
+# locks: each multi_install worker takes its root's OS lock itself (file_lock), as a process can't hand
+# its lock to a child.
+OUTPUT_LINES = 200 # most recent progress/output lines kept per job
+FINISHED_JOBS = 50 # finished jobs remembered before the oldest are dropped
+
+_locks = {}
+_locks_guard = threading.Lock()
+_jobs = {}
+_jobs_guard = threading.Lock()
+
+
+class JobBusy(RuntimeError):
+    ''' Raised by submit when another job is already writing to the same game root. '''
+
+    def __init__(self, job: "Job"):
+        super().__init__(f"'{job.label}' is still running for this game folder.")
+        self.job = job
+
+
+@dataclass
+class Job:
+    ''' One background operation and everything a page needs to show its progress. '''
+    id: str
+    label: str
+    game_root: str
+    game_roots: tuple = () # every root the job holds; game_root is the first
+    state: str = "queued" # queued -> running -> done | failed
+    fraction: float = 0.0
+    message: str = ""
+    lines: deque = field(default_factory=lambda: deque(maxlen=OUTPUT_LINES))
+    result: object = None
+    error: str | None = None
+    created: float = field(default_factory=time.time)
+    finished: float | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.state in ("queued", "running")
+
+    def progress(self, fraction: float | None = None, message: str | None = None) -> None:
+        ''' Progress callback handed to the job function: fraction in [0, 1] and/or a status line. '''
+        if fraction is not None:
+            self.fraction = min(max(fraction, 0.0), 1.0)
+        if message:
+            self.message = message
+            if not self.lines or self.lines[-1] != message:
+                self.lines.append(message)
+
+
+def _key(game_root: str) -> str:
+    return os.path.normcase(os.path.abspath(game_root))
+
+def root_lock(game_root: str) -> threading.Lock:
+    ''' The in-process lock serialising EXE writes for one game install. '''
+    with _locks_guard:
+        return _locks.setdefault(_key(game_root), threading.Lock())
+
+
+class RootFileLock:
+    ''' The OS-level lock on one game root, shared by every process of the app. '''
+
+    def __init__(self, game_root: str):
+        self.path = os.path.join(game_root, mod_core.BACKUP_DIRNAME, mod_core.LOCK_FILENAME)
+        self._f = None
+
+    def acquire(self) -> bool:
+        ''' Take the lock without waiting; False if another process (or another handle) holds it. '''
+        if not os.path.isdir(os.path.dirname(os.path.dirname(self.path))):
+            return True # no such install: there is nothing to write, the operation itself reports that
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            f = open(self.path, "a+b")
+        except OSError:
+            return True # read-only install folder: the write fails on its own with a clearer error
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        self._f = f
+        return True
+
+    def release(self) -> None:
+        f, self._f = self._f, None
+        if f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass # closing the file drops the lock anyway
+        f.close()
+
+
+def _busy(key: str) -> JobBusy:
+    running = active_job(key)
+    if running is None: # held by a synchronous caller outside the runner
+        running = Job("", "another operation", key, state="running")
+    return JobBusy(running)
+
+def _busy_elsewhere(key: str) -> JobBusy:
+    return JobBusy(Job("", "another Balatro Art Mod Manager window or command", key, state="running"))
+
+def _acquire_roots(game_roots: list[str], file_locks: bool = True) -> list:
+    '''
+    Take every root's in-process lock, and with file_locks its OS lock, without waiting (in a fixed order);
+    raises JobBusy, holding none, if one is taken. Returns the held locks (each has release()).
+    '''
+    held = []
+    try:
+        for key in sorted({_key(r) for r in game_roots}):
+            lock = root_lock(key)
+            if not lock.acquire(blocking=False):
+                raise _busy(key)
+            held.append(lock)
+            if file_locks:
+                os_lock = RootFileLock(key)
+                if not os_lock.acquire():
+                    raise _busy_elsewhere(key)
+                held.append(os_lock)
+    except BaseException:
+        for h in reversed(held):
+            h.release()
+        raise
+    return held
+
+@contextmanager
+def hold_roots(game_roots: list[str], file_locks: bool = True):
+    '''
+    Hold the locks of several game roots for a synchronous caller (the CLI); raises JobBusy if one is taken.
+    Pass file_locks=False around multi_install.run_across_roots, whose workers take the OS locks themselves.
+    '''
+    held = _acquire_roots(game_roots, file_locks)
+    try:
+        yield
+    finally:
+        for lock in reversed(held):
+            lock.release()
+
+@contextmanager
+def file_lock(game_root: str):
+    ''' Hold one root's OS lock (what a multi-install worker does around its write); raises JobBusy if it is taken. '''
+    lock = RootFileLock(game_root)
+    if not lock.acquire():
+        raise _busy_elsewhere(_key(game_root))
+    try:
+        yield
+    finally:
+        lock.release()
+
+def get_job(job_id: str | None) -> Job | None:
+    with _jobs_guard:
+        return _jobs.get(job_id)
+
+def active_job(game_root: str) -> Job | None:
+    ''' The job currently running against game_root, if any. '''
+    key = _key(game_root)
+    with _jobs_guard:
+        for job in _jobs.values():
+            if job.running and key in (_key(r) for r in job.game_roots or (job.game_root,)):
+                return job
+    return None
+
+def _forget_old() -> None:
+    done = sorted((j for j in _jobs.values() if not j.running), key=lambda j: j.finished or 0)
+    for job in done[:max(0, len(done) - FINISHED_JOBS)]:
+        del _jobs[job.id]
+
+def _run(job: Job, locks: list, fn, args, kwargs) -> None:
+    try:
+        job.state = "running"
+        job.result = fn(*args, progress=job.progress, **kwargs)
+        job.fraction = 1.0
+        job.state = "done"
+    except BaseException as e:
+        job.error = str(e) or type(e).__name__
+        job.state = "failed"
+        if isinstance(e, PermissionError):
+            job.error = "Permission denied. Run as Administrator if installing under Program Files."
+    finally:
+        job.finished = time.time()
+        for lock in reversed(locks):
+            lock.release()
+
+def submit(label: str, game_root: str | list[str], fn, *args, **kwargs) -> Job:
+    '''
+    Run fn(*args, progress=job.progress, **kwargs) in a worker thread, holding the lock of game_root
+    (or of every root in a list). Raises JobBusy (carrying the running job) if one is already being written to.
+    A list of roots is a multi_install run, whose workers take the roots' OS locks themselves.
+    '''
+    roots = [game_root] if isinstance(game_root, str) else list(game_root)
+    locks = _acquire_roots(roots, file_locks=isinstance(game_root, str))
+    job = Job(uuid.uuid4().hex[:12], label, roots[0], tuple(roots))
+    with _jobs_guard:
+        _forget_old()
+        _jobs[job.id] = job
+    try:
+        threading.Thread(target=_run, args=(job, locks, fn, args, kwargs), name=f"job-{job.id}", daemon=True).start()
+    except BaseException:
+        for lock in reversed(locks):
+            lock.release()
+        raise
+    return job
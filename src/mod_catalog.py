@@ -0,0 +1,279 @@
+import os
+import time
+import sqlite3
+import threading
+
+import app_cache
+import atlas_compose
+import exe_archive
+import hash_cache
+import installed_textures
+import tracing
+
+# Mod catalog ====================
+# Everything the browse page shows about a mod zip (size, hash, texture entries, suits it touches and
+# small preview sprites cut from its card atlases) is read once and kept in a SQLite file in the cache
+# folder. A rescan stats MODS_DIR and re-indexes only zips whose size or mtime changed, in a background
+# thread, so pages only ever query the database: no zip is opened while a page renders, however many
+# mods there are.
+DB_FILENAME = "mod_catalog.sqlite3"
+SCHEMA_VERSION = 1
+PREVIEW_BOX = (71, 95) # half a 142x190 card cell; a page of mods stays a few hundred KB
+PAGE_SIZE = 24
+RECHECK_SECONDS = 10.0 # how long a scan of the folder is trusted before pages trigger another
+
+_lock = threading.Lock()
+_conn = None
+_scan = {"thread": None, "folder": None, "checked_at": 0.0, "done": 0, "todo": 0, "error": None}
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(app_cache.cache_path(DB_FILENAME), check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript("""
+                DROP TABLE IF EXISTS mods; DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS previews;""")
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS mods (
+                path TEXT PRIMARY KEY, name TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT,
+                textures INTEGER, bytes INTEGER, suits TEXT, indexed_at REAL, error TEXT);
+            CREATE INDEX IF NOT EXISTS mods_name ON mods (name COLLATE NOCASE);
+            CREATE TABLE IF NOT EXISTS entries (
+                mod TEXT, name TEXT, crc INTEGER, size INTEGER, PRIMARY KEY (mod, name));
+            CREATE INDEX IF NOT EXISTS entries_name ON entries (name);
+            CREATE TABLE IF NOT EXISTS previews (
+                mod TEXT, suit TEXT, card TEXT, png BLOB, PRIMARY KEY (mod, suit, card));
+            PRAGMA user_version = {SCHEMA_VERSION};""")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+# Indexing ==========
+def _suits_of(names: list[str]) -> list[str]:
+    ''' Suits whose face-card atlas a mod ships (in either variant). '''
+    return [suit for suit, atlas in atlas_compose.SUIT_ATLASES.items()
+            if any(n.startswith(atlas_compose.ATLAS_PREFIX + atlas) for n in names)]
+
+def _index_zip(path: str, st_, digest: str) -> tuple[tuple, list[tuple], list[tuple]]:
+    ''' (mods row, entries rows, previews rows) for one zip; unreadable zips get a row with an error. '''
+    name = os.path.basename(path)
+    try:
+        textures = exe_archive.mod_texture_sources(path)
+    except (OSError, exe_archive.ArchiveError) as e:
+        return (path, name, st_.st_size, st_.st_mtime_ns, digest, 0, 0, "", time.time(), str(e)), [], []
+    names = [s.name for s in textures]
+    suits = _suits_of(names)
+    previews = []
+    for suit in suits:
+        cards = (installed_textures.installed_cards(path, suit, "normal", PREVIEW_BOX)
+                 or installed_textures.installed_cards(path, suit, "hc", PREVIEW_BOX))
+        previews += [(path, suit, card, png) for card, png in cards.items()]
+    row = (path, name, st_.st_size, st_.st_mtime_ns, digest, len(textures), sum(s.entry.file_size for s in textures),
+           "," + ",".join(suits) + "," if suits else "", time.time(), None)
+    return row, [(path, s.name, s.entry.crc, s.entry.file_size) for s in textures], previews
+
+def _store(path: str, row: tuple | None, entries: list[tuple] = (), previews: list[tuple] = ()) -> None:
+    ''' Replace everything known about one zip (row None just forgets it). '''
+    with _lock:
+        conn = _db()
+        for table, col in (("mods", "path"), ("entries", "mod"), ("previews", "mod")):
+            conn.execute(f"DELETE FROM {table} WHERE {col} = ?", (path,))
+        if row is not None:
+            conn.execute("INSERT INTO mods VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", entries)
+            conn.executemany("INSERT OR REPLACE INTO previews VALUES (?, ?, ?, ?)", previews)
+        conn.commit()
+
+def stale_zips(folder: str) -> tuple[list[tuple[str, os.stat_result]], list[str]]:
+    ''' (zips new or changed since they were indexed, indexed paths that are gone); stats files only. '''
+    on_disk = {}
+    try:
+        with os.scandir(folder) as it:
+            for e in it:
+                if e.is_file() and e.name.lower().endswith(".zip"):
+                    on_disk[os.path.abspath(e.path)] = e.stat()
+    except OSError:
+        pass
+    prefix = os.path.join(os.path.abspath(folder), "")
+    with _lock:
+        known = {p: (size, mtime) for p, size, mtime in
+                 _db().execute("SELECT path, size, mtime_ns FROM mods WHERE path LIKE ? ESCAPE '\\'",
+                               (_like_escape(prefix) + "%",))}
+    changed = [(p, st_) for p, st_ in on_disk.items() if known.get(p) != (st_.st_size, st_.st_mtime_ns)]
+    gone = [p for p in known if p not in on_disk and os.path.dirname(p) == os.path.abspath(folder)]
+    return changed, gone
+
+def _index_changed(changed: list[tuple[str, os.stat_result]], on_each=None) -> int:
+    ''' Re-index the given (path, stat) zips, calling on_each(count, path) after each; returns how many failed. '''
+    digests = hash_cache.hash_files([p for p, _ in changed]) if changed else {}
+    failed = 0
+    for i, (path, st_) in enumerate(changed, 1):
+        row, entries, previews = _index_zip(path, st_, digests[path])
+        failed += row[-1] is not None
+        _store(path, row, entries, previews)
+        if on_each:
+            on_each(i, path)
+    return failed
+
+def refresh_catalog(folder: str, progress=None) -> dict:
+    '''
+    Bring the catalog in line with folder: index new/changed zips, drop deleted ones.
+    Returns {"indexed", "removed", "failed", "unchanged"}; progress(fraction, message) as zips are read.
+    '''
+    with tracing.span("catalog.refresh") as s:
+        changed, gone = stale_zips(folder)
+        for path in gone:
+            _store(path, None)
+        _scan["todo"] = len(changed)
+
+        def indexed(i: int, path: str) -> None:
+            _scan["done"] = i
+            if progress:
+                progress(i / len(changed), f"Indexed {os.path.basename(path)}")
+
+        failed = _index_changed(changed, indexed)
+        with _lock:
+            total = _db().execute("SELECT COUNT(*) FROM mods").fetchone()[0]
+        stats = {"indexed": len(changed), "removed": len(gone), "failed": failed, "unchanged": total - len(changed)}
+        s.add(files=len(changed), bytes=sum(st_.st_size for _, st_ in changed), removed=len(gone))
+    return stats
+
+def index_zips(paths: list[str]) -> int:
+    '''
+    Catalog just these zips (wherever they live) in the calling thread, re-reading only those whose size
+    or mtime changed since they were indexed; paths that no longer exist are forgotten. Returns the
+    number of zips (re-)indexed.
+    '''
+    wanted = list(dict.fromkeys(os.path.abspath(p) for p in paths))
+    if not wanted:
+        return 0
+    with _lock:
+        known = {p: (size, mtime) for p, size, mtime in _db().execute(
+            f"SELECT path, size, mtime_ns FROM mods WHERE path IN ({','.join('?' * len(wanted))})", wanted)}
+    changed = []
+    for path in wanted:
+        try:
+            st_ = os.stat(path)
+        except OSError:
+            if path in known:
+                _store(path, None)
+            continue
+        if known.get(path) != (st_.st_size, st_.st_mtime_ns):
+            changed.append((path, st_))
+    if changed:
+        with tracing.span("catalog.index", files=len(changed)):
+            _index_changed(changed)
+    return len(changed)
+
+def _background_scan(folder: str) -> None:
+    try:
+        refresh_catalog(folder)
+        _scan["error"] = None
+    except Exception as e: # the page shows it; the next rescan tries again
+        _scan["error"] = str(e) or type(e).__name__
+    finally:
+        _scan["checked_at"] = time.monotonic()
+
+def ensure_fresh(folder: str, force: bool = False) -> bool:
+    '''
+    Start a background rescan of folder if the last one is older than RECHECK_SECONDS (or force).
+    Returns True while a scan is running. Cheap enough to call on every rerun.
+    '''
+    with _lock:
+        running = _scan["thread"] is not None and _scan["thread"].is_alive()
+        if running:
+            return True
+        recent = _scan["folder"] == folder and time.monotonic() - _scan["checked_at"] < RECHECK_SECONDS
+        if recent and not force:
+            return False
+        _scan.update(folder=folder, done=0, todo=0, checked_at=time.monotonic())
+        _scan["thread"] = threading.Thread(target=_background_scan, args=(folder,), name="catalog-scan", daemon=True)
+        _scan["thread"].start()
+    return True
+
+def scan_status() -> dict:
+    ''' {"running", "done", "todo", "error"} of the latest background rescan. '''
+    t = _scan["thread"]
+    return {"running": t is not None and t.is_alive(), "done": _scan["done"], "todo": _scan["todo"],
+            "error": _scan["error"]}
+
+
+# Queries (no zip is opened past this point) ==========
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search(query: str = "", suit: str | None = None, folder: str | None = None,
+           offset: int = 0, limit: int = PAGE_SIZE) -> tuple[list[dict], int]:
+    '''
+    One page of catalogued mods, sorted by name: (rows, total matches). query matches the file name
+    or any texture path inside the zip; suit keeps mods that ship that suit's face cards.
+    '''
+    where, args = ["error IS NULL"], []
+    if folder:
+        where.append("path LIKE ? ESCAPE '\\'")
+        args.append(_like_escape(os.path.join(os.path.abspath(folder), "")) + "%")
+    if query:
+        pattern = "%" + _like_escape(query) + "%"
+        where.append("(name LIKE ? ESCAPE '\\' OR path IN (SELECT mod FROM entries WHERE name LIKE ? ESCAPE '\\'))")
+        args += [pattern, pattern]
+    if suit:
+        where.append("suits LIKE ?")
+        args.append(f"%,{suit},%")
+    sql_where = " AND ".join(where)
+    with _lock:
+        conn = _db()
+        total = conn.execute(f"SELECT COUNT(*) FROM mods WHERE {sql_where}", args).fetchone()[0]
+        cur = conn.execute(f"SELECT path, name, size, sha256, textures, bytes, suits FROM mods WHERE {sql_where} "
+                           "ORDER BY name COLLATE NOCASE LIMIT ? OFFSET ?", args + [limit, offset])
+        cols = [c[0] for c in cur.description]
+        rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    for r in rows:
+        r["suits"] = [s for s in r["suits"].split(",") if s]
+    return rows, total
+
+def texture_entries(paths: list[str]) -> dict[str, dict[str, list[int]]]:
+    ''' Absolute zip path -> {texture entry: [crc, size]} for the given catalogued, readable zips. '''
+    wanted = list(dict.fromkeys(os.path.abspath(p) for p in paths))
+    if not wanted:
+        return {}
+    marks = ",".join("?" * len(wanted))
+    with _lock:
+        conn = _db()
+        ok = [p for (p,) in conn.execute(f"SELECT path FROM mods WHERE error IS NULL AND path IN ({marks})", wanted)]
+        rows = conn.execute(f"SELECT mod, name, crc, size FROM entries WHERE mod IN ({marks})", wanted).fetchall()
+    out = {p: {} for p in ok}
+    for mod, name, crc, size in rows:
+        if mod in out:
+            out[mod][name] = [crc, size]
+    return out
+
+def previews(paths: list[str]) -> dict[str, list[tuple[str, str, bytes]]]:
+    ''' Stored preview sprites per mod: path -> [(suit, card, png bytes)] in card order. '''
+    if not paths:
+        return {}
+    order = {card: i for i, card in enumerate(atlas_compose.CARD_ORDER)}
+    with _lock:
+        rows = _db().execute(f"SELECT mod, suit, card, png FROM previews WHERE mod IN ({','.join('?' * len(paths))})",
+                             list(paths)).fetchall()
+    out = {}
+    for mod, suit, card, png in sorted(rows, key=lambda r: (r[0], r[1], order.get(r[2], 99))):
+        out.setdefault(mod, []).append((suit, card, png))
+    return out
+
+def suit_mod(folder: str, suit: str) -> str | None:
+    '''
+    The catalogued mod a suit page installs: <suit>_art.zip if present, else the mod that
+    covers that suit and the fewest others (ties by name).
+    '''
+    preferred = os.path.join(os.path.abspath(folder), f"{suit}_art.zip")
+    if os.path.isfile(preferred):
+        return preferred
+    with _lock:
+        rows = _db().execute("SELECT path, suits FROM mods WHERE error IS NULL AND suits LIKE ? "
+                             "ORDER BY name COLLATE NOCASE", (f"%,{suit},%",)).fetchall()
+    paths = [p for p, _ in rows if os.path.dirname(p) == os.path.abspath(folder)]
+    ranked = sorted(((s.count(","), i) for i, (p, s) in enumerate(rows) if p in paths))
+    return rows[ranked[0][1]][0] if ranked else None
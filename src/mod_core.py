@@ -0,0 +1,711 @@
+import os
+import re
+import time
+import shutil
+
+import app_cache
+import exe_archive
+import install_index
+import tracing
+
+# UI-agnostic core of the mod manager ====================
+# Detection, backup, install and restore logic shared by the Streamlit app (mod_support_func.py) and the
+# command line (balatro_mods.py). Nothing here imports streamlit; long operations take an optional
+# progress(fraction, message) callback instead of writing to the page.
+BACKUP_DIRNAME = "_backup_BalatroArt" # store all the backups here for reverting to original art
+STORE_DIRNAME = "store" # deduplicated snapshot history, kept inside BACKUP_DIRNAME
+INSTALL_MANIFEST = "install_manifest.json" # what the last install/restore left in Balatro.exe (see drift.py), inside BACKUP_DIRNAME
+LEDGER_FILENAME = "ledger.json" # history of operations + last known EXE state (see install_ledger.py), inside BACKUP_DIRNAME
+LOCK_FILENAME = "write.lock" # OS lock held by whichever process is writing this install (see job_runner.py), inside BACKUP_DIRNAME
+TARGET_RELATIVE = os.path.join("Balatro_Data", "StreamingAssets")
+EXE_NAME = "Balatro.exe"
+
+# Folder that holds downloadable mod zips (commit these to your repo)
+MODS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mods") # mods folder for where the card art zip is with the 7-zip heirarchy
+
+# seraching for 7z.exe to easily install the mod
+SEVEN_ZIP_CANDIDATES = [
+    r"C:\Program Files\7-Zip\7z.exe",
+    r"C:\Program Files (x86)\7-Zip\7z.exe",
+    "7z.exe",
+]
+INSTALL_ENGINE = "native" # "native" = in-process EXE patcher, "7z" = legacy 7-Zip subprocess
+OPTIMIZE_PNGS = False # losslessly re-encode mod PNGs and store them uncompressed (see png_optimize.py)
+SEVEN_ZIP_PERCENT = re.compile(r"^\s*(\d{1,3})%") # progress lines printed by 7z -bsp1
+
+
+# Traversing, Finding, Downloading, and Hashing Utilities ===================
+def safe_join(root: str, relpath: str) -> str:
+    ''' Safely join a root and relative path, preventing path traversal. '''
+    dest = os.path.abspath(os.path.join(root, relpath))
+    if not dest.startswith(os.path.abspath(root)):
+        raise ValueError("Unsafe path in archive.")
+    return dest
+
+def copytree_merge(src, dst, strict: bool = False) -> "copy_engine.SyncStats":
+    ''' Copy contents of src into dst, merging with existing files (unchanged files are skipped). '''
+    import copy_engine
+    with tracing.span("copy", src=str(src), dst=str(dst)) as s:
+        stats = copy_engine.sync_tree(src, dst, strict=strict)
+        s.add(bytes=stats.bytes_copied, files=stats.copied, scanned=stats.scanned, skipped=stats.skipped)
+    return stats
+
+def download(url: str, sha256: str | None = None, refresh: bool = False, progress=None) -> str:
+    ''' Path of a mod URL in the download cache (fetched, resumed or revalidated only when needed; don't delete it). '''
+    import download_cache # only needed for URL installs; keeps CLI start-up fast
+    return download_cache.fetch(url, sha256, refresh, progress)
+
+def _is_url(source: str) -> bool:
+    return source.lower().startswith(("http://", "https://"))
+
+def resolve_mod_sources(sources: list[str], refresh: bool = False, progress=None) -> list[str]:
+    ''' Local paths for a list of mod zips and/or URLs; URLs come from the download cache, a few at a time. '''
+    urls = [s for s in sources if _is_url(s)]
+    if not urls:
+        return list(sources)
+    import download_cache
+    fetched = dict(zip(urls, download_cache.fetch_many(urls, refresh, progress=progress)))
+    return [fetched.get(s, s) for s in sources]
+
+def find_7z() -> str | None:
+    ''' Find 7z.exe in common locations or PATH on the computer. '''
+    for p in SEVEN_ZIP_CANDIDATES:
+        found = shutil.which(p) or (p if os.path.isfile(p) else None)
+        if found:
+            return shutil.which(p) or p
+    return None
+
+def file_sha256(path: str) -> str:
+    ''' Compute SHA-256 hash of a file. (used for verifying downloads and ensuring file integrity; cached by inode/size/mtime) '''
+    import hash_cache
+    with tracing.span("hash", nested_only=True, path=path) as s:
+        s.add(files=1)
+        return hash_cache.file_sha256(path)
+
+def _step(progress, fraction: float | None, message: str | None = None) -> None:
+    ''' Report progress(fraction, message) if the caller passed a callback. '''
+    if progress:
+        progress(fraction, message)
+
+def _scaled(progress, lo: float, hi: float):
+    ''' Map a sub-step's own 0..1 progress onto the lo..hi slice of the caller's bar. '''
+    if not progress:
+        return None
+    return lambda fraction, message=None: progress(None if fraction is None else lo + (hi - lo) * fraction, message)
+
+def _byte_progress(progress, lo: float, hi: float, message: str):
+    ''' Adapt a (done, total) bytes callback onto the lo..hi slice of an overall progress bar. '''
+    if not progress:
+        return None
+    return lambda done, total: progress(lo + (hi - lo) * done / max(total, 1), message)
+
+# Making Sure Balatro is in Steam Library ====================
+def steam_root_candidates() -> list[str]:
+    ''' Candidate Steam install roots for this operating system. '''
+    import pathlib
+    import platform
+    system = platform.system() # detecting the operating system
+    home = str(pathlib.Path.home()) # getting the home directory
+    candidates = [] # candidate steam library roots
+
+    if system == "Windows": # finding the Steam library on windows
+        candidates += [
+            os.path.join(home, "AppData", "Local", "Steam"),
+            r"C:\Program Files (x86)\Steam",
+            r"C:\Program Files\Steam",
+        ]
+    elif system == "Darwin": # finding the Steam library on macOS (what python uses to detect the home folder))
+        candidates += [os.path.join(home, "Library", "Application Support", "Steam")]
+    else:
+        candidates += [
+            os.path.join(home, ".local", "share", "Steam"),
+            os.path.join(home, ".steam", "steam"),
+        ]
+    return candidates
+
+def detect_steam_libraries() -> list[str]:
+    ''' Detect Steam library folders on the system (served from the cached install index). '''
+    return list(install_index.get_install_index(steam_root_candidates())["libraries"])
+
+def detect_balatro_dirs() -> list[str]:
+    ''' Detect installed Balatro game directories in Steam libraries (served from the cached install index). '''
+    with tracing.span("detect", nested_only=True) as s:
+        roots = list(install_index.get_install_index(steam_root_candidates())["game_roots"])
+        s.add(files=len(roots))
+    return roots
+
+def primary_game_root() -> str:
+    ''' First detected Balatro install, or "" if none was found. '''
+    dirs = detect_balatro_dirs()
+    return dirs[0] if dirs else ""
+
+def game_streaming_assets_dir(game_root: str) -> str:
+    ''' Get the StreamingAssets directory for the given game root. '''
+    import platform
+    if platform.system() == "Darwin":
+        if game_root.endswith(".app"):
+            return os.path.join(game_root, "Contents", "Resources", "Data", "StreamingAssets")
+        return os.path.join(game_root, "Data", "StreamingAssets")
+    return os.path.join(game_root, TARGET_RELATIVE)
+
+# Baching up and restoring the game assests if user doesn't want them anymore =========
+def ensure_assets_backup(game_root: str):
+    ''' Ensure a backup of the StreamingAssets exists, create if not. '''
+    backup_root = os.path.join(game_root, BACKUP_DIRNAME)
+    assets_backup = os.path.join(backup_root, "StreamingAssets")
+    if not os.path.isdir(assets_backup): # the snapshot store may already have created backup_root
+        with tracing.span("backup.assets"):
+            os.makedirs(backup_root, exist_ok=True)
+            src = game_streaming_assets_dir(game_root)
+            if os.path.isdir(src):
+                copytree_merge(src, assets_backup)
+    return backup_root
+
+def restore_assets_backup(game_root: str) -> bool:
+    ''' Restore StreamingAssets from backup, return True if restored. '''
+    backup_root = os.path.join(game_root, BACKUP_DIRNAME)
+    src = os.path.join(backup_root, "StreamingAssets")
+    dst = game_streaming_assets_dir(game_root)
+    if os.path.isdir(src):
+        with tracing.span("restore.assets"):
+            copytree_merge(src, dst)
+        return True
+    return False
+
+def backup_file(path: str) -> str:
+    ''' Backup a file by copying it to path.bak if not already backed up. '''
+    bak = path + ".bak"
+    if not os.path.exists(bak):
+        with tracing.span("backup.exe", path=path) as s:
+            shutil.copy2(path, bak)
+            s.add(bytes=os.path.getsize(bak), files=1)
+    return bak
+
+def ensure_exe_backup(game_root: str, restoring: bool = False, progress=None) -> str:
+    '''
+    Make Balatro.exe.bak if it doesn't exist, and retake it when a game update made it stale (only while
+    Balatro.exe carries none of the recorded modded textures, so the new copy is a clean original).
+    With restoring=True the recorded modded textures are put back from the old .bak first instead of
+    refusing, so a restore always gets the user back to the updated game's own art.
+    '''
+    import install_ledger
+    exe = os.path.join(game_root, EXE_NAME)
+    bak = exe + ".bak"
+    exe_archive.recover_archive(exe) # an update cut short by a crash is rolled back before anything reads the EXE
+    if not os.path.exists(bak):
+        backup_file(exe)
+        _record_backup(game_root, "first backup")
+        return bak
+    state = install_ledger.load_ledger(_ledger_path(game_root))["state"]
+    if state and install_ledger.exe_stat(exe) == {"size": state["size"], "mtime_ns": state["mtime_ns"]}:
+        return bak # nothing but this app has written Balatro.exe since it was last checked
+    reason = install_ledger.stale_backup(exe)
+    if reason is None:
+        return bak
+    manifest = load_install_manifest(game_root)
+    if manifest and manifest["entries"]:
+        drifted = set(check_install_drift(game_root).drifted)
+        installed = [n for n in manifest["entries"] if n not in drifted]
+        if installed and not restoring:
+            raise RuntimeError(f"{EXE_NAME}.bak is out of date: {reason}. {EXE_NAME} still has modded textures, so a "
+                               "new backup can't be taken; use Steam's \"Verify integrity of game files\" and try again.")
+        if installed:
+            _unmod_textures(exe, bak, installed, progress)
+    with tracing.span("backup.exe", path=exe, retake=True) as s:
+        game_backup_store(game_root).detach_base(bak) # earlier snapshots must not depend on the old .bak
+        shutil.copy2(exe, bak)
+        s.add(bytes=os.path.getsize(bak), files=1)
+    _record_backup(game_root, reason)
+    snapshot_game(game_root, "original (game updated)")
+    record_install_manifest(game_root, "original")
+    return bak
+
+def _unmod_textures(exe: str, bak: str, names: list[str], progress=None) -> None:
+    ''' Put the .bak's copy of the named textures back into Balatro.exe (dropping ones the .bak lacks), nothing else. '''
+    original = exe_archive.read_layout(bak).by_name()
+    sources = [exe_archive.EntrySource(n, bak, original[n]) for n in names if n in original]
+    removals = [n for n in names if n not in original]
+    with tracing.span("restore.textures", files=len(names)):
+        exe_archive.patch_archive(exe, sources, removals,
+                                  _byte_progress(progress, 0.0, 1.0, f"Restoring modded textures of {EXE_NAME} …"))
+
+def backup_is_stale(game_root: str) -> str | None:
+    ''' Why Balatro.exe.bak belongs to an older game version, or None (one stat when the ledger is current). '''
+    import install_ledger
+    exe = os.path.join(game_root, EXE_NAME)
+    state = install_ledger.load_ledger(_ledger_path(game_root))["state"]
+    if not os.path.isfile(exe + ".bak") or (
+            state and install_ledger.exe_stat(exe) == {"size": state["size"], "mtime_ns": state["mtime_ns"]}):
+        return None
+    return install_ledger.stale_backup(exe)
+
+def restore_exe_backup(game_root: str, delta: bool = True, progress=None) -> exe_archive.PatchReport | None:
+    '''
+    Restore Balatro.exe from backup, return a report of what changed (None if there is no backup).
+    With delta=True only the archive entries that differ from the .bak (by name, CRC32 and size)
+    are rewritten; a full copy is used when the EXE stub itself differs or the EXE is unreadable.
+    A restore right after another restore is answered from the ledger without reading the EXE.
+    '''
+    import install_ledger
+    exe = os.path.join(game_root, EXE_NAME)
+    bak = exe + ".bak"
+    if not os.path.isfile(bak):
+        return None
+    ledger = install_ledger.load_ledger(_ledger_path(game_root))
+    if delta and install_ledger.is_current(ledger, exe, "restore"):
+        return exe_archive.PatchReport(unchanged=ledger["state"].get("entries", 0), size_before=ledger["state"]["size"],
+                                       size_after=ledger["state"]["size"])
+    started = time.perf_counter()
+    before = install_ledger.exe_state(exe)
+    with tracing.span("restore.exe", delta=delta) as s:
+        ensure_exe_backup(game_root, restoring=True, progress=progress) # never put an older game version's files back
+        if delta and os.path.isfile(exe):
+            try:
+                report = exe_archive.sync_archive_to(exe, bak, _byte_progress(progress, 0.0, 1.0, f"Restoring modded entries of {EXE_NAME} …"))
+                if report is not None:
+                    s.add(bytes=report.bytes_written, files=len(report.replaced) + len(report.added) + len(report.removed),
+                          unchanged=report.unchanged)
+                    record_install_manifest(game_root, "original")
+                    _record(game_root, "restore", before, started, "restore", rewritten=len(report.replaced) + len(report.added))
+                    return report
+            except exe_archive.ArchiveError:
+                pass # damaged EXE: fall through to copying the whole backup
+        size = os.path.getsize(exe) if os.path.isfile(exe) else 0
+        _step(progress, None, f"Copying {EXE_NAME}.bak over {EXE_NAME} …")
+        shutil.copy2(bak, exe)
+        s.add(bytes=os.path.getsize(exe), files=1, full_copy=True)
+        record_install_manifest(game_root, "original")
+        _record(game_root, "restore", before, started, "restore", full_copy=True)
+        return exe_archive.PatchReport(bytes_written=os.path.getsize(exe), size_before=size,
+                                       size_after=os.path.getsize(exe), full_copy=True)
+
+def restore_game(game_root: str, delta: bool = True, progress=None) -> tuple[exe_archive.PatchReport | None, bool]:
+    ''' Restore Balatro.exe and StreamingAssets from their backups (what the Restore button runs); delta as in restore_exe_backup. '''
+    with tracing.span("restore"):
+        restored_exe = restore_exe_backup(game_root, delta=delta, progress=_scaled(progress, 0.0, 0.8))
+        _step(progress, 0.8, "Restoring StreamingAssets …")
+        restored_assets = restore_assets_backup(game_root)
+        _step(progress, 1.0, "Done")
+    return restored_exe, restored_assets
+
+# Snapshot history (deduplicated, see backup_store.py) ==========
+def game_backup_store(game_root: str) -> "backup_store.BackupStore":
+    ''' The content-addressed snapshot store for a game install. '''
+    import backup_store
+    return backup_store.BackupStore(os.path.join(game_root, BACKUP_DIRNAME, STORE_DIRNAME))
+
+def snapshot_game(game_root: str, label: str, assets: bool = True) -> dict:
+    '''
+    Snapshot Balatro.exe entries (+ StreamingAssets unless assets=False); only content not already stored
+    is written, and entries still identical to Balatro.exe.bak are referenced rather than copied.
+    '''
+    exe = os.path.join(game_root, EXE_NAME)
+    with tracing.span("backup.snapshot", label=label) as s:
+        manifest = game_backup_store(game_root).snapshot(label, exe, game_streaming_assets_dir(game_root) if assets else None,
+                                                         base_path=exe + ".bak")
+        stats = manifest["stats"]
+        s.add(bytes=stats["new_bytes"], files=stats["objects_written"], reused=stats["reused"], from_base=stats["from_base"])
+        return manifest
+
+def restore_snapshot(game_root: str, snapshot_id: str, progress=None) -> dict:
+    ''' Put Balatro.exe and StreamingAssets back to an earlier snapshot. '''
+    import install_ledger
+    started = time.perf_counter()
+    before = install_ledger.exe_state(os.path.join(game_root, EXE_NAME))
+    with tracing.span("restore.snapshot", snapshot=snapshot_id) as s:
+        exe = os.path.join(game_root, EXE_NAME)
+        exe_archive.recover_archive(exe)
+        res = game_backup_store(game_root).restore(snapshot_id, exe, game_streaming_assets_dir(game_root),
+                                                   _byte_progress(progress, 0.0, 1.0, f"Restoring snapshot {snapshot_id} …"),
+                                                   base_path=exe + ".bak")
+        report = res.get("exe_report")
+        s.add(bytes=report.bytes_written if report else 0, files=res["files"])
+        if res["exe"]:
+            record_install_manifest(game_root, game_backup_store(game_root).load_snapshot(snapshot_id).get("label", ""),
+                                    snapshot_id)
+            _record(game_root, "restore_snapshot", before, started, None, snapshot=snapshot_id)
+        return res
+
+# Installation =======================================
+def apply_zip_to_dir(zip_path: str, dest_dir: str):
+    ''' Apply the contents of a zip file to a destination directory. '''
+    import zipfile
+    with zipfile.ZipFile(zip_path) as z:
+        for m in z.infolist():
+            if m.is_dir():
+                continue
+            if ".." in m.filename or m.filename.startswith(("/", "\\")):
+                continue
+            out_path = safe_join(dest_dir, m.filename)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with z.open(m) as src, open(out_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+
+# # DOESN'T WORK WITH WAY BALATRO IS PACKAGED ON STEAM
+# def install_to_streamingassets(game_root: str, mod_zip_or_url: str) -> str:
+#     ''' Install mod zip into StreamingAssets directory. '''
+#     ensure_assets_backup(game_root)
+#     target_root = game_root
+#     if mod_zip_or_url.startswith(("http://", "https://")):
+#         tmp = download(mod_zip_or_url)
+#         try:
+#             apply_zip_to_dir(tmp, target_root)
+#         finally:
+#             try: os.remove(tmp)
+#             except: pass
+#     else:
+#         apply_zip_to_dir(mod_zip_or_url, target_root)
+#     return "Installed mod to StreamingAssets (non-EXE method)."
+    
+
+def install_into_exe_archive(game_root: str, mod_zip_or_url: str, engine: str = INSTALL_ENGINE, progress=None,
+                             optimize_pngs: bool = OPTIMIZE_PNGS) -> str:
+    ''' Install mod zip into Balatro.exe (in-process patcher by default, or 7-Zip with engine="7z"). '''
+    if engine == "7z":
+        exe_path = os.path.join(game_root, EXE_NAME)
+        if not os.path.isfile(exe_path):
+            raise RuntimeError(f"{EXE_NAME} not found in the selected folder.")
+        message = install_with_7z(exe_path, expand_delta_packs(game_root, resolve_mod_sources([mod_zip_or_url]))[0], progress)
+        record_install_manifest(game_root, f"installed {os.path.basename(mod_zip_or_url)} (7z)")
+        return message
+    return install_mods_into_exe_archive(game_root, [mod_zip_or_url], progress=progress, optimize_pngs=optimize_pngs)
+
+def install_mods_into_exe_archive(game_root: str, mod_zips: list[str], names: list[str] | None = None, progress=None,
+                                  optimize_pngs: bool = OPTIMIZE_PNGS) -> str:
+    '''
+    Apply several mod zips to Balatro.exe in a single archive update.
+    The zips are overlaid in order (later zips win on conflicting textures), so N mods
+    cost one patch instead of N. names are the labels used for the snapshot (default: file names).
+    progress(fraction, message) is called as the install moves along (fraction may be None).
+    optimize_pngs re-encodes the textures losslessly first (cached, so repeat installs stay no-ops).
+    '''
+    import hash_cache
+    import install_ledger
+    import mod_preflight
+    exe_path = os.path.join(game_root, EXE_NAME)
+    if not os.path.isfile(exe_path):
+        raise RuntimeError(f"{EXE_NAME} not found in the selected folder.")
+
+    with tracing.span("install", engine="native", mods=len(mod_zips)):
+        if any(_is_url(z) for z in mod_zips):
+            import download_cache
+            _step(progress, 0.0, "Downloading mods …")
+            names = names or [download_cache.display_name(z) for z in mod_zips]
+            mod_zips = resolve_mod_sources(mod_zips, progress=_scaled(progress, 0.0, 0.05))
+        started = time.perf_counter()
+        digests = hash_cache.hash_files(mod_zips) # cached by size + mtime, so repeat installs don't re-read the zips
+        key = install_ledger.operation_key("install", *(digests[z] for z in mod_zips), f"optimize={optimize_pngs}")
+        if install_ledger.is_current(load_install_ledger(game_root), exe_path, key):
+            return "Those textures are already installed, nothing to do."
+        expanded = expand_delta_packs(game_root, mod_zips, progress)
+        if expanded != mod_zips:
+            names = names or [os.path.basename(z) for z in mod_zips]
+            mod_zips = expanded
+        _step(progress, 0.0, "Checking mod zips …")
+        with tracing.span("preflight") as s:
+            for path, name in zip(mod_zips, names or mod_zips): # reject bad zips before anything is backed up
+                report = mod_preflight.preflight_mod_zip(path)
+                s.add(files=report.entries, bytes=report.total_uncompressed)
+                if not report.ok:
+                    raise RuntimeError(f"{os.path.basename(name)}: " + " ".join(report.errors))
+
+        before = install_ledger.exe_state(exe_path)
+        _step(progress, 0.03, f"Backing up {EXE_NAME} …")
+        ensure_exe_backup(game_root) # first: compositing reads the original atlases from the .bak
+        _step(progress, 0.05, f"Reading {EXE_NAME} …")
+        with tracing.span("archive.read") as s:
+            sources = exe_archive.overlay_sources(mod_zips) # reads only the zips' central directories
+            layout = exe_archive.read_layout(exe_path)
+            s.add(exe_entries=len(layout.entries))
+        with tracing.span("composite") as s:
+            import atlas_compose # NumPy + Pillow, only needed once an install actually runs
+            bak = exe_path + ".bak"
+            sources = atlas_compose.composite_sources(exe_path, bak if os.path.isfile(bak) else exe_path,
+                                                      mod_zips, sources, layout) # merge face-card atlases cell by cell
+            s.add(files=len(sources))
+        if optimize_pngs:
+            _step(progress, 0.07, "Optimizing PNGs …")
+            with tracing.span("png.optimize") as s:
+                import png_optimize
+                sources, stats = png_optimize.optimize_sources(sources)
+                s.add(bytes=stats["bytes_before"], files=stats["pngs"], cached=stats["cached"],
+                      bytes_after=stats["bytes_after"])
+        sources = exe_archive.changed_sources(layout, sources) # textures already in the EXE are skipped
+        if not sources:
+            if load_install_manifest(game_root) is None: # installed before manifests were recorded
+                snapshots = game_backup_store(game_root).list_snapshots()
+                record_install_manifest(game_root, f"installed {' + '.join(names or map(os.path.basename, mod_zips))}",
+                                        snapshots[0]["id"] if snapshots else None)
+            _record(game_root, "install", before, started, key, install_ledger.mod_records(mod_zips, names), noop=True)
+            return "Those textures are already installed, nothing to do."
+
+        if not game_backup_store(game_root).list_snapshots():
+            _step(progress, 0.2, "Saving a snapshot of the original textures …")
+            snapshot_game(game_root, "original", assets=False) # installs only ever write Balatro.exe
+            layout = None # snapshotting doesn't change the EXE, but don't rely on a stale read
+        with tracing.span("archive.update") as s:
+            patch = exe_archive.patch_archive(exe_path, sources, layout=layout, # copies only the replaced entries + rewrites the central directory
+                                              progress=_byte_progress(progress, 0.3, 0.9, f"Writing {len(sources)} texture(s) …"))
+            s.add(bytes=patch.bytes_written, files=len(patch.replaced) + len(patch.added))
+        _step(progress, 0.9, "Recording snapshot …")
+        names = names or [os.path.basename(z) for z in mod_zips]
+        label = f"installed {' + '.join(names)}"
+        snapshot = snapshot_game(game_root, label, assets=False) # stores just the entries that differ from the .bak
+        record_install_manifest(game_root, label, snapshot["id"])
+        _record(game_root, "install", before, started, key, install_ledger.mod_records(mod_zips, names),
+                snapshot=snapshot["id"], bytes_written=patch.bytes_written)
+        _step(progress, 1.0, "Done")
+    if len(mod_zips) > 1:
+        return f"Successfully Modded Balatro with {len(mod_zips)} art mods!"
+    return "Successfully Modded Balatro with new artwork!"
+
+def _run_7z(cmd: list[str], cwd: str, progress=None) -> tuple[int, str]:
+    ''' Run 7-Zip, forwarding its live "NN%" progress output; returns (exit code, full output). '''
+    import subprocess
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = []
+    pending = ""
+    while chunk := proc.stdout.read1(4096): # 7z redraws its progress line with \r / backspaces, not newlines
+        text = chunk.decode(errors="replace")
+        output.append(text)
+        *lines, pending = re.split(r"[\r\n\b]+", pending + text)
+        for line in lines + ([pending] if SEVEN_ZIP_PERCENT.search(pending) else []):
+            m = SEVEN_ZIP_PERCENT.search(line)
+            if m:
+                _step(progress, int(m.group(1)) / 100, line.strip())
+    return proc.wait(), "".join(output)
+
+def install_with_7z(exe_path: str, mod_zip_path: str, progress=None) -> str:
+    ''' Legacy install path: extract the mod zip and let 7-Zip update Balatro.exe. '''
+    import zipfile
+    import tempfile
+    seven_zip = find_7z()
+    if not seven_zip:
+        raise RuntimeError("7-Zip (7z.exe) not found! Install 7-Zip.")
+
+    staging = tempfile.mkdtemp(prefix="balatro_mod_")
+    try:
+        with tracing.span("install", engine="7z", mods=1):
+            _step(progress, 0.0, "Extracting textures …")
+            extracted = []
+            with tracing.span("extract") as s, zipfile.ZipFile(mod_zip_path) as z: # only the textures 7z will pick up are inflated
+                for m in z.infolist():
+                    name = m.filename.replace("\\", "/")
+                    if m.is_dir() or not name.startswith(exe_archive.TEXTURE_PREFIX):
+                        continue
+                    out_path = safe_join(staging, name)
+                    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                    with z.open(m) as src, open(out_path, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    s.add(bytes=m.file_size, files=1)
+                    extracted.append(name)
+
+            rel_target = os.path.join(staging, "resources", "textures", "2x")
+            if not os.path.isdir(rel_target):
+                _step(progress, None, "Note: Zip should mirror EXE layout: resources\\textures\\2x\\...")
+
+            _step(progress, 0.05, f"Backing up {EXE_NAME} …")
+            ensure_exe_backup(os.path.dirname(exe_path))
+
+            cmd = [
+                seven_zip,
+                "u", "-y", "-bsp1", # -bsp1: stream progress percentages to stdout
+                exe_path,
+                r"resources\textures\2x\*",
+            ]
+            if extracted and all(exe_archive.compress_type_for(n) == 0 for n in extracted):
+                cmd.insert(4, "-mx=0") # PNGs are already deflated: have 7z store them instead of recompressing
+            with tracing.span("archive.update") as s:
+                returncode, output = _run_7z(cmd, staging, _scaled(progress, 0.1, 1.0)) # run the 7z update command to automatically unarchive and update the .exe by dropping in the new images
+                s.add(bytes=os.path.getsize(exe_path), returncode=returncode)
+            if returncode != 0:
+                raise RuntimeError(f"7z update failed:\n{output}")
+
+        return "Successfully Modded Balatro with new artwork!" 
+    finally: # remove the temporary staging directory
+        shutil.rmtree(staging, ignore_errors=True)
+
+# Delta packs (see delta_pack.py) ==========
+def _original_exe(game_root: str) -> str:
+    ''' Where the game's original textures are: Balatro.exe.bak, or Balatro.exe before the first install. '''
+    exe = os.path.join(game_root, EXE_NAME)
+    return exe + ".bak" if os.path.isfile(exe + ".bak") else exe
+
+def make_delta_pack(game_root: str, mod_zip: str, out_path: str | None = None, progress=None) -> dict:
+    ''' Pack mod_zip as a delta against this install's original textures; returns make_pack's stats plus "path". '''
+    import delta_pack # NumPy + Pillow
+    out_path = out_path or os.path.splitext(mod_zip)[0] + ".delta.zip"
+    with tracing.span("delta.pack") as s:
+        stats = delta_pack.make_pack(mod_zip, _original_exe(game_root), out_path, progress=progress)
+        s.add(bytes=stats["bytes_in"], files=stats["textures"], bytes_out=stats["bytes_out"])
+    return {**stats, "path": out_path}
+
+def expand_delta_packs(game_root: str, mod_zips: list[str], progress=None) -> list[str]:
+    ''' mod_zips with every delta pack swapped for the full mod zip rebuilt from this install's originals. '''
+    import mod_preflight
+    if not any(mod_preflight.is_delta_pack(z) for z in mod_zips):
+        return mod_zips
+    import delta_pack # NumPy + Pillow, only once a pack is actually installed
+    _step(progress, None, "Rebuilding textures from delta packs …")
+    out = []
+    for z in mod_zips:
+        if mod_preflight.is_delta_pack(z):
+            with tracing.span("delta.expand", nested_only=True) as s:
+                z = delta_pack.expand_pack(z, _original_exe(game_root))
+                s.add(bytes=os.path.getsize(z), files=1)
+        out.append(z)
+    return out
+
+# Verifying an install ==========
+def verify_install(game_root: str, check_crc: bool = False, progress=None) -> dict:
+    '''
+    Check that Balatro.exe is a readable archive (and, with check_crc, that every entry inflates to
+    its CRC32), and list the entries that differ from Balatro.exe.bak, i.e. what is currently modded.
+    '''
+    exe = os.path.join(game_root, EXE_NAME)
+    bak = exe + ".bak"
+    result = {"exe": os.path.isfile(exe), "backup": os.path.isfile(bak), "entries": 0,
+              "problems": [], "modded": [], "added": []}
+    if not result["exe"]:
+        result["problems"].append(f"{EXE_NAME} not found in {game_root}.")
+        return result
+    with tracing.span("verify", check_crc=check_crc) as s:
+        try:
+            table = exe_archive.read_table(exe)
+            result["entries"] = len(table)
+            result["problems"] += exe_archive.check_archive(exe, check_crc,
+                                                            _byte_progress(progress, 0.0, 1.0, f"Checking {EXE_NAME} …"))
+        except (OSError, exe_archive.ArchiveError) as e:
+            result["problems"].append(f"{EXE_NAME} is not a readable archive: {e}")
+            return result
+        if result["backup"]:
+            try:
+                result["modded"], result["added"], _ = table.diff(exe_archive.read_table(bak))
+            except (OSError, exe_archive.ArchiveError) as e:
+                result["problems"].append(f"{EXE_NAME}.bak is not a readable archive: {e}")
+        s.add(files=result["entries"], bytes=table.file_size if check_crc else 0)
+    result["drift"] = check_install_drift(game_root)
+    result["backup_stale"] = backup_is_stale(game_root) if result["backup"] else None
+    if result["backup_stale"]:
+        result["problems"].append(f"{EXE_NAME}.bak is out of date: {result['backup_stale']}. The next install or "
+                                  "restore takes a new one once no modded textures are left in the EXE.")
+    return result
+
+# Ledger and drift since the last install (see install_ledger.py, drift.py) ==========
+def _ledger_path(game_root: str) -> str:
+    return os.path.join(game_root, BACKUP_DIRNAME, LEDGER_FILENAME)
+
+def load_install_ledger(game_root: str) -> dict:
+    ''' The game root's ledger: {"backup", "state", "history"} (empty until something was installed). '''
+    import install_ledger
+    return install_ledger.load_ledger(_ledger_path(game_root))
+
+def _record(game_root: str, op: str, before: dict | None, started: float, key: str | None, mods: list[dict] = (),
+            **details) -> None:
+    import install_ledger
+    try:
+        install_ledger.record(_ledger_path(game_root), os.path.join(game_root, EXE_NAME), op, before, started, key,
+                              mods, **details)
+    except OSError:
+        pass # the next operation just can't take the shortcut
+
+def _record_backup(game_root: str, reason: str) -> None:
+    import install_ledger
+    try:
+        install_ledger.record_backup(_ledger_path(game_root), os.path.join(game_root, EXE_NAME + ".bak"), reason)
+    except OSError:
+        pass
+
+def _manifest_path(game_root: str) -> str:
+    return os.path.join(game_root, BACKUP_DIRNAME, INSTALL_MANIFEST)
+
+def load_install_manifest(game_root: str) -> dict | None:
+    ''' The manifest the last install or restore recorded, or None if there isn't one. '''
+    import drift
+    m = app_cache.load_json(_manifest_path(game_root))
+    return m if m and m.get("version") == drift.MANIFEST_VERSION else None
+
+def record_install_manifest(game_root: str, label: str, snapshot_id: str | None = None) -> dict | None:
+    ''' Remember which entries Balatro.exe now has that differ from the .bak (None if it can't be read). '''
+    import drift
+    exe = os.path.join(game_root, EXE_NAME)
+    try:
+        manifest = drift.build_manifest(exe, label, snapshot_id)
+        os.makedirs(os.path.join(game_root, BACKUP_DIRNAME), exist_ok=True)
+        app_cache.save_json_atomic(_manifest_path(game_root), manifest)
+    except (OSError, exe_archive.ArchiveError):
+        return None # drift checks fall back to comparing with the .bak
+    return manifest
+
+def check_install_drift(game_root: str) -> "drift.DriftReport":
+    ''' What in Balatro.exe / StreamingAssets no longer matches the last recorded install (directories only). '''
+    import drift
+    with tracing.span("drift.check", nested_only=True) as s:
+        report = drift.check_drift(os.path.join(game_root, EXE_NAME), load_install_manifest(game_root),
+                                   game_streaming_assets_dir(game_root),
+                                   os.path.join(game_root, BACKUP_DIRNAME, "StreamingAssets"))
+        s.add(files=len(report.drifted), unexpected=len(report.unexpected))
+    return report
+
+def reapply_drift(game_root: str, progress=None) -> exe_archive.PatchReport | None:
+    '''
+    Write back only the drifted entries of the last install, from the snapshot it recorded.
+    Returns None when nothing drifted. StreamingAssets drift is only reported: installs don't write there.
+    '''
+    import drift
+    import install_ledger
+    exe = os.path.join(game_root, EXE_NAME)
+    exe_archive.recover_archive(exe)
+    report = check_install_drift(game_root)
+    if not report.drifted:
+        return None
+    manifest = load_install_manifest(game_root)
+    expected = manifest["entries"]
+    sources = []
+    if manifest.get("snapshot"):
+        store = game_backup_store(game_root)
+        try:
+            exe_m = store.load_snapshot(manifest["snapshot"]).get("exe")
+            wanted = set(report.drifted)
+            sources = [src for src in (store.exe_sources(exe_m, exe + ".bak") if exe_m else [])
+                       if src.name in wanted and [src.entry.crc, src.entry.file_size] == expected[src.name]]
+        except FileNotFoundError: # snapshot deleted, or taken against an older .bak
+            sources = []
+    if len(sources) != len(report.drifted):
+        raise RuntimeError(f"The backup store doesn't have the textures of \"{manifest.get('label')}\"; "
+                           "install the mod again instead.")
+    started = time.perf_counter()
+    before = install_ledger.exe_state(exe)
+    with tracing.span("drift.reapply") as s:
+        patch = exe_archive.patch_archive(exe, sources, progress=_byte_progress(
+            progress, 0.0, 1.0, f"Re-applying {len(sources)} texture(s) …"))
+        s.add(bytes=patch.bytes_written, files=len(sources))
+    record_install_manifest(game_root, manifest.get("label", ""), manifest.get("snapshot"))
+    _record(game_root, "reapply", before, started, None, entries=len(sources), bytes_written=patch.bytes_written)
+    return patch
+
+# Helpers for the pages / CLI ==========
+def current_exe_layout(game_root: str) -> exe_archive.ArchiveLayout | None:
+    ''' Central directory of the game's Balatro.exe, or None if it can't be read. '''
+    try:
+        return exe_archive.read_layout(os.path.join(game_root, EXE_NAME))
+    except (OSError, exe_archive.ArchiveError):
+        return None
+
+def modded_entries(game_root: str) -> tuple[list[str], list[str]] | None:
+    ''' (changed, added) entry names of Balatro.exe against Balatro.exe.bak, or None without a readable pair. '''
+    exe = os.path.join(game_root, EXE_NAME)
+    try:
+        with tracing.span("detect.modded", nested_only=True) as s:
+            changed, added, _ = exe_archive.read_table(exe).diff(exe_archive.read_table(exe + ".bak"))
+            s.add(files=len(changed) + len(added))
+        return changed, added
+    except (OSError, exe_archive.ArchiveError):
+        return None
+
+def list_bundled_mods() -> list[str]:
+    ''' File names of the mod zips shipped in MODS_DIR. '''
+    if not os.path.isdir(MODS_DIR):
+        return []
+    return sorted(f for f in os.listdir(MODS_DIR) if f.lower().endswith(".zip"))
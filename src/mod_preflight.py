@@ -0,0 +1,134 @@
+import time
+from dataclasses import dataclass, field
+
+import exe_archive
+
+# Zero-extraction preflight for mod zips ====================
+# Everything here comes from the zip's central directory, so a bad zip is rejected in milliseconds,
+# before Balatro.exe is backed up or touched, without inflating a single entry.
+MAX_RATIO = 100 # uncompressed / compressed beyond this looks like a zip bomb
+RATIO_MIN_BYTES = 1024 * 1024 # ...but tiny entries compress absurdly well, so only flag big ones
+MAX_TOTAL_BYTES = 1024 * 1024 * 1024 # refuse mods that would inflate to more than 1 GiB
+TEXTURE_EXTENSIONS = (".png",)
+DELTA_MANIFEST = "delta.json" # marks a delta pack (see delta_pack.py)
+DELTA_REGIONS_DIR = "delta/" # a delta pack's sprite crops, outside resources/ so they are never installed as-is
+
+
+@dataclass
+class PreflightReport:
+    ''' What a mod zip contains and whether it is safe to install. '''
+    zip_name: str
+    entries: int = 0
+    total_uncompressed: int = 0
+    textures: list[str] = field(default_factory=list) # EXE entries the mod would write
+    unsafe_paths: list[str] = field(default_factory=list)
+    outside_layout: list[str] = field(default_factory=list) # files not under resources/textures/2x/
+    non_png: list[str] = field(default_factory=list)
+    suspicious_ratio: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+    replaces: list[str] = field(default_factory=list) # only filled when an EXE layout is given
+    adds: list[str] = field(default_factory=list)
+    identical: list[str] = field(default_factory=list) # already in the EXE with the same CRC + size
+    delta: bool = False # a delta pack: more textures are rebuilt from Balatro.exe.bak at install time
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _nested_root(names: list[str], prefix: str) -> str | None:
+    ''' If textures sit one folder too deep (MyMod/resources/textures/2x/...), return that folder. '''
+    for n in names:
+        i = n.find("/" + prefix)
+        if i > 0:
+            return n[:i + 1]
+    return None
+
+def is_delta_pack(zip_path: str) -> bool:
+    ''' True for zips holding a delta manifest (central directory only). '''
+    try:
+        return any(e.name == DELTA_MANIFEST for e in exe_archive.read_layout(zip_path).entries)
+    except (OSError, exe_archive.ArchiveError):
+        return False
+
+def preflight_mod_zip(zip_path, exe_layout: exe_archive.ArchiveLayout | None = None,
+                      prefix: str = exe_archive.TEXTURE_PREFIX) -> PreflightReport:
+    ''' Check a mod zip (path or open binary file) using only its central directory. '''
+    started = time.perf_counter()
+    report = PreflightReport(getattr(zip_path, "name", str(zip_path)))
+    try:
+        layout = exe_archive.read_layout(zip_path)
+    except (OSError, exe_archive.ArchiveError) as e:
+        report.errors.append(f"Not a readable zip: {e}")
+        report.seconds = time.perf_counter() - started
+        return report
+
+    seen = set()
+    files = []
+    for e in layout.entries:
+        if e.is_dir():
+            continue
+        report.entries += 1
+        report.total_uncompressed += e.file_size
+        name = e.name.replace("\\", "/")
+        files.append(name)
+        if not exe_archive.is_safe_member_name(name): # same rule safe_join enforces
+            report.unsafe_paths.append(e.name)
+            continue
+        if e.file_size >= RATIO_MIN_BYTES and e.file_size > MAX_RATIO * max(e.compress_size, 1):
+            report.suspicious_ratio.append(name)
+        if not name.startswith(prefix):
+            report.outside_layout.append(name)
+            continue
+        if not name.lower().endswith(TEXTURE_EXTENSIONS):
+            report.non_png.append(name)
+        problem = exe_archive.entry_problem(name, e)
+        if problem:
+            report.errors.append(problem)
+        if name in seen:
+            report.warnings.append(f"{name} appears more than once; the last copy wins.")
+        seen.add(name)
+        report.textures.append(name)
+
+    if DELTA_MANIFEST in files:
+        report.delta = True
+        report.outside_layout = [n for n in report.outside_layout
+                                 if n != DELTA_MANIFEST and not n.startswith(DELTA_REGIONS_DIR)]
+        report.warnings.append("Delta pack: changed sprites are rebuilt from the original textures in "
+                               "Balatro.exe.bak when it is installed.")
+    if report.unsafe_paths:
+        report.errors.append(f"{len(report.unsafe_paths)} entr{'y has' if len(report.unsafe_paths) == 1 else 'ies have'} "
+                             "unsafe paths (absolute, drive letters or '..').")
+    if not report.textures and not report.delta:
+        nested = _nested_root(files, prefix)
+        if nested:
+            report.errors.append(f"Textures are inside an extra top-level folder '{nested}'. "
+                                 f"Zip the contents of that folder so {prefix} is at the root.")
+        else:
+            report.errors.append(f"No {prefix} entries found. Zip should mirror EXE layout: resources\\textures\\2x\\...")
+    elif report.outside_layout:
+        report.warnings.append(f"{len(report.outside_layout)} file(s) outside {prefix} will be ignored.")
+    if report.non_png:
+        report.warnings.append(f"{len(report.non_png)} texture entr{'y is' if len(report.non_png) == 1 else 'ies are'} not .png.")
+    if report.suspicious_ratio:
+        report.errors.append(f"{len(report.suspicious_ratio)} entr{'y has' if len(report.suspicious_ratio) == 1 else 'ies have'} "
+                             f"a compression ratio above {MAX_RATIO}:1 (possible zip bomb).")
+    if report.total_uncompressed > MAX_TOTAL_BYTES:
+        report.errors.append(f"Zip would inflate to {report.total_uncompressed / 2**20:.0f} MB, "
+                             f"over the {MAX_TOTAL_BYTES // 2**20} MB limit.")
+
+    if exe_layout is not None:
+        current = exe_layout.by_name()
+        incoming = {e.name.replace("\\", "/"): e for e in layout.entries}
+        for name in report.textures:
+            old = current.get(name)
+            if old is None:
+                report.adds.append(name)
+            elif exe_archive.same_entry(old, incoming[name]):
+                report.identical.append(name)
+            else:
+                report.replaces.append(name)
+    report.seconds = time.perf_counter() - started
+    return report
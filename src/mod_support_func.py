@@ -1,31 +1,36 @@
+import io
 import os
 import sys
-import shutil
-import zipfile
-import tempfile
+import time
 import pathlib
-import platform
-import subprocess
-import urllib.request
-import hashlib
 import base64
 
 import streamlit as st
 
-APP_NAME = "Balatro Mod Manager" # shown in the actual browser tab
-BACKUP_DIRNAME = "_backup_BalatroArt" # store all the backups here for reverting to original art
-TARGET_RELATIVE = os.path.join("Balatro_Data", "StreamingAssets")
-EXE_NAME = "Balatro.exe"
-
-# Folder that holds downloadable mod zips (commit these to your repo)
-MODS_DIR = os.path.join(os.path.dirname(__file__), "mods") # mods folder for where the card art zip is with the 7-zip heirarchy
+import atlas_compose
+import exe_archive
+import installed_textures
+import job_runner
+import mod_catalog
+import mod_core
+import mod_preflight
+import multi_install
+import texture_index
+import thumbnails
+import tracing
+import uploads
+# the install/backup/restore logic lives in mod_core (shared with the CLI); re-exported for the pages and app.py
+from mod_core import (BACKUP_DIRNAME, STORE_DIRNAME, TARGET_RELATIVE, EXE_NAME, MODS_DIR, SEVEN_ZIP_CANDIDATES,
+                      INSTALL_ENGINE, safe_join, copytree_merge, download, find_7z, file_sha256,
+                      steam_root_candidates, detect_steam_libraries, detect_balatro_dirs, primary_game_root,
+                      game_streaming_assets_dir, ensure_assets_backup, restore_assets_backup, backup_file,
+                      restore_exe_backup, restore_game, game_backup_store, snapshot_game, restore_snapshot,
+                      apply_zip_to_dir, install_into_exe_archive, install_mods_into_exe_archive, install_with_7z,
+                      current_exe_layout, modded_entries, list_bundled_mods, load_install_manifest,
+                      record_install_manifest, check_install_drift, reapply_drift, ensure_exe_backup,
+                      backup_is_stale, load_install_ledger)
 
-# seraching for 7z.exe to easily install the mod
-SEVEN_ZIP_CANDIDATES = [
-    r"C:\Program Files\7-Zip\7z.exe",
-    r"C:\Program Files (x86)\7-Zip\7z.exe",
-    "7z.exe",
-]
+APP_NAME = "Balatro Mod Manager" # shown in the actual browser tab
 
 
 
@@ -39,234 +44,6 @@ def local_css(file_name: str) -> None:
     except FileNotFoundError:
         st.error(f"CSS file {file_name} not found!")
 
-# Traversing, Finding, Downloading, and Hashing Utilities ===================
-def safe_join(root: str, relpath: str) -> str:
-    ''' Safely join a root and relative path, preventing path traversal. '''
-    dest = os.path.abspath(os.path.join(root, relpath))
-    if not dest.startswith(os.path.abspath(root)):
-        raise ValueError("Unsafe path in archive.")
-    return dest
-
-def copytree_merge(src, dst):
-    ''' Copy contents of src into dst, merging with existing files. '''
-    os.makedirs(dst, exist_ok=True)
-    for root, dirs, files in os.walk(src):
-        rel = os.path.relpath(root, src)
-        target_root = os.path.join(dst, rel) if rel != "." else dst
-        os.makedirs(target_root, exist_ok=True)
-        for d in dirs:
-            os.makedirs(os.path.join(target_root, d), exist_ok=True)
-        for f in files:
-            shutil.copy2(os.path.join(root, f), os.path.join(target_root, f))
-
-def download(url: str) -> str:
-    ''' Download a URL to a temp file and return its path. '''
-    tmp = tempfile.mkstemp(suffix=".zip")
-    with urllib.request.urlopen(url) as r, open(tmp, "wb") as f:
-        shutil.copyfileobj(r, f)
-    return tmp
-
-def find_7z() -> str | None:
-    ''' Find 7z.exe in common locations or PATH on the computer. '''
-    for p in SEVEN_ZIP_CANDIDATES:
-        found = shutil.which(p) or (p if os.path.isfile(p) else None)
-        if found:
-            return shutil.which(p) or p
-    return None
-
-def file_sha256(path: str) -> str:
-    ''' Compute SHA-256 hash of a file. (used for verifying downloads and ensuring file integrity) '''
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
-# Making Sure Balatro is in Steam Library ====================
-def detect_steam_libraries() -> list[str]:
-    ''' Detect Steam library folders on the system. '''
-    paths = [] # list of detected steam library folders
-    system = platform.system() # detecting the operating system
-    home = str(pathlib.Path.home()) # getting the home directory
-    candidates = [] # candidate steam library roots
-
-    if system == "Windows": # finding the Steam library on windows
-        candidates += [
-            os.path.join(home, "AppData", "Local", "Steam"),
-            r"C:\Program Files (x86)\Steam",
-            r"C:\Program Files\Steam",
-        ]
-    elif system == "Darwin": # finding the Steam library on macOS (what python uses to detect the home folder))
-        candidates += [os.path.join(home, "Library", "Application Support", "Steam")]
-    else:
-        candidates += [
-            os.path.join(home, ".local", "share", "Steam"),
-            os.path.join(home, ".steam", "steam"),
-        ]
-
-    for root in candidates: # reading the steam libraryfolders.vdf file to find additional steam libraries
-        vdf = os.path.join(root, "steamapps", "libraryfolders.vdf") #everything is through the steamapps dir
-        if os.path.isfile(vdf):
-            try:
-                with open(vdf, "r", encoding="utf-8", errors="ignore") as f:
-                    text = f.read()
-                for line in text.splitlines():
-                    line = line.strip()
-                    if line.lower().startswith('"path"'):
-                        parts = line.split('"')
-                        if len(parts) >= 4:
-                            p = parts[3].replace("\\\\", "\\")
-                            sa = os.path.join(p, "steamapps")
-                            if os.path.isdir(sa):
-                                paths.append(sa)
-            except Exception:
-                pass
-        sa_default = os.path.join(root, "steamapps")
-        if os.path.isdir(sa_default):
-            paths.append(sa_default)
-
-    out = []
-    for p in paths:
-        if p not in out and os.path.isdir(p):
-            out.append(p)
-    return out
-
-def detect_balatro_dirs() -> list[str]:
-    ''' Detect installed Balatro game directories in Steam libraries. '''
-    hits = []
-    for sa in detect_steam_libraries():
-        common = os.path.join(sa, "common")
-        if os.path.isdir(common):
-            name = "Balatro" # name of the bame folder in Steam library
-            p = os.path.join(common, name)
-            if os.path.isdir(p):
-                hits.append(p)
-    seen = set()
-    uniq = []
-    for h in hits:
-        if h not in seen:
-            uniq.append(h)
-            seen.add(h)
-    return uniq
-
-def game_streaming_assets_dir(game_root: str) -> str:
-    ''' Get the StreamingAssets directory for the given game root. '''
-    if platform.system() == "Darwin":
-        if game_root.endswith(".app"):
-            return os.path.join(game_root, "Contents", "Resources", "Data", "StreamingAssets")
-        return os.path.join(game_root, "Data", "StreamingAssets")
-    return os.path.join(game_root, TARGET_RELATIVE)
-
-# Baching up and restoring the game assests if user doesn't want them anymore =========
-def ensure_assets_backup(game_root: str):
-    ''' Ensure a backup of the StreamingAssets exists, create if not. '''
-    backup_root = os.path.join(game_root, BACKUP_DIRNAME)
-    if not os.path.isdir(backup_root):
-        os.makedirs(backup_root, exist_ok=True)
-        src = game_streaming_assets_dir(game_root)
-        if os.path.isdir(src):
-            copytree_merge(src, os.path.join(backup_root, "StreamingAssets"))
-    return backup_root
-
-def restore_assets_backup(game_root: str) -> bool:
-    ''' Restore StreamingAssets from backup, return True if restored. '''
-    backup_root = os.path.join(game_root, BACKUP_DIRNAME)
-    src = os.path.join(backup_root, "StreamingAssets")
-    dst = game_streaming_assets_dir(game_root)
-    if os.path.isdir(src):
-        copytree_merge(src, dst)
-        return True
-    return False
-
-def backup_file(path: str) -> str:
-    ''' Backup a file by copying it to path.bak if not already backed up. '''
-    bak = path + ".bak"
-    if not os.path.exists(bak):
-        shutil.copy2(path, bak)
-    return bak
-
-def restore_exe_backup(game_root: str) -> bool:
-    ''' Restore Balatro.exe from backup, return True if restored. '''
-    exe = os.path.join(game_root, EXE_NAME)
-    bak = exe + ".bak"
-    if os.path.isfile(bak):
-        shutil.copy2(bak, exe)
-        return True
-    return False
-
-# Installation =======================================
-def apply_zip_to_dir(zip_path: str, dest_dir: str):
-    ''' Apply the contents of a zip file to a destination directory. '''
-    with zipfile.ZipFile(zip_path) as z:
-        for m in z.infolist():
-            if m.is_dir():
-                continue
-            if ".." in m.filename or m.filename.startswith(("/", "\\")):
-                continue
-            out_path = safe_join(dest_dir, m.filename)
-            os.makedirs(os.path.dirname(out_path), exist_ok=True)
-            with z.open(m) as src, open(out_path, "wb") as dst:
-                shutil.copyfileobj(src, dst)
-
-
-# # DOESN'T WORK WITH WAY BALATRO IS PACKAGED ON STEAM
-# def install_to_streamingassets(game_root: str, mod_zip_or_url: str) -> str:
-#     ''' Install mod zip into StreamingAssets directory. '''
-#     ensure_assets_backup(game_root)
-#     target_root = game_root
-#     if mod_zip_or_url.startswith(("http://", "https://")):
-#         tmp = download(mod_zip_or_url)
-#         try:
-#             apply_zip_to_dir(tmp, target_root)
-#         finally:
-#             try: os.remove(tmp)
-#             except: pass
-#     else:
-#         apply_zip_to_dir(mod_zip_or_url, target_root)
-#     return "Installed mod to StreamingAssets (non-EXE method)."
-    
-
-def install_into_exe_archive(game_root: str, mod_zip_or_url: str) -> str:
-    ''' Install mod zip into Balatro.exe using 7-Zip. '''
-    exe_path = os.path.join(game_root, EXE_NAME)
-    if not os.path.isfile(exe_path):
-        raise RuntimeError(f"{EXE_NAME} not found in the selected folder.")
-    seven_zip = find_7z()
-    if not seven_zip:
-        raise RuntimeError("7-Zip (7z.exe) not found! Install 7-Zip.")
-
-    tmpzip = None
-
-    mod_zip_path = mod_zip_or_url
-
-    staging = tempfile.mkdtemp(prefix="balatro_mod_")
-    try:
-        with zipfile.ZipFile(mod_zip_path) as z:
-            z.extractall(staging)
-
-        rel_target = os.path.join(staging, "resources", "textures", "2x")
-        if not os.path.isdir(rel_target):
-            st.info("Note: Zip should mirror EXE layout: resources\\textures\\2x\\...")
-
-        backup_file(exe_path)
-
-        cmd = [
-            seven_zip,
-            "u", "-y",
-            exe_path,
-            r"resources\textures\2x\*",
-        ]
-        res = subprocess.run(cmd, cwd=staging, capture_output=True, text=True) # run the 7z update command to automatically unarchive and update the .exe by dropping in the new images
-        if res.returncode != 0:
-            raise RuntimeError(f"7z update failed:\n{res.stdout}\n{res.stderr}")
-
-        return "Successfully Modded Balatro with new artwork!" 
-    finally: # remove the temporary staging directory
-        shutil.rmtree(staging, ignore_errors=True)
-        if tmpzip:
-            try: os.remove(tmpzip)
-            except: pass
-
 # ---- PAGE-SPECIFIC BACKGROUND THEME ----
 def apply_page_background(page: str) -> None:
     # Default: let styles.css handle HOME
@@ -357,38 +134,39 @@ def render_suit_page(suit_key: str) -> None:
     hc_or_norm = "hc" if high_contrast else "normal"
     cards_dir = pathlib.Path(__file__).parent / "assets" / "cards" / suit_key / hc_or_norm
 
-    game_root = detect_balatro_dirs()[0] if detect_balatro_dirs() else ""
+    roots = selected_game_roots()
+    game_root = roots[0] if roots else ""
 
 
     # Button to download ================
-    # --- Suit-specific zip path ---
+    # --- Suit-specific zip path: <suit>_art.zip, else the catalogued mod that covers this suit ---
     suit_zip_name = f"{suit_key}_art.zip"
-    suit_zip_path = pathlib.Path(MODS_DIR) / suit_zip_name
-
-    if not suit_zip_path.is_file():
+    mod_catalog.ensure_fresh(MODS_DIR)
+    found = mod_catalog.suit_mod(MODS_DIR, suit_key)
+    if found is None:
         st.info(f"No mod zip found for {suit_title} yet "
-                f"(looking for `{suit_zip_name}` in `{MODS_DIR}`).")
+                f"(looking for `{suit_zip_name}` or any mod with {suit_title} face cards in `{MODS_DIR}`).")
         return
-
-    if st.button(f"Install {suit_title} Art", key=f"install_{suit_key}"):
-        try:
-            msg = install_into_exe_archive(game_root, str(suit_zip_path))
-            st.success(msg)
-
-        except PermissionError:
-            st.error("Permission denied. Run as Administrator if installing under Program Files.")
-
-        except RuntimeError as e:
-            # Surface the 7z message, but in a friendlier way
-            st.error(f"7-Zip failed while installing {suit_title} art. "
-                     "Most likely the zip does not contain a `resources\\textures\\2x` folder "
-                     "at its root. Check the zip layout.\n\n"
-                     f"Details:\n{e}")
-            
-        except Exception as e:
-            st.error(f"Install failed: {e}")
-
-    if cards_dir.is_dir():
+    suit_zip_path = pathlib.Path(found)
+
+    job_key = f"job_install_{suit_key}"
+    if st.button(f"Install {suit_title} Art", key=f"install_{suit_key}", disabled=roots_busy(roots)):
+        start_install_job(job_key, f"Installing {suit_title} art", roots,
+                          "install_into_exe_archive", str(suit_zip_path))
+
+    def suit_failed(job):
+        # Surface the patcher message, but in a friendlier way
+        st.error(f"Patching Balatro.exe failed while installing {suit_title} art. "
+                 "Most likely the zip does not contain a `resources\\textures\\2x` folder "
+                 "at its root. Check the zip layout.\n\n"
+                 f"Details:\n{job.error}")
+    render_job(job_key, st.success, suit_failed)
+
+    compare = st.toggle("Compare with installed", value=False, key=f"compare_{suit_key}",
+                        help=f"Show the cards currently inside {EXE_NAME} next to the mod's art.")
+    if compare:
+        render_installed_comparison(suit_key, hc_or_norm, cards_dir, game_root)
+    elif cards_dir.is_dir():
         img_files = sorted(cards_dir.glob("*.png"))
         if img_files:
             cols = st.columns(4)
@@ -397,7 +175,7 @@ def render_suit_page(suit_key: str) -> None:
                     img_html = f"""
 <div class="jimbo-wrapper">
   <img class="jimbo-idle tilt-on-hover"
-       src="data:image/png;base64,{base64_encode(img_path)}" />
+       src="{image_src(img_path)}" />
 </div>
 """
                     st.markdown(img_html, unsafe_allow_html=True)
@@ -410,6 +188,51 @@ def render_suit_page(suit_key: str) -> None:
 
 
 
+def render_installed_comparison(suit_key: str, variant: str, cards_dir: pathlib.Path, game_root: str) -> None:
+    """ One row per face card: the mod's preview, what Balatro.exe holds now and the original from the .bak. """
+    if suit_key not in atlas_compose.SUIT_ATLASES:
+        st.info(f"No installed-art preview for {suit_key.capitalize()} yet.")
+        return
+    exe = os.path.join(game_root, EXE_NAME) if game_root else ""
+    installed = installed_textures.installed_cards(exe, suit_key, variant) if exe else {}
+    original = installed_textures.installed_cards(exe + ".bak", suit_key, variant) if exe else {}
+    if not installed:
+        st.info(f"Couldn't read the card art from {EXE_NAME}" + (f" in {game_root}." if game_root else "."))
+        return
+
+    headers = st.columns(3)
+    for col, title in zip(headers, ("Mod", f"In {EXE_NAME}", "Original")):
+        col.markdown(f"**{title}**")
+    for card in atlas_compose.CARD_ORDER:
+        preview = next(iter(sorted(cards_dir.glob(f"*{card}.png"))), None) if cards_dir.is_dir() else None
+        mod_col, exe_col, orig_col = st.columns(3)
+        if preview is not None:
+            mod_col.image(str(thumbnails.ensure_thumbnail(str(preview), installed_textures.PREVIEW_BOX)), caption=card)
+        if card in installed:
+            exe_col.image(installed[card], caption=card)
+        if card in original:
+            orig_col.image(original[card], caption=card)
+    if not original:
+        st.caption(f"No {EXE_NAME}.bak yet, so nothing has been installed over the original art.")
+
+
+
+# Target installs ======================
+def render_install_picker() -> None:
+    """ Sidebar choice of which detected installs the pages act on (only shown with more than one). """
+    detected = detect_balatro_dirs()
+    if len(detected) > 1:
+        st.sidebar.multiselect("TARGET INSTALLS", detected, default=detected[:1], key="game_roots",
+                               help="Installs, backups and restores are applied to every selected install at once.")
+
+def selected_game_roots() -> list[str]:
+    """ Installs the pages act on: the sidebar selection, or the first detected install. """
+    detected = detect_balatro_dirs()
+    chosen = [r for r in st.session_state.get("game_roots", []) if r in detected]
+    return chosen or detected[:1]
+
+
+
 # Convert labels ======================
 def label_to_suit_key(label: str) -> str:
     # Take the last word ("Hearts", "Diamonds", etc.) and lowercase it
@@ -420,6 +243,14 @@ def base64_encode(path):
     with open(path, "rb") as f:
         return base64.b64encode(f.read()).decode()
 
+def image_src(path, box=thumbnails.CARD_THUMB_SIZE) -> str:
+    ''' Cached thumbnail URL for an image (falls back to a small data URI without static serving). '''
+    try:
+        static_serving = bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        static_serving = False
+    return thumbnails.thumbnail_src(str(path), box, static_serving=static_serving)
+
 
 def render_home_page() -> None:
     """Landing page with jimbo image + centered blurb."""
@@ -429,7 +260,7 @@ def render_home_page() -> None:
         img_html = f"""
 <div class="jimbo-wrapper">
   <img class="jimbo-idle tilt-on-hover"
-       src="data:image/png;base64,{base64_encode(jimbo_path)}" />
+       src="{image_src(jimbo_path, thumbnails.ICON_THUMB_SIZE)}" />
 </div>
 """
     else:
@@ -458,7 +289,7 @@ def render_home_page() -> None:
   ">
     <li>Browse suit-specific artwork</li>
     <li>Download mod-ready zip files</li>
-    <li>Patch your <code>Balatro.exe</code> safely using 7-Zip</li>
+    <li>Patch your <code>Balatro.exe</code> safely (no 7-Zip needed)</li>
     <li>Restore backups with one click</li>
   </ul>
 
@@ -482,7 +313,7 @@ def render_restore_page()->None:
         img_html = f"""
                     <div class="jimbo-wrapper">
                     <img class="jimbo-idle tilt-on-hover"
-                        src="data:image/png;base64,{base64_encode(reroll_path)}" />
+                        src="{image_src(reroll_path, thumbnails.ICON_THUMB_SIZE)}" />
                     </div>
                 """
     else:
@@ -493,8 +324,8 @@ def render_restore_page()->None:
     st.markdown("## Restore Original Game Assets")
     st.text("Restore original card art from backups and remove any modded card art.")
 
-    game_root = detect_balatro_dirs()[0] if detect_balatro_dirs() else ""
-    
+    roots = selected_game_roots()
+    game_root = roots[0] if roots else ""
 
     valid_game = os.path.isdir(game_root)
     exe_present = os.path.isfile(os.path.join(game_root, EXE_NAME)) if valid_game else False
@@ -507,22 +338,187 @@ def render_restore_page()->None:
         st.warning(f"{EXE_NAME} not found in that folder.")
         return
 
-    if st.button("Restore Original Assets"):
-        try:
-            restored_exe = restore_exe_backup(game_root)
-            restored_assets = restore_assets_backup(game_root)
-            if restored_exe or restored_assets:
-                st.success("Successfully restored original game assets!")
-            else:
-                st.info("No backups found to restore.")
-        except Exception as e:
-            st.error(f"Restore failed: {e}")
+    modded = modded_entries(game_root)
+    if modded is not None:
+        changed, added = modded
+        if changed or added:
+            st.caption(f"{len(changed)} texture(s) in {EXE_NAME} currently differ from the original"
+                       + (f", {len(added)} added by mods." if added else "."))
+        else:
+            st.caption(f"{EXE_NAME} matches its backup: no modded textures installed.")
+
+    busy = roots_busy(roots)
+    stale = backup_is_stale(game_root)
+    if stale:
+        st.warning(f"{EXE_NAME}.bak is out of date: {stale}. A new backup is taken on the next install or restore "
+                   "once no modded textures are left in the EXE.")
+    render_drift_check(game_root, busy)
+    if st.button("Restore Original Assets" + (f" ({len(roots)} installs)" if len(roots) > 1 else ""), disabled=busy):
+        start_install_job("job_restore", "Restoring original assets", roots, "restore_game")
+
+    def restored(result):
+        restored_exe, restored_assets = result
+        if restored_exe or restored_assets:
+            st.success("Successfully restored original game assets!")
+            if restored_exe and not restored_exe.full_copy:
+                touched = restored_exe.replaced + restored_exe.added + restored_exe.removed
+                st.caption(f"Rewrote {len(touched)} modded entr{'y' if len(touched) == 1 else 'ies'} "
+                           f"in {EXE_NAME} ({restored_exe.unchanged} already original).")
+                if touched:
+                    with st.expander("Restored entries"):
+                        st.code("\n".join(sorted(touched)))
+        else:
+            st.info("No backups found to restore.")
+    render_job("job_restore", restored)
+
+    snapshots = game_backup_store(game_root).list_snapshots()
+    if snapshots:
+        st.markdown("### Restore an Earlier Snapshot")
+        options = {f"{s['id']}  ·  {s['label']}": s["id"] for s in snapshots}
+        choice = st.selectbox("Snapshot", list(options))
+        if st.button("Restore Selected Snapshot", disabled=busy):
+            start_job("job_snapshot", f"Restoring snapshot {options[choice]}", game_root,
+                      restore_snapshot, game_root, options[choice])
+        render_job("job_snapshot", lambda res: st.success(
+            f"Restored snapshot ({'Balatro.exe + ' if res['exe'] else ''}{res['files']} asset file(s))."))
+
+    history = load_install_ledger(game_root)["history"]
+    if history:
+        with st.expander("Recent operations"):
+            st.dataframe([{"when": time.strftime("%Y-%m-%d %H:%M", time.localtime(h["at"])), "operation": h["op"],
+                           "mods": ", ".join(m["name"] for m in h["mods"]), "seconds": h["seconds"],
+                           "no-op": bool(h.get("noop"))} for h in reversed(history[-20:])],
+                         hide_index=True, width="stretch")
+
+def render_drift_check(game_root: str, busy: bool) -> None:
+    """ What a Steam update or file verification undid since the last install, with a targeted re-apply. """
+    drift = check_install_drift(game_root)
+    if not drift.manifest:
+        return
+    if not drift.ok:
+        lines = [f"{len(names)} {kind}" for kind, names in (
+            ("reverted to the original art", drift.reverted), ("changed by something else", drift.changed),
+            ("missing", drift.missing), ("modded outside this app", drift.unexpected),
+            ("StreamingAssets file(s) gone", drift.assets_missing),
+            ("StreamingAssets file(s) changed", drift.assets_changed)) if names]
+        st.warning(f"{EXE_NAME} changed since the last install ({drift.label}): " + ", ".join(lines) + ".")
+        for problem in drift.problems:
+            st.error(problem)
+        if drift.drifted:
+            with st.expander("Drifted textures"):
+                st.code("\n".join(sorted(drift.drifted)))
+            if st.button(f"Re-apply {len(drift.drifted)} Drifted Texture(s)", disabled=busy):
+                start_job("job_drift", "Re-applying drifted textures", game_root, reapply_drift, game_root)
+    render_job("job_drift", lambda patch: st.success(
+        f"Re-applied {len(patch.replaced) + len(patch.added) if patch else 0} texture(s)."))
+
+# Background jobs (see job_runner.py) ==========
+def start_job(job_key: str, label: str, game_root: str, fn, *args, **kwargs) -> bool:
+    """ Run fn in the background for game_root and remember the job under job_key; False if the root is busy. """
+    try:
+        job = job_runner.submit(label, game_root, fn, *args, **kwargs)
+    except job_runner.JobBusy as e:
+        st.warning(f"{e} Wait for it to finish before starting another.")
+        return False
+    st.session_state[job_key] = job.id
+    return True
+
+def start_install_job(job_key: str, label: str, roots: list[str], op: str, *args, **kwargs) -> bool:
+    """
+    Run mod_core.<op>(root, *args) for one install, or for every selected install in parallel.
+    Uploaded files among args (or inside a list arg) are streamed to disk by the job itself, so a big
+    upload never holds up the page, and their temp copies are deleted when it ends.
+    """
+    if not roots:
+        st.warning("No Balatro install found to work on.")
+        return False
+    if len(roots) == 1:
+        return start_job(job_key, label, roots[0], _install_from_uploads, getattr(mod_core, op), roots[0], *args, **kwargs)
+    return start_job(job_key, f"{label} ({len(roots)} installs)", roots, _install_from_uploads,
+                     multi_install.run_across_roots, op, roots, *args, **kwargs)
+
+def roots_busy(roots: list[str]) -> bool:
+    """ True while a job is writing to any of the given installs. """
+    return any(job_runner.active_job(r) is not None for r in roots)
+
+def render_job(job_key: str, on_done, on_error=None) -> None:
+    """ Live progress bar while the session's job_key job runs, then its result (shown once). """
+    job = job_runner.get_job(st.session_state.get(job_key))
+    if job is None:
+        return
+    if job.running:
+        _render_job_progress(job.id)
+        return
+    del st.session_state[job_key]
+    if job.error:
+        (on_error or (lambda j: st.error(f"{j.label} failed: {j.error}")))(job)
+    elif isinstance(job.result, multi_install.MultiReport):
+        render_multi_report(job.result)
+    else:
+        on_done(job.result)
+
+def render_multi_report(report: multi_install.MultiReport) -> None:
+    """ Outcome per install of a job that ran across several installs. """
+    (st.warning if report.failed else st.success)(report.summary())
+    st.dataframe([{"install": r.game_root, "ok": r.ok, "seconds": round(r.seconds, 2), "result": r.message}
+                  for r in report.results], hide_index=True, width="stretch")
+
+@st.fragment(run_every=0.5)
+def _render_job_progress(job_id: str) -> None:
+    """ Polls the job twice a second without rerunning the rest of the page. """
+    job = job_runner.get_job(job_id)
+    if job is None or not job.running:
+        st.rerun() # full rerun so the page shows the result
+    st.progress(job.fraction, text=f"{job.label}: {job.message or 'starting …'}")
+    if job.lines:
+        with st.expander("Progress log"):
+            st.code("\n".join(job.lines))
+
+def _install_from_uploads(fn, *args, progress=None, **kwargs):
+    """ Job body: save the uploaded files among args to temp zips, run fn on their paths, then delete them. """
+    tmps = []
+    def saved(value):
+        if isinstance(value, list):
+            return [saved(v) for v in value]
+        if not hasattr(value, "read"):
+            return value
+        if progress:
+            progress(None, f"Saving {value.name} …")
+        tmps.append(save_uploaded_zip(value))
+        return tmps[-1]
+    try:
+        args = [saved(a) for a in args]
+        return fn(*args, progress=progress, **kwargs)
+    finally:
+        for tmp in tmps:
+            try: os.remove(tmp)
+            except OSError: pass
+
+def render_preflight(report: mod_preflight.PreflightReport) -> None:
+    """ Show what a mod zip would change (from its central directory only) and any problems. """
+    for err in report.errors:
+        st.error(err)
+    for warn in report.warnings:
+        st.warning(warn)
+    if report.ok:
+        summary = f"{len(report.textures)} texture(s), {report.total_uncompressed / 2**20:.1f} MB uncompressed"
+        if report.replaces or report.adds or report.identical:
+            summary += (f" · replaces {len(report.replaces)}, adds {len(report.adds)}, "
+                        f"{len(report.identical)} already installed")
+        st.caption(f"Preflight OK: {summary} (checked in {report.seconds * 1000:.1f} ms).")
+    with st.expander("Textures this mod would write"):
+        st.code("\n".join(report.textures) or "(none)")
+    if report.unsafe_paths:
+        with st.expander("Unsafe paths"):
+            st.code("\n".join(report.unsafe_paths))
 
 def save_uploaded_zip(upload) -> str:
-    """ Save uploaded zip file to a temp location and return its path. """
-    tmpf = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
-    tmpf.write(upload.read()); tmpf.flush(); tmpf.close()
-    return tmpf.name
+    """ Stream uploaded zip file to a temp location in chunks (hashed + zip-checked) and return its path. """
+    with tracing.span("upload.save") as s:
+        # read through a BytesIO of its own: reruns of the page keep seeking the upload for preflight meanwhile
+        saved = uploads.stream_to_disk(io.BytesIO(upload.getvalue()))
+        s.add(bytes=saved.size, files=1, entries=saved.entries)
+    return saved.path
 
 def render_upload_page()->None:
     """ Page for uploading your own mod zip to install into Balatro.exe. """
@@ -533,7 +529,7 @@ def render_upload_page()->None:
         img_html = f"""
                     <div class="jimbo-wrapper">
                     <img class="jimbo-idle tilt-on-hover"
-                        src="data:image/png;base64,{base64_encode(paintbrush_path)}" />
+                        src="{image_src(paintbrush_path, thumbnails.ICON_THUMB_SIZE)}" />
                     </div>
                 """
     else:
@@ -543,23 +539,125 @@ def render_upload_page()->None:
     st.markdown("## Upload Your Own Card Art Mod")
     st.text("Upload a mod .zip file structured for Balatro.exe and install it directly.\nThe zip should follow the structure: `resources\\textures\\2x` folder at its root with the card images as .png inside.")
 
-    game_root = detect_balatro_dirs()[0] if detect_balatro_dirs() else ""
+    roots = selected_game_roots()
+    game_root = roots[0] if roots else ""
     mod_zip = st.file_uploader("Or upload mod .zip", type=["zip"])
-    if st.button("Install uploaded zip", disabled=not (mod_zip is not None)):
-        tmp = save_uploaded_zip(mod_zip)
-        try:
-            with st.status("Patching EXE via 7-Zip...", expanded=True) as s:
-                st.write("Backing up Balatro.exe …")
-                backup_file(os.path.join(game_root, EXE_NAME))
-                st.write("Applying …")
-                msg = install_into_exe_archive(game_root, tmp)
-                s.update(label="Done", state="complete")
-            st.success(msg)
-
-        except PermissionError:
-                st.error("Permission denied. Run as Administrator if installing under Program Files.")
-        except Exception as e:
-            st.error(f"Install failed: {e}")
-        finally:
-            try: os.remove(tmp)
-            except: pass
\ No newline at end of file
+    if mod_zip is not None:
+        render_preflight(mod_preflight.preflight_mod_zip(mod_zip, current_exe_layout(game_root)))
+    busy = roots_busy(roots)
+    if st.button("Install uploaded zip", disabled=mod_zip is None or busy):
+        # the job streams the upload to disk (chunked, hashed + zip-checked) and deletes it afterwards
+        start_install_job("job_upload", f"Installing {mod_zip.name}", roots, "install_into_exe_archive", mod_zip)
+    render_job("job_upload", st.success, lambda job: st.error(f"Install failed: {job.error}"))
+
+def render_conflicts(zip_paths: list[str], game_root: str) -> None:
+    """ Show which of the given mods overwrite the same textures and which are already installed. """
+    index = texture_index.build_texture_index(zip_paths) # central directories only, cached between reruns
+    layout = current_exe_layout(game_root)
+    if layout is not None:
+        done = [index.label(p) for p in index.zips if index.already_installed(p, layout)]
+        if done:
+            st.caption("Already installed (will be skipped): " + ", ".join(f"`{n}`" for n in done))
+    clashes = index.conflicts(zip_paths)
+    if not clashes:
+        return
+    order = [os.path.abspath(p) for p in zip_paths]
+    rows = []
+    for name, provs in sorted(clashes.items()):
+        mods = sorted((p for p, _, _ in provs), key=order.index)
+        rows.append({"texture": name.removeprefix(exe_archive.TEXTURE_PREFIX),
+                     "provided by": ", ".join(index.label(p) for p in mods),
+                     "wins": index.label(mods[-1])})
+    st.warning(f"{len(rows)} texture(s) are replaced by more than one selected mod; the later mod wins.")
+    st.dataframe(rows, hide_index=True, width="stretch")
+
+def render_batch_page() -> None:
+    """ Page for applying several mods (bundled and/or uploaded) in one Balatro.exe update. """
+    st.markdown("## Batch Install")
+    st.text("Pick any number of mods and apply them to Balatro.exe in one go.\n"
+            "Mods are applied in the order shown; when two mods replace the same texture, the later one wins.")
+
+    roots = selected_game_roots()
+    game_root = roots[0] if roots else ""
+    bundled = st.multiselect("Bundled mods", list_bundled_mods())
+    files = st.file_uploader("Extra mod .zip files", type=["zip"], accept_multiple_files=True) or []
+
+    order = list(bundled) + [f"{u.name} (uploaded)" for u in files]
+    if order:
+        st.markdown("\n".join(f"{i}. `{name}`" for i, name in enumerate(order, 1)))
+    if bundled:
+        render_conflicts([os.path.join(MODS_DIR, name) for name in bundled], game_root)
+
+    busy = roots_busy(roots)
+    if st.button(f"Install {len(order)} mod{'s' if len(order) != 1 else ''}", disabled=not order or busy):
+        mods = [os.path.join(MODS_DIR, name) for name in bundled] + files # uploads are saved by the job
+        start_install_job("job_batch", f"Applying {len(order)} mods in a single update", roots,
+                          "install_mods_into_exe_archive", mods, bundled + [u.name for u in files])
+    render_job("job_batch", st.success, lambda job: st.error(f"Install failed: {job.error}"))
+
+def render_browse_page() -> None:
+    """ Searchable, paginated list of every mod in the mods folder, served from the catalog database. """
+    st.markdown("## Browse Mods")
+    scanning = mod_catalog.ensure_fresh(MODS_DIR, force=st.button("Rescan mods folder"))
+    status = mod_catalog.scan_status()
+    if scanning:
+        st.caption(f"Indexing new or changed mods … {status['done']}/{status['todo'] or '?'}")
+    elif status["error"]:
+        st.warning(f"Couldn't scan the mods folder: {status['error']}")
+
+    search_col, suit_col = st.columns([3, 1])
+    query = search_col.text_input("Search", placeholder="mod name or texture path", key="browse_query")
+    suit = suit_col.selectbox("Suit", ["any"] + list(atlas_compose.SUIT_ATLASES), key="browse_suit")
+    suit = None if suit == "any" else suit
+
+    _, total = mod_catalog.search(query, suit, MODS_DIR, limit=0)
+    pages = max(1, -(-total // mod_catalog.PAGE_SIZE))
+    if st.session_state.get("browse_page", 1) > pages: # the search got narrower
+        st.session_state["browse_page"] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key="browse_page")
+    rows, total = mod_catalog.search(query, suit, MODS_DIR, offset=(page - 1) * mod_catalog.PAGE_SIZE)
+    st.caption(f"{total} mod{'s' if total != 1 else ''}")
+    if not rows:
+        if not scanning:
+            st.info("No mods match." if query or suit else f"No mod zips in `{MODS_DIR}` yet.")
+        return
+
+    roots = selected_game_roots()
+    busy = roots_busy(roots)
+    sprites = mod_catalog.previews([r["path"] for r in rows])
+    for r in rows:
+        with st.container(border=True):
+            info_col, art_col, action_col = st.columns([2, 3, 1])
+            info_col.markdown(f"**{r['name']}**")
+            info_col.caption(f"{r['textures']} texture(s) · {r['bytes'] / 2**20:.1f} MB · "
+                             f"{', '.join(s.capitalize() for s in r['suits']) or 'no face cards'} · "
+                             f"sha256 {r['sha256'][:12]}")
+            cards = sprites.get(r["path"], [])
+            if cards:
+                art_col.image([png for _, _, png in cards], caption=[f"{card} ({suit_})" for suit_, card, _ in cards])
+            if action_col.button("Install", key=f"browse_install_{r['path']}", disabled=busy):
+                start_install_job("job_browse", f"Installing {r['name']}", roots, "install_into_exe_archive", r["path"])
+    render_job("job_browse", st.success)
+
+def render_diagnostics_panel() -> None:
+    """ Timings of the most recent mod operations (the same spans are appended to traces.jsonl). """
+    traces = tracing.recent_traces()
+    with st.expander(f"Diagnostics · {len(traces)} recent operation{'s' if len(traces) != 1 else ''}"):
+        if not traces:
+            st.caption("Install, back up or restore something to see where the time goes.")
+        for root in traces:
+            status = f" · failed: {root.error}" if root.error else ""
+            st.markdown(f"**{root.name}** · {root.seconds * 1000:.0f} ms{status}")
+            rows = []
+            for sp in root.walk():
+                rate = sp.bytes / sp.seconds / 2**20 if sp.bytes and sp.seconds else None
+                rows.append({"step": "\u2003" * sp.depth + sp.name, "ms": round(sp.seconds * 1000, 1),
+                             "files": sp.files or None, "MB": round(sp.bytes / 2**20, 2) if sp.bytes else None,
+                             "MB/s": round(rate, 1) if rate else None})
+            st.dataframe(rows, hide_index=True, width="stretch")
+        path = tracing.trace_file()
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                st.download_button("Download traces.jsonl", f.read(), file_name=tracing.TRACE_FILENAME,
+                                   mime="application/jsonl")
+            st.caption(f"Full trace log: `{path}`")
@@ -0,0 +1,121 @@
+import os
+import time
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import job_runner
+import mod_core
+import tracing
+
+# Applying one operation to several Balatro installs ====================
+# Some setups keep several installs (other library drives, test copies) that all need the same art.
+# Each game root is handled by its own worker process, at most MAX_WORKERS at a time. Duplicate roots
+# are dropped and the caller holds every root's in-process lock for the whole run (job_runner.submit with a
+# list, or job_runner.hold_roots(file_locks=False)); each worker takes its root's OS lock before writing
+# (job_runner.file_lock), so no other process writes the same Balatro.exe meanwhile. Backup and patching are
+# mostly disk I/O plus zlib/PNG work, so installs on separate drives overlap almost completely.
+MAX_WORKERS = 4
+OPERATIONS = ("install_into_exe_archive", "install_mods_into_exe_archive", "restore_game") # mod_core functions taking game_root first
+
+
+@dataclass
+class RootResult:
+    ''' Outcome of the operation on one install. '''
+    game_root: str
+    ok: bool
+    message: str
+    seconds: float = 0.0
+
+
+@dataclass
+class MultiReport:
+    ''' Per-root results of run_across_roots, in the order the roots were given. '''
+    operation: str
+    results: list[RootResult] = field(default_factory=list)
+    seconds: float = 0.0 # wall clock for the whole run
+    workers: int = 1
+
+    @property
+    def failed(self) -> list[RootResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def work_seconds(self) -> float:
+        ''' Time the roots took added up, i.e. roughly what running them one after another would cost. '''
+        return sum(r.seconds for r in self.results)
+
+    def summary(self) -> str:
+        ok = len(self.results) - len(self.failed)
+        return (f"{ok}/{len(self.results)} installs updated in {self.seconds:.1f}s "
+                f"({self.work_seconds:.1f}s of work across {self.workers} worker{'s' if self.workers != 1 else ''}).")
+
+
+def unique_roots(game_roots: list[str]) -> list[str]:
+    ''' game_roots without duplicates (same folder spelled differently), first spelling kept. '''
+    seen = set()
+    out = []
+    for root in game_roots:
+        key = os.path.normcase(os.path.abspath(root))
+        if key not in seen:
+            seen.add(key)
+            out.append(root)
+    return out
+
+def _describe(result) -> str:
+    if isinstance(result, str):
+        return result
+    restored_exe, restored_assets = result # restore_game
+    return "Restored original game assets." if restored_exe or restored_assets else "No backups found to restore."
+
+def _run_one(task: tuple) -> RootResult:
+    ''' Worker: run one mod_core operation against one game root; errors become a failed result. '''
+    op, root, args, kwargs = task
+    started = time.perf_counter()
+    try:
+        with job_runner.file_lock(root), tracing.span("multi.root", op=op, root=root):
+            result = getattr(mod_core, op)(root, *args, **kwargs)
+        return RootResult(root, True, _describe(result), time.perf_counter() - started)
+    except PermissionError:
+        return RootResult(root, False, "Permission denied. Run as Administrator if installing under Program Files.",
+                          time.perf_counter() - started)
+    except Exception as e:
+        return RootResult(root, False, str(e) or type(e).__name__, time.perf_counter() - started)
+
+def run_across_roots(op: str, game_roots: list[str], *args, workers: int | None = None, progress=None, **kwargs) -> MultiReport:
+    '''
+    Run mod_core.<op>(root, *args, **kwargs) for every game root, several roots at a time in a process pool.
+    One failing root does not stop the others; progress(fraction, message) advances as roots finish.
+    '''
+    if op not in OPERATIONS:
+        raise ValueError(f"{op} can't be run across installs.")
+    roots = unique_roots(game_roots)
+    tasks = [(op, root, args, kwargs) for root in roots]
+    report = MultiReport(op, workers=max(1, min(workers or MAX_WORKERS, len(tasks)))) # disk-bound: not capped by CPU count
+    results = {}
+
+    def finished(res: RootResult) -> None:
+        results[res.game_root] = res
+        if progress:
+            progress(len(results) / len(tasks), f"{len(results)}/{len(tasks)} installs done ({res.game_root})")
+
+    started = time.perf_counter()
+    with tracing.span("multi", op=op, roots=len(roots), workers=report.workers) as s:
+        if progress:
+            progress(0.0, f"Updating {len(roots)} installs …")
+        if report.workers == 1:
+            for task in tasks:
+                finished(_run_one(task))
+        else:
+            try:
+                with ProcessPoolExecutor(max_workers=report.workers) as pool:
+                    for fut in as_completed([pool.submit(_run_one, t) for t in tasks]):
+                        finished(fut.result())
+            except (BrokenProcessPool, OSError): # no subprocesses allowed here: threads still overlap the I/O
+                with ThreadPoolExecutor(max_workers=report.workers) as pool:
+                    for res in pool.map(_run_one, [t for t in tasks if t[1] not in results]):
+                        finished(res)
+        report.results = [results[root] for root in roots]
+        report.seconds = time.perf_counter() - started
+        s.add(files=len(roots), failed=len(report.failed), work_seconds=round(report.work_seconds, 3))
+    return report
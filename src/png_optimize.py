@@ -0,0 +1,130 @@
+import io
+import os
+import zlib
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+import app_cache
+import exe_archive
+
+# Lossless PNG re-encoding ====================
+# Mod PNGs are often saved straight out of an editor: metadata chunks, no filter search, RGBA even when
+# every pixel is opaque. Each texture is re-encoded (metadata stripped, zlib level 9 with Pillow's filter
+# search, RGB or an exact palette when that loses nothing), decoded again and kept only if the pixels are
+# identical and the file got smaller. Outputs are cached by the SHA-256 of the input PNG and written
+# into the EXE as stored entries, since deflating PNG data a second time gains nothing.
+CACHE_SUBDIR = "png_opt"
+MIN_POOL_JOBS = 2 # fewer PNGs than this are optimized in-process
+MAX_WORKERS = 8
+
+
+def pixels_identical(a: bytes, b: bytes) -> bool:
+    ''' True if two PNGs decode to exactly the same RGBA pixels. '''
+    with Image.open(io.BytesIO(a)) as ia, Image.open(io.BytesIO(b)) as ib:
+        if ia.size != ib.size:
+            return False
+        return ia.convert("RGBA").tobytes() == ib.convert("RGBA").tobytes()
+
+def _encode(im: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format="PNG", optimize=True) # no pnginfo / icc_profile: metadata is dropped
+    return buf.getvalue()
+
+def _candidates(im: Image.Image):
+    ''' Lossless re-encodings worth trying for one image. '''
+    rgba = im.convert("RGBA")
+    yield rgba
+    if rgba.getchannel("A").getextrema() == (255, 255):
+        yield rgba.convert("RGB")
+    colors = rgba.getcolors(256)
+    if colors is not None: # <= 256 distinct colors: an exact palette (with per-entry alpha) is lossless
+        pal = Image.new("P", rgba.size)
+        lookup = {c: i for i, (_, c) in enumerate(colors)}
+        pal.putdata([lookup[p] for p in rgba.getdata()])
+        pal.putpalette([v for _, c in colors for v in c[:3]])
+        pal.info["transparency"] = bytes(c[3] for _, c in colors)
+        yield pal
+
+def optimize_png(data: bytes) -> bytes:
+    ''' Smallest pixel-identical re-encoding of a PNG, or data itself if nothing beats it. '''
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            im.load()
+            best = data
+            for candidate in _candidates(im):
+                out = _encode(candidate)
+                if len(out) < len(best) and pixels_identical(data, out):
+                    best = out
+            return best
+    except (OSError, ValueError, SyntaxError):
+        return data # not a PNG Pillow can read: leave it alone
+
+def _cache_file(digest: str) -> str:
+    return app_cache.cache_path(CACHE_SUBDIR, digest[:2], digest + ".png")
+
+def _optimize_to_cache(args: tuple[str, bytes]) -> str:
+    ''' Worker: optimize one PNG and write the result to its cache file (atomically). '''
+    digest, data = args
+    out = optimize_png(data)
+    path = _cache_file(digest)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(out)
+    os.replace(tmp, path)
+    return path
+
+def _stored_source(name: str, path: str, template: exe_archive.ArchiveEntry) -> exe_archive.EntrySource:
+    ''' EntrySource writing a cached PNG file as a stored (uncompressed) entry. '''
+    with open(path, "rb") as f:
+        data = f.read()
+    e = exe_archive.ArchiveEntry(name, 0, 0, len(data), len(data), zlib.crc32(data),
+                                 0, template.dos_time, template.dos_date)
+    return exe_archive.EntrySource(name, path, e, data_offset=0)
+
+def optimize_sources(sources: list[exe_archive.EntrySource], workers: int | None = None) -> tuple[list[exe_archive.EntrySource], dict]:
+    '''
+    Swap every .png source for its optimized, stored counterpart (cache misses run in a process pool).
+    Returns (sources, stats) with stats = {"pngs", "cached", "bytes_before", "bytes_after"}.
+    '''
+    stats = {"pngs": 0, "cached": 0, "bytes_before": 0, "bytes_after": 0}
+    pngs = {}
+    for i, s in enumerate(sources):
+        if s.name.lower().endswith(".png") and not exe_archive.entry_problem(s.name, s.entry):
+            pngs[i] = s
+    if not pngs:
+        return sources, stats
+
+    digests = {}
+    misses = {}
+    for i, s in pngs.items():
+        data = exe_archive.read_entry_data(s.path, s.entry)
+        digest = hashlib.sha256(data).hexdigest()
+        digests[i] = digest
+        if os.path.isfile(_cache_file(digest)):
+            stats["cached"] += 1
+        else:
+            misses[digest] = data
+    if misses:
+        jobs = list(misses.items())
+        if len(jobs) < MIN_POOL_JOBS:
+            for job in jobs:
+                _optimize_to_cache(job)
+        else:
+            try:
+                with ProcessPoolExecutor(max_workers=min(workers or MAX_WORKERS, os.cpu_count() or 2, len(jobs))) as pool:
+                    list(pool.map(_optimize_to_cache, jobs))
+            except (BrokenProcessPool, OSError): # no subprocesses allowed here: do it in-process
+                for job in jobs:
+                    if not os.path.isfile(_cache_file(job[0])):
+                        _optimize_to_cache(job)
+
+    out = list(sources)
+    for i, s in pngs.items():
+        out[i] = _stored_source(s.name, _cache_file(digests[i]), s.entry)
+        stats["pngs"] += 1
+        stats["bytes_before"] += s.entry.compress_size
+        stats["bytes_after"] += out[i].entry.compress_size
+    return out, stats
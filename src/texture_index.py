@@ -0,0 +1,73 @@
+import os
+
+import exe_archive
+import mod_catalog
+
+# Texture conflict index ====================
+# Maps every resources/textures/2x/... entry path to the mods that provide it and the CRC32/size each
+# mod ships. The entries come from the mod catalog's entries table (see mod_catalog.py), which already
+# holds every catalogued zip's textures and only re-reads zips whose size/mtime changed, so conflict
+# checks stay cheap with many mods and nothing is indexed twice.
+
+
+class TextureIndex:
+    ''' Read-only view over the index for a set of mod zips (keys are absolute zip paths). '''
+
+    def __init__(self, zips: dict[str, dict[str, list[int]]], labels: dict[str, str] | None = None):
+        self.zips = zips # zip path -> {texture: [crc, size]}
+        self.labels = labels or {}
+        self.by_texture = {}
+        for path, entries in zips.items():
+            for name, (crc, size) in entries.items():
+                self.by_texture.setdefault(name, []).append((path, crc, size))
+
+    def label(self, path: str) -> str:
+        return self.labels.get(path, os.path.basename(path))
+
+    def providers(self, texture: str) -> list[tuple[str, int, int]]:
+        ''' (zip path, crc, size) for every indexed mod that ships texture. '''
+        return self.by_texture.get(texture, [])
+
+    def textures_of(self, zip_path: str) -> dict[str, list[int]]:
+        return self.zips[os.path.abspath(zip_path)]
+
+    def conflicts(self, zip_paths: list[str] | None = None) -> dict[str, list[tuple[str, int, int]]]:
+        ''' Textures shipped by more than one of zip_paths (default: all) with different contents. '''
+        wanted = None if zip_paths is None else {os.path.abspath(p) for p in zip_paths}
+        out = {}
+        for name, provs in self.by_texture.items():
+            if wanted is not None:
+                provs = [p for p in provs if p[0] in wanted]
+            if len(provs) > 1 and len({(crc, size) for _, crc, size in provs}) > 1:
+                out[name] = provs
+        return out
+
+    def installed_from(self, exe_layout: exe_archive.ArchiveLayout) -> dict[str, list[str]]:
+        ''' For each indexed texture, the mods whose copy is the one currently inside the EXE. '''
+        out = {}
+        for e in exe_layout.entries:
+            for path, crc, size in self.by_texture.get(e.name, []):
+                if crc == e.crc and size == e.file_size:
+                    out.setdefault(e.name, []).append(path)
+        return out
+
+    def already_installed(self, zip_path: str, exe_layout: exe_archive.ArchiveLayout) -> bool:
+        ''' True if zip_path ships textures and every one already sits in the EXE with the same CRC + size. '''
+        textures = self.textures_of(zip_path)
+        if not textures: # nothing to install: preflight rejects it, so it must not be listed as skipped
+            return False
+        current = exe_layout.by_name()
+        for name, (crc, size) in textures.items():
+            e = current.get(name)
+            if e is None or e.crc != crc or e.file_size != size:
+                return False
+        return True
+
+
+def build_texture_index(zip_paths: list[str], labels: dict[str, str] | None = None) -> TextureIndex:
+    ''' Index zip_paths through the mod catalog, re-reading only zips that changed since they were catalogued. '''
+    mod_catalog.index_zips(zip_paths)
+    entries = mod_catalog.texture_entries(zip_paths)
+    zips = {p: entries[p] for p in dict.fromkeys(os.path.abspath(z) for z in zip_paths) if p in entries}
+    abs_labels = {os.path.abspath(k): v for k, v in (labels or {}).items()}
+    return TextureIndex(zips, abs_labels)
@@ -0,0 +1,99 @@
+import os
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+# Downscaled preview pipeline ====================
+# Full-size card art is 1200x1800 and was inlined as base64 on every rerun. Thumbnails are generated
+# once, named by (source path, mtime, size, box) and written under static/ so Streamlit can serve them
+# as plain URLs; a changed source gets a new file name, so browsers can keep old URLs cached forever.
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static") # Streamlit serves this as app/static/
+THUMB_SUBDIR = "thumbs"
+STATIC_URL_PREFIX = "app/static"
+CARD_THUMB_SIZE = (360, 540) # cards are shown 4 to a row, no need for more pixels than this
+ICON_THUMB_SIZE = (256, 256)
+DISK_BUDGET_BYTES = 64 * 1024 * 1024 # on-disk thumbnails are pruned oldest-first past this
+MEMORY_ENTRIES = 512 # (source stat -> thumbnail name) entries kept in memory
+
+_lock = threading.Lock()
+_memory = OrderedDict() # key -> thumbnail file name, most recently used last
+
+
+def thumbs_dir() -> str:
+    ''' Folder holding generated thumbnails. '''
+    return os.path.join(STATIC_DIR, THUMB_SUBDIR)
+
+def thumbnail_name(src_path: str, box: tuple[int, int]) -> str:
+    ''' Cache file name for src_path scaled into box; changes whenever the source file changes. '''
+    st_ = os.stat(src_path)
+    key = f"{os.path.abspath(src_path)}|{st_.st_mtime_ns}|{st_.st_size}|{box[0]}x{box[1]}"
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+    return f"{stem}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.png"
+
+def _render_thumbnail(src_path: str, out_path: str, box: tuple[int, int]) -> None:
+    ''' Decode src_path once, shrink it into box and write it to out_path atomically. '''
+    with Image.open(src_path) as im:
+        im.thumbnail(box, Image.LANCZOS) # never upscales small images
+        tmp = out_path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        im.save(tmp, format="PNG", optimize=True)
+    os.replace(tmp, out_path)
+
+def _prune_disk(folder: str, budget: int) -> None:
+    ''' Delete least recently used thumbnails until the folder fits in budget bytes. '''
+    files = []
+    total = 0
+    with os.scandir(folder) as it:
+        for e in it:
+            if e.is_file() and e.name.endswith(".png"):
+                s = e.stat()
+                files.append((s.st_mtime, s.st_size, e.path))
+                total += s.st_size
+    if total <= budget:
+        return
+    files.sort() # oldest first
+    for _, size, path in files:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        with _lock:
+            _memory.pop(os.path.basename(path), None)
+        total -= size
+        if total <= budget:
+            break
+
+def ensure_thumbnail(src_path: str, box: tuple[int, int] = CARD_THUMB_SIZE) -> str:
+    ''' Return the path of the thumbnail for src_path, generating it on first use. '''
+    name = thumbnail_name(src_path, box)
+    with _lock:
+        if name in _memory:
+            _memory.move_to_end(name)
+            return os.path.join(thumbs_dir(), name)
+
+    folder = thumbs_dir()
+    out_path = os.path.join(folder, name)
+    if os.path.isfile(out_path):
+        try: os.utime(out_path) # mark as recently used for the on-disk LRU
+        except OSError: pass
+    else:
+        os.makedirs(folder, exist_ok=True)
+        _render_thumbnail(src_path, out_path, box)
+        _prune_disk(folder, DISK_BUDGET_BYTES)
+
+    with _lock:
+        _memory[name] = True
+        _memory.move_to_end(name)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+    return out_path
+
+def thumbnail_src(src_path: str, box: tuple[int, int] = CARD_THUMB_SIZE, static_serving: bool = True) -> str:
+    ''' <img src> for src_path: a static URL when Streamlit serves static/, else a small data URI. '''
+    path = ensure_thumbnail(src_path, box)
+    if static_serving:
+        return f"{STATIC_URL_PREFIX}/{THUMB_SUBDIR}/{os.path.basename(path)}"
+    with open(path, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import app_cache
+
+# Lightweight tracing for mod operations ====================
+# Wrap a step in `with span("backup.exe") as s:` and record what it processed with s.add(bytes=..., files=...).
+# Spans nest; when the outermost one finishes, the whole tree is appended to traces.jsonl in the cache
+# folder (one JSON object per span, sharing a trace id) and kept in memory for the diagnostics panel.
+TRACE_FILENAME = "traces.jsonl"
+TRACE_ENV_VAR = "BALATRO_MM_TRACE" # set to 0 to stop writing traces.jsonl
+MAX_FILE_BYTES = 5 * 1024 * 1024 # rotate to traces.jsonl.1 past this size
+RECENT_TRACES = 20 # finished traces kept in memory for the panel
+
+_current = contextvars.ContextVar("balatro_mm_span", default=None)
+_recent = deque(maxlen=RECENT_TRACES)
+_write_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    ''' One timed step; children are the spans started while it was open. '''
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    depth: int = 0
+    started: float = 0.0 # wall-clock start (epoch seconds)
+    seconds: float = 0.0
+    bytes: int = 0
+    files: int = 0
+    attrs: dict = field(default_factory=dict)
+    error: str | None = None
+    children: list = field(default_factory=list)
+
+    def add(self, bytes: int = 0, files: int = 0, **attrs) -> None:
+        ''' Count work done inside the span and attach extra attributes. '''
+        self.bytes += bytes
+        self.files += files
+        self.attrs.update(attrs)
+
+    def walk(self):
+        ''' This span followed by all of its descendants, depth first. '''
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def record(self) -> dict:
+        ''' Flat JSON-serialisable form written to traces.jsonl. '''
+        rec = {"trace": self.trace_id, "span": self.span_id, "parent": self.parent_id, "name": self.name,
+               "start": round(self.started, 6), "ms": round(self.seconds * 1000, 3),
+               "bytes": self.bytes, "files": self.files}
+        if self.attrs:
+            rec["attrs"] = self.attrs
+        if self.error:
+            rec["error"] = self.error
+        return rec
+
+
+@contextmanager
+def span(name: str, nested_only: bool = False, **attrs):
+    '''
+    Time the enclosed block as a child of the current span (or as a new trace if there is none).
+    nested_only spans are only recorded inside another span, so cheap calls made on every page
+    render (detection, cached hashes) don't flood the log on their own.
+    '''
+    parent = _current.get()
+    if parent is None and nested_only:
+        yield Span(name, "", "")
+        return
+    s = Span(name, parent.trace_id if parent else os.urandom(8).hex(), os.urandom(4).hex(),
+             parent.span_id if parent else None, parent.depth + 1 if parent else 0, time.time(), attrs=dict(attrs))
+    if parent is not None:
+        parent.children.append(s)
+    token = _current.set(s)
+    started = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.seconds = time.perf_counter() - started
+        _current.reset(token)
+        if parent is None:
+            _finish(s)
+
+def current_span() -> Span | None:
+    ''' The innermost open span, if any. '''
+    return _current.get()
+
+def add(bytes: int = 0, files: int = 0, **attrs) -> None:
+    ''' Count work against the current span; a no-op outside of one. '''
+    s = _current.get()
+    if s is not None:
+        s.add(bytes, files, **attrs)
+
+def recent_traces() -> list[Span]:
+    ''' Finished root spans, newest first. '''
+    return list(reversed(_recent))
+
+def trace_file() -> str:
+    return app_cache.cache_path(TRACE_FILENAME)
+
+def _finish(root: Span) -> None:
+    _recent.append(root)
+    if os.environ.get(TRACE_ENV_VAR, "1") == "0":
+        return
+    lines = "".join(json.dumps(s.record(), separators=(",", ":")) + "\n" for s in root.walk())
+    try:
+        with _write_lock:
+            path = trace_file()
+            if os.path.isfile(path) and os.path.getsize(path) > MAX_FILE_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(lines)
+    except OSError:
+        pass # tracing must never break the operation it measures
@@ -0,0 +1,77 @@
+import os
+import hashlib
+import tempfile
+from dataclasses import dataclass
+
+import exe_archive
+import hash_cache
+
+# Streaming upload handling ====================
+# Uploaded mod zips are copied to disk in fixed-size chunks (never read() in one go), hashed on the way
+# and checked for zip structure while they stream: the first bytes must be a zip record and the tail
+# must hold a valid end-of-central-directory. Only the central directory is parsed afterwards.
+CHUNK = 1024 * 1024
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024 * 1024 # refuse anything bigger than 2 GiB
+TAIL_BYTES = exe_archive.EOCD_STRUCT.size + exe_archive.MAX_16 # the EOCD always lives in this tail
+
+
+class UploadError(ValueError):
+    ''' Raised when an upload is not a usable zip. '''
+
+
+@dataclass
+class SavedUpload:
+    ''' A zip streamed to a temp file. '''
+    path: str
+    sha256: str
+    size: int
+    entries: int
+
+
+def _check_tail(tail: bytes, size: int) -> None:
+    ''' Validate the end-of-central-directory record found in the last bytes of the stream. '''
+    pos = tail.rfind(exe_archive.EOCD_SIG)
+    if pos < 0 or pos + exe_archive.EOCD_STRUCT.size > len(tail):
+        raise UploadError("This is not a complete zip file (no end-of-central-directory record).")
+    rec = exe_archive.EOCD_STRUCT.unpack_from(tail, pos)
+    eocd_at = size - len(tail) + pos
+    cd_size, cd_offset = rec[5], rec[6]
+    if cd_size != exe_archive.MAX_32 and cd_offset + cd_size > eocd_at:
+        raise UploadError("The zip's central directory points past the end of the file (truncated upload?).")
+
+def stream_to_disk(fileobj, suffix: str = ".zip", chunk: int = CHUNK, max_bytes: int = MAX_UPLOAD_BYTES) -> SavedUpload:
+    ''' Copy a file-like upload to a temp file chunk by chunk, hashing and validating it as it goes. '''
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    h = hashlib.sha256()
+    size = 0
+    tail = b""
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = fileobj.read(chunk)
+                if not block:
+                    break
+                if size == 0 and block[:4] not in (exe_archive.LOCAL_SIG, exe_archive.EOCD_SIG):
+                    raise UploadError("This is not a zip file.")
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadError(f"Upload is larger than {max_bytes // (1024 * 1024)} MB.")
+                h.update(block)
+                out.write(block)
+                tail = (tail + block)[-TAIL_BYTES:]
+        if size == 0:
+            raise UploadError("The uploaded file is empty.")
+        _check_tail(tail, size)
+        try:
+            entries = len(exe_archive.read_layout(path).entries) # central directory only, nothing inflated
+        except exe_archive.ArchiveError as e:
+            raise UploadError(f"Corrupt zip: {e}") from e
+        digest = h.hexdigest()
+        hash_cache.remember(path, digest)
+        return SavedUpload(path, digest, size, entries)
+    except BaseException:
+        try: os.remove(path)
+        except OSError: pass
+        raise
@@ -0,0 +1,90 @@
+import io
+import os
+import sys
+import zipfile
+import subprocess
+from contextlib import contextmanager
+
+# The app's modules are flat files in src/ imported by bare name, and the fixtures under benchmarks/
+# (fused EXE builders, the local mod server) double as test helpers.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("src", "benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
+os.environ.setdefault("BALATRO_MM_TRACE", "0")
+
+import pytest
+
+import bench_mod_ops
+import hash_cache
+import mod_catalog
+import mod_core
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    ''' A fresh app cache folder per test. '''
+    folder = tmp_path / "cache"
+    monkeypatch.setenv("BALATRO_MM_CACHE_DIR", str(folder))
+    monkeypatch.setattr(hash_cache, "_conn", None) # reopened inside the new folder
+    monkeypatch.setattr(mod_catalog, "_conn", None)
+    return folder
+
+
+def _relative_offsets(exe: str) -> None:
+    ''' Rewrite a fused EXE the way `copy /b love.exe + game.love` builds one: stub, then a zip with its own offsets. '''
+    buf = io.BytesIO()
+    with zipfile.ZipFile(exe) as zin, zipfile.ZipFile(buf, "w") as zout:
+        stub = zin.infolist()[0].header_offset
+        for info in zin.infolist():
+            zout.writestr(info, zin.read(info))
+    with open(exe, "r+b") as f:
+        f.seek(stub)
+        f.write(buf.getvalue())
+        f.truncate()
+
+@pytest.fixture
+def make_game(tmp_path):
+    '''
+    make_game(name, entries=40, ...) -> (game root holding a small fused Balatro.exe, its texture names).
+    relative=True gives the zip offsets relative to the end of the stub instead of to the start of the file.
+    '''
+    def make(name: str = "game", entries: int = 40, entry_kb: int = 4, compression: str = "deflated", seed: int = 1,
+             relative: bool = False):
+        root = tmp_path / name
+        os.makedirs(root / "Balatro_Data" / "StreamingAssets")
+        names = bench_mod_ops.make_fused_exe(str(root / mod_core.EXE_NAME), 0.05, entries, entry_kb, compression, seed)
+        if relative:
+            _relative_offsets(str(root / mod_core.EXE_NAME))
+        bench_mod_ops.make_streaming_assets(str(root / "Balatro_Data" / "StreamingAssets"), 4, 1, seed)
+        return str(root), names
+    return make
+
+@pytest.fixture
+def make_mod(tmp_path):
+    ''' make_mod(texture_names, breadth, new_entries=0, seed=2) -> path of a mod zip. '''
+    def make(names: list[str], breadth: int, new_entries: int = 0, seed: int = 2, entry_kb: int = 4) -> str:
+        path = str(tmp_path / f"mod_{breadth}_{new_entries}_{seed}.zip")
+        bench_mod_ops.make_mod_zip(path, names, breadth, new_entries, entry_kb, seed)
+        return path
+    return make
+
+
+# Holds a root's OS lock from a second interpreter until stdin closes.
+HOLDER = """
+import sys, job_runner
+with job_runner.hold_roots([sys.argv[1]]):
+    print("held", flush=True)
+    sys.stdin.read()
+"""
+
+@contextmanager
+def held_elsewhere(game_root: str):
+    ''' Another process holding game_root's locks, as a second app window or CLI command would. '''
+    holder = subprocess.Popen([sys.executable, "-c", HOLDER, game_root], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              text=True, env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+    try:
+        assert holder.stdout.readline().strip() == "held"
+        yield
+    finally:
+        holder.stdin.close()
+        holder.wait(timeout=10)
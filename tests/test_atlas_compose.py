@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import atlas_compose
+
+
+def atlas(width: int, height: int, fill: int) -> np.ndarray:
+    return np.full((height, width, 4), fill, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("size", [(426, 190), (213, 95), (852, 380)])
+def test_cells_follow_the_atlas_size(size):
+    w, h = size
+    base = atlas(w, h, 10)
+    first, second = base.copy(), base.copy()
+    first[:, : w // 3] = 50 # Jack
+    second[:, 2 * w // 3:] = 90 # King
+    cell = atlas_compose.cell_size(w, h)
+    result, owner = atlas_compose.composite_cells(base, base, [first, second], cell)
+    assert owner.tolist() == [[0, -1, 1]]
+    assert (result[:, : w // 3] == 50).all() and (result[:, w // 3: 2 * w // 3] == 10).all()
+    assert (result[:, 2 * w // 3:] == 90).all()
+
+def test_card_cell_uses_the_atlas_dimensions():
+    name, box = atlas_compose.card_cell("diamonds", "Queen", "hc", (213, 95))
+    assert name.endswith("collab_XR_2.png")
+    assert box == (71, 0, 142, 95)
+    assert atlas_compose.cell_size(425, 190) is None
+
+def test_unmapped_suits_are_refused_clearly():
+    with pytest.raises(ValueError, match="hearts"):
+        atlas_compose.atlas_entry("hearts")
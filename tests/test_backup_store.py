@@ -0,0 +1,73 @@
+import os
+import zlib
+
+import exe_archive
+import mod_core
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_install_snapshots_only_store_what_differs_from_the_bak(make_game, make_mod):
+    root, names = make_game(entries=60)
+    mod = make_mod(names, breadth=4, new_entries=1)
+    mod_core.install_mods_into_exe_archive(root, [mod])
+
+    store = mod_core.game_backup_store(root)
+    snaps = {s["label"]: store.load_snapshot(s["id"]) for s in store.list_snapshots()}
+    original, installed = snaps["original"], snaps[f"installed {os.path.basename(mod)}"]
+    assert all(m.get("base") for m in original["exe"]["entries"])
+    own = [m["name"] for m in installed["exe"]["entries"] if not m.get("base")]
+    assert sorted(own) == sorted(exe_archive.read_table(mod).names)
+    assert "assets" not in installed # installs only write Balatro.exe
+
+    exe = os.path.join(root, mod_core.EXE_NAME)
+    mod_core.restore_snapshot(root, store.list_snapshots()[-1]["id"])
+    assert not exe_archive.read_table(exe).diff(exe_archive.read_table(exe + ".bak"))[0]
+
+
+def test_a_damaged_stub_is_rebuilt_from_the_bak(make_game, make_mod):
+    root, names = make_game(relative=True)
+    assert exe_archive.read_layout(os.path.join(root, mod_core.EXE_NAME)).concat > 0
+    mod = make_mod(names, breadth=3)
+    mod_core.install_mods_into_exe_archive(root, [mod])
+    exe = os.path.join(root, mod_core.EXE_NAME)
+    installed = _read(exe)
+    entries = exe_archive.read_table(exe).fingerprint()
+
+    with open(exe, "r+b") as f:
+        f.write(b"XX")
+    os.chmod(exe, 0o755)
+    latest = mod_core.game_backup_store(root).list_snapshots()[0]
+    assert latest["new_bytes"] < len(installed) // 4 # the stub is referenced from the .bak, not copied
+    mod_core.restore_snapshot(root, latest["id"])
+    assert _read(exe)[:2] == b"MZ"
+    assert os.stat(exe).st_mode & 0o777 == 0o755 # the rebuilt file keeps the EXE's mode
+    assert exe_archive.read_table(exe).fingerprint() == entries
+    assert exe_archive.check_archive(exe, check_crc=True) == []
+
+
+def test_snapshots_survive_a_game_update_retaking_the_bak(make_game, make_mod, tmp_path):
+    root, names = make_game()
+    exe = os.path.join(root, mod_core.EXE_NAME)
+    mod = make_mod(names, breadth=4)
+    mod_core.install_mods_into_exe_archive(root, [mod])
+    modded = exe_archive.read_table(exe).fingerprint()
+    original = exe_archive.read_table(exe + ".bak").fingerprint()
+    mod_core.restore_exe_backup(root)
+    before = {s["label"]: s["id"] for s in mod_core.game_backup_store(root).list_snapshots()}
+
+    update = tmp_path / "update.bin" # a game update changes a non-texture file
+    update.write_bytes(b"-- patched\n")
+    entry = exe_archive.ArchiveEntry("conf.lua", 0, 0, update.stat().st_size, update.stat().st_size,
+                                     zlib.crc32(update.read_bytes()))
+    exe_archive.patch_archive(exe, [exe_archive.EntrySource("conf.lua", str(update), entry, data_offset=0)])
+    mod_core.ensure_exe_backup(root)
+    assert "conf.lua" in exe_archive.read_table(exe + ".bak")
+
+    mod_core.restore_snapshot(root, before[f"installed {os.path.basename(mod)}"])
+    assert exe_archive.read_table(exe).fingerprint() == modded
+    mod_core.restore_snapshot(root, before["original"])
+    assert exe_archive.read_table(exe).fingerprint() == original
@@ -0,0 +1,22 @@
+import os
+
+import copy_engine
+
+
+def _pair(tmp_path, src_ns: int, dst_ns: int):
+    src, dst = tmp_path / "src.png", tmp_path / "dst.png"
+    src.write_bytes(b"new texture")
+    dst.write_bytes(b"old texture")
+    os.utime(src, ns=(src_ns, src_ns))
+    os.utime(dst, ns=(dst_ns, dst_ns))
+    return os.stat(src), str(dst)
+
+def test_a_same_size_change_within_two_seconds_is_copied(tmp_path):
+    base = 1_700_000_000_123_456_789
+    assert not copy_engine.is_unchanged(*_pair(tmp_path, base + 500_000_000, base))
+    assert copy_engine.is_unchanged(*_pair(tmp_path, base, base))
+
+def test_fat_rounded_mtimes_still_count_as_unchanged(tmp_path):
+    even = 1_700_000_000 * 10**9 # FAT keeps an even second and no sub-second part
+    assert copy_engine.is_unchanged(*_pair(tmp_path, even - 1_300_000_000, even))
+    assert not copy_engine.is_unchanged(*_pair(tmp_path, even - 2_500_000_000, even))
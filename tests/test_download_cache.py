@@ -0,0 +1,118 @@
+import os
+import time
+
+import pytest
+
+import download_cache
+import hash_cache
+import mod_server
+
+PAYLOAD = os.urandom(300 * 1024) # larger than download_cache.CHUNK, so a cut lands mid-file
+
+
+@pytest.fixture
+def host(tmp_path):
+    ''' (folder, server, base URL) of a local mod server; the folder holds mod.zip. '''
+    folder = tmp_path / "www"
+    folder.mkdir()
+    (folder / "mod.zip").write_bytes(PAYLOAD)
+    server, url = mod_server.serve(str(folder))
+    yield folder, server, url
+    server.shutdown()
+    server.server_close()
+
+
+def restart(server, folder, cut_after=None):
+    ''' The same host on the same port (the .part file is keyed by URL), optionally cutting responses short. '''
+    port = server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    return mod_server.serve(str(folder), port=port, cut_after=cut_after)[0]
+
+def statuses(server):
+    return [status for _, _, status in server.requests]
+
+def part_rows():
+    return hash_cache._db().execute("SELECT path FROM hashes WHERE path LIKE '%.part'").fetchall()
+
+
+def test_fetch_caches_by_hash_and_hits_without_network(host):
+    folder, server, url = host
+    path = download_cache.fetch(url + "/mod.zip")
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+    digest = hash_cache.file_sha256(path)
+    assert os.path.basename(path) == digest + ".zip"
+
+    mtime = os.stat(path).st_mtime_ns
+    time.sleep(0.01)
+    assert download_cache.fetch(url + "/mod.zip") == path
+    assert statuses(server) == [200]
+    assert os.stat(path).st_mtime_ns == mtime # hash_cache's row for the zip stays valid
+    record = download_cache._load_index()[url + "/mod.zip"]
+    assert record["used_at"] >= record["fetched_at"]
+    assert part_rows() == []
+
+def test_interrupted_download_resumes_with_range(host):
+    folder, server, url = host
+    server = restart(server, folder, cut_after=100 * 1024)
+    with pytest.raises(download_cache.DownloadError):
+        download_cache.fetch(url + "/mod.zip")
+    assert os.path.getsize(download_cache._partial_path(url + "/mod.zip")) == 100 * 1024
+
+    server = restart(server, folder)
+    try:
+        path = download_cache.fetch(url + "/mod.zip")
+        assert statuses(server) == [206]
+    finally:
+        server.shutdown()
+        server.server_close()
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert hash_cache.sha256_uncached(path) + ".zip" == os.path.basename(path)
+    assert not os.path.exists(download_cache._partial_path(url + "/mod.zip"))
+    assert part_rows() == []
+
+def test_changed_file_restarts_instead_of_splicing(host):
+    folder, server, url = host
+    server = restart(server, folder, cut_after=100 * 1024)
+    with pytest.raises(download_cache.DownloadError):
+        download_cache.fetch(url + "/mod.zip")
+
+    changed = os.urandom(len(PAYLOAD))
+    (folder / "mod.zip").write_bytes(changed)
+    os.utime(folder / "mod.zip", (time.time() + 5, time.time() + 5)) # new ETag even on coarse clocks
+    server = restart(server, folder)
+    try:
+        path = download_cache.fetch(url + "/mod.zip")
+        assert statuses(server) == [200] # If-Range didn't match, so the server sent the whole new file
+    finally:
+        server.shutdown()
+        server.server_close()
+    with open(path, "rb") as f:
+        assert f.read() == changed
+
+def test_refresh_revalidates_with_304(host):
+    folder, server, url = host
+    path = download_cache.fetch(url + "/mod.zip")
+    assert download_cache.fetch(url + "/mod.zip", refresh=True) == path
+    assert statuses(server) == [200, 304]
+    assert download_cache._load_index()[url + "/mod.zip"]["checked_at"] > 0
+
+def test_sha_mismatch_is_rejected_and_discarded(host):
+    folder, server, url = host
+    with pytest.raises(download_cache.DownloadError, match="failed verification"):
+        download_cache.fetch(url + "/mod.zip", sha256="0" * 64)
+    assert not os.path.exists(download_cache._partial_path(url + "/mod.zip"))
+    assert download_cache.cached_path(url + "/mod.zip") is None
+    assert part_rows() == []
+
+def test_prune_drops_least_recently_used(host):
+    folder, server, url = host
+    (folder / "other.zip").write_bytes(PAYLOAD[::-1])
+    first = download_cache.fetch(url + "/mod.zip")
+    second = download_cache.fetch(url + "/other.zip")
+    download_cache.fetch(url + "/mod.zip") # used again: now the newest
+    download_cache.prune(budget=len(PAYLOAD))
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
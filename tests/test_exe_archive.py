@@ -0,0 +1,83 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import exe_archive
+import mod_core
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("relative", [False, True])
+def test_install_restore_cycles_give_back_the_bak_byte_for_byte(make_game, make_mod, relative):
+    root, names = make_game(entries=60, relative=relative)
+    exe = os.path.join(root, mod_core.EXE_NAME)
+    for seed in (2, 3, 4):
+        mod_core.install_mods_into_exe_archive(root, [make_mod(names, breadth=5 * seed, new_entries=1, seed=seed)])
+        mod_core.install_mods_into_exe_archive(root, [make_mod(names, breadth=3, seed=seed + 10)])
+        report = mod_core.restore_exe_backup(root)
+        assert not report.full_copy
+        assert _read(exe) == _read(exe + ".bak")
+    assert mod_core.restore_exe_backup(root).bytes_written == 0 # answered from the ledger
+
+
+def test_unused_space_is_reclaimed(make_game, make_mod, monkeypatch):
+    root, names = make_game(entries=60)
+    exe = os.path.join(root, mod_core.EXE_NAME)
+    monkeypatch.setattr(exe_archive, "COMPACT_MIN_BYTES", 64 * 1024)
+    original = os.path.getsize(exe)
+    reports = []
+    for seed in range(2, 8): # each patch leaves the textures it replaces behind
+        mod = make_mod(names, breadth=12, seed=seed)
+        reports.append(exe_archive.patch_archive(exe, exe_archive.mod_texture_sources(mod)))
+    assert any(r.compacted for r in reports)
+    assert max(r.size_after for r in reports) < 1.5 * original
+    assert exe_archive.check_archive(exe, check_crc=True) == []
+    assert _read(exe)[:2] == b"MZ" # the stub survives the rebuild
+    wanted = {s.name: s.entry.crc for s in exe_archive.mod_texture_sources(mod)}
+    table = exe_archive.read_table(exe)
+    assert {n: table.crc[table.index(n)] for n in wanted} == wanted
+
+
+def test_a_failed_patch_leaves_the_archive_as_it_was(make_game, make_mod):
+    root, names = make_game()
+    exe = os.path.join(root, mod_core.EXE_NAME)
+    before = _read(exe)
+
+    def fail(done, total):
+        if done > total // 2:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        exe_archive.patch_archive(exe, exe_archive.mod_texture_sources(make_mod(names, breadth=20)), progress=fail)
+    assert _read(exe) == before
+    assert not os.path.exists(exe + exe_archive.JOURNAL_SUFFIX)
+
+
+# Dies halfway through writing the new entries, as a crash or power cut would.
+CRASHER = """
+import os, sys, exe_archive
+def die(done, total):
+    if done > total // 2:
+        os._exit(3)
+exe_archive.patch_archive(sys.argv[1], exe_archive.mod_texture_sources(sys.argv[2]), progress=die)
+"""
+
+def test_a_patch_cut_short_is_rolled_back(make_game, make_mod):
+    root, names = make_game()
+    exe = os.path.join(root, mod_core.EXE_NAME)
+    before = _read(exe)
+    mod = make_mod(names, breadth=20)
+    crashed = subprocess.run([sys.executable, "-c", CRASHER, exe, mod],
+                             env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+    assert crashed.returncode == 3
+    assert _read(exe) != before and os.path.exists(exe + exe_archive.JOURNAL_SUFFIX)
+
+    mod_core.install_mods_into_exe_archive(root, [mod]) # rolls back first, then installs
+    assert _read(exe + ".bak") == before
+    assert exe_archive.check_archive(exe, check_crc=True) == []
+    assert not os.path.exists(exe + exe_archive.JOURNAL_SUFFIX)
@@ -0,0 +1,34 @@
+import threading
+
+import pytest
+
+import job_runner
+from conftest import held_elsewhere
+
+
+@pytest.fixture
+def game_root(tmp_path):
+    root = tmp_path / "Balatro"
+    root.mkdir()
+    return str(root)
+
+
+def test_hold_roots_is_exclusive_within_the_process(game_root):
+    with job_runner.hold_roots([game_root]):
+        with pytest.raises(job_runner.JobBusy):
+            with job_runner.hold_roots([game_root]):
+                pass
+    with job_runner.hold_roots([game_root]): # released again
+        pass
+
+def test_another_process_holding_the_root_blocks_jobs(game_root):
+    with held_elsewhere(game_root):
+        with pytest.raises(job_runner.JobBusy, match="another Balatro Art Mod Manager"):
+            job_runner.submit("test", game_root, lambda progress: None)
+        assert job_runner.root_lock(game_root).acquire(blocking=False) # the in-process lock was given back
+        job_runner.root_lock(game_root).release()
+
+    done = threading.Event()
+    job = job_runner.submit("test", game_root, lambda progress: done.set())
+    assert done.wait(5)
+    assert job.game_root == game_root
@@ -0,0 +1,27 @@
+import os
+
+import exe_archive
+import job_runner
+import mod_core
+import multi_install
+from conftest import held_elsewhere
+
+
+def test_workers_skip_a_root_another_process_is_writing(make_game, make_mod):
+    roots, names = [], None
+    for i in range(3):
+        root, names = make_game(f"g{i}")
+        roots.append(root)
+    mod = make_mod(names, breadth=5, new_entries=1)
+
+    with held_elsewhere(roots[1]), job_runner.hold_roots(roots, file_locks=False):
+        report = multi_install.run_across_roots("install_mods_into_exe_archive", roots, [mod], workers=3)
+
+    ok = {r.game_root: r.ok for r in report.results}
+    assert ok == {roots[0]: True, roots[1]: False, roots[2]: True}
+    assert "another Balatro Art Mod Manager" in report.results[1].message
+    wanted = {s.name: s.entry.crc for s in exe_archive.mod_texture_sources(mod)}
+    for root, installed in ok.items():
+        table = exe_archive.read_table(os.path.join(root, mod_core.EXE_NAME))
+        got = {n: table.crc[table.index(n)] for n in wanted if n in table}
+        assert (got == wanted) == installed
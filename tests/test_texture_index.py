@@ -0,0 +1,41 @@
+import os
+import zipfile
+
+import exe_archive
+import mod_catalog
+import texture_index
+
+
+def test_conflicts_come_from_the_catalog(make_game, make_mod):
+    _, names = make_game()
+    first = make_mod(names, breadth=6, seed=2)
+    second = make_mod(names, breadth=6, seed=3)
+    shared = set(exe_archive.read_table(first).names) & set(exe_archive.read_table(second).names)
+
+    index = texture_index.build_texture_index([first, second])
+    assert set(index.conflicts()) == shared
+    assert mod_catalog.texture_entries([first])[os.path.abspath(first)] == index.textures_of(first)
+    assert mod_catalog.index_zips([first, second]) == 0 # unchanged zips aren't read again
+
+def test_changed_and_deleted_zips_are_reindexed(make_game, make_mod):
+    _, names = make_game()
+    mod = make_mod(names, breadth=3)
+    assert len(texture_index.build_texture_index([mod]).textures_of(mod)) == 3
+
+    with zipfile.ZipFile(mod, "a") as z:
+        z.writestr(exe_archive.TEXTURE_PREFIX + "extra.png", b"\x89PNG extra")
+    os.utime(mod, ns=(os.stat(mod).st_atime_ns, os.stat(mod).st_mtime_ns + 10**9))
+    assert len(texture_index.build_texture_index([mod]).textures_of(mod)) == 4
+
+    os.remove(mod)
+    assert texture_index.build_texture_index([mod]).zips == {}
+    assert mod_catalog.texture_entries([mod]) == {}
+
+def test_a_zip_without_textures_is_not_already_installed(make_game, tmp_path):
+    root, _ = make_game()
+    empty = str(tmp_path / "readme_only.zip")
+    with zipfile.ZipFile(empty, "w") as z:
+        z.writestr("README.txt", b"no textures here")
+    index = texture_index.build_texture_index([empty])
+    assert index.textures_of(empty) == {}
+    assert not index.already_installed(empty, exe_archive.read_layout(os.path.join(root, "Balatro.exe")))